@@ -1,7 +1,6 @@
 import logging
 from uuid import UUID
 from typing import Optional
-import jwt
 import httpx
 from fastapi import FastAPI, Request, Depends, HTTPException, status, Query
 from fastapi.responses import RedirectResponse
@@ -10,8 +9,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from . import crud
 from .database import db_initializer, get_async_session
 from .config import load_config
+from .logging_setup import setup_logging
+from .compression import CompressionMiddleware
+from .metrics import setup_metrics
+from .token_claims import get_request_claims
 
 cfg = load_config()
+setup_logging(cfg.SERVICE_NAME)
 logger = logging.getLogger(cfg.SERVICE_NAME)
 
 app = FastAPI(
@@ -26,6 +30,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+setup_metrics(app)
 
 @app.on_event("startup")
 async def on_startup():
@@ -38,49 +44,12 @@ async def on_startup():
 
 
 # ─────────── TOKEN ─────────── #
-def extract_email_data(token: str) -> Optional[tuple[str, UUID]]:
-    logger.info(f"Decoding token: {token}")
-    try:
-        data = jwt.decode(
-            token,
-            cfg.JWT_SECRET,
-            algorithms=["HS256"],
-            audience=["fastapi-users:auth"]
-        )
-        logger.info(f"Token decoded successfully: {data}")
-
-        email = data.get("email")
-        user_id = data.get("sub")
-
-        logger.info(f"Extracted email: {email}, user_id: {user_id}")
-        if email and user_id:
-            return email, UUID(user_id)
-
-    except jwt.ExpiredSignatureError:
-        logger.error("Token expired")
-    except jwt.InvalidTokenError as e:
-        logger.error(f"Invalid token: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error while decoding token: {e}")
-
-    logger.warning("Returning None from extract_email_data")
-    return None
-
 async def get_current_user(request: Request) -> tuple[str, UUID] | None:
-    auth_header = request.headers.get("authorization")
-
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None
-
-    token = auth_header.split(" ")[1]
-    user_data = extract_email_data(token)
-
-    if not user_data:
-        logger.warning("Invalid or expired token")
+    claims = get_request_claims(request, cfg.JWT_SECRET)
+    if claims is None or not claims.email or claims.user_id is None:
+        logger.debug("Invalid or expired token")
         return None
-
-    email, user_id = user_data
-    return email, user_id
+    return claims.email, claims.user_id
 
 @app.get("/", include_in_schema=False)
 async def root():
@@ -99,11 +68,10 @@ async def get_raw_data(
         auth_header = request.headers.get("authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
-        token = auth_header.split(" ")[1]
-        user_data = extract_email_data(token)
-        if not user_data:
+        claims = get_request_claims(request, cfg.JWT_SECRET)
+        if claims is None or claims.user_id is None:
             raise HTTPException(status_code=400, detail="Invalid or expired token")
-        _, user_id = user_data
+        token, user_id = claims.token, claims.user_id
     else:
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id required for internal call")
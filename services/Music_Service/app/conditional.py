@@ -0,0 +1,73 @@
+"""
+Условные GET-запросы: сильные ETag по версиям строк и ответы 304.
+
+ETag считается до загрузки и сериализации данных — по (id, xmin) строк, из которых
+собирается ответ (xmin в Postgres меняется при каждом UPDATE строки), плюс пути и
+параметрам запроса. Поэтому повторный опрос неизменённых данных стоит одного лёгкого
+запроса к индексу и нескольких байт ответа.
+"""
+import hashlib
+from typing import Iterable
+
+from fastapi import Request, Response
+
+from .storage import STORAGE_BASE_URL
+
+# публичные списки можно недолго держать в общих кэшах, дальше — ревалидация по ETag
+PUBLIC_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=30"
+# пользовательские данные кэширует только клиент и всегда ревалидирует
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# CompressionMiddleware добавляет к сильному ETag суффикс кодировки
+ENCODING_SUFFIXES = ("-br", "-gzip")
+# меняется при несовместимых изменениях формы ответа, чтобы сбросить клиентские кэши
+REPRESENTATION_VERSION = "1"
+
+
+def make_etag(request: Request, rows: Iterable[tuple]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{REPRESENTATION_VERSION}|{STORAGE_BASE_URL}|{request.url.path}?{request.url.query}".encode())
+    for row in rows:
+        digest.update(("\n" + "|".join(map(str, row))).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Слабое сравнение из RFC 9110 для If-None-Match, с учётом суффиксов кодировки."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque_tag(tag) == etag for tag in if_none_match.split(","))
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    rows: Iterable[tuple],
+    cache_control: str = PUBLIC_CACHE_CONTROL
+) -> Response | None:
+    """
+    Проставляет ETag и Cache-Control в ответ эндпоинта. Если клиентская копия актуальна,
+    возвращает готовый 304 — эндпоинт отдаёт его, не загружая данные.
+    """
+    etag = make_etag(request, rows)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if cache_control == PRIVATE_CACHE_CONTROL:
+        headers["Vary"] = "Authorization"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,41 @@
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+COVER_SIZES = (64, 256, 640)
+COVER_FORMATS = ("webp", "jpeg")
+
+CONTENT_TYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+EXTENSIONS = {
+    "webp": "webp",
+    "jpeg": "jpg",
+}
+
+
+def render_cover_variants(content: bytes) -> dict[str, dict[str, bytes]]:
+    """
+    Нарезает обложку на квадратные варианты COVER_SIZES в форматах COVER_FORMATS.
+    Выполняется в пуле процессов, поэтому принимает и возвращает только bytes.
+    """
+    variants: dict[str, dict[str, bytes]] = {}
+
+    with Image.open(BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+
+    for size in COVER_SIZES:
+        resized = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+        variants[str(size)] = {}
+        for fmt in COVER_FORMATS:
+            buffer = BytesIO()
+            if fmt == "webp":
+                resized.save(buffer, format="WEBP", quality=80, method=4)
+            else:
+                resized.save(buffer, format="JPEG", quality=82, optimize=True, progressive=True)
+            variants[str(size)][fmt] = buffer.getvalue()
+
+    return variants
+
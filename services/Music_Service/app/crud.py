@@ -1,30 +1,188 @@
 import asyncio
+import logging
 import os
 import random
-import time
 import urllib
 import uuid
 
 import redis.asyncio as redis
 from tempfile import NamedTemporaryFile
-from typing import List, Optional, Union
+from typing import List, Optional, Sequence, Union
 from uuid import UUID
 import requests
 from mutagen.mp3 import MP3
 
-from fastapi import HTTPException, UploadFile
+from fastapi import BackgroundTasks, HTTPException, UploadFile
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, func, or_, String
+from sqlalchemy import select, delete, func, or_, case, literal, String, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import joinedload
 
-from . import schemas
+from . import schemas, jobs, metrics
 from .database import models
 from .database.enums import MoodEnum
 
-from .storage import extract_duration, delete_file, upload_files
+from .storage import extract_duration, extract_key
+from .storage import read_upload, upload_contents, upload_target, cover_variant_keys
 from .storage import STORAGE_BASE_URL
+from .covers import COVER_SIZES, COVER_FORMATS
+
+logger = logging.getLogger(__name__)
+
+LIST_COVER_SIZE = 256
+
+# поля TrackResponse, доступные в fields= списочных эндпоинтов
+TRACK_FIELDS = (
+    "id", "title", "artist", "duration", "genre", "mood",
+    "release_year", "track_url", "hls_url", "cover_url",
+)
+
+def storage_url(column):
+    """Дополняет относительные ключи хранилища до URL прямо в SQL-проекции."""
+    return case(
+        (column.startswith("http"), column),
+        else_=literal(STORAGE_BASE_URL or "") + column
+    )
+
+def cover_url_column(model, cover_size: int | None, cover_format: str = "webp"):
+    """
+    cover_url для списков в проекции: наименьший из COVER_SIZES не меньше cover_size
+    (или наибольший), сначала в cover_format, затем в остальных COVER_FORMATS;
+    без вариантов — оригинал. Варианты нарезаются сразу для всех COVER_SIZES.
+    """
+    cover_url = storage_url(model.cover_url)
+    if not cover_size:
+        return cover_url
+    size = str(next((s for s in COVER_SIZES if s >= cover_size), COVER_SIZES[-1]))
+    formats = [cover_format] + [fmt for fmt in COVER_FORMATS if fmt != cover_format]
+    variants = [model.cover_variants[(size, fmt)].astext for fmt in formats]
+    return func.coalesce(*variants, cover_url)
+
+def track_columns(
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None,
+    prefix: str = ""
+) -> list:
+    """
+    Колонки TrackResponse для списочных запросов, которые возвращают строки, а не ORM-объекты.
+    fields ограничивает проекцию (sparse fieldsets), prefix разводит имена при join с другими таблицами.
+    """
+    columns = {
+        "id": models.Track.id,
+        "title": models.Track.title,
+        "artist": models.Track.artist,
+        "duration": models.Track.duration,
+        "genre": models.Track.genre,
+        "mood": models.Track.mood,
+        "release_year": models.Track.release_year,
+        "track_url": storage_url(models.Track.track_url),
+        "hls_url": models.Track.hls_url,
+        "cover_url": cover_url_column(models.Track, cover_size, cover_format),
+    }
+    return [columns[name].label(prefix + name) for name in fields or TRACK_FIELDS]
+
+def row_version(model):
+    """Системная колонка xmin — версия строки в Postgres, меняется при каждом UPDATE."""
+    return literal_column(f"{model.__table__.fullname}.xmin")
+
+# ─────────── STORED OBJECTS ─────────── #
+async def enqueue_deletions(db: AsyncSession, keys: list[str]) -> None:
+    """
+    Ставит объекты в очередь на удаление; очередь разбирает фоновый сборщик (jobs.run_storage_gc)
+    после коммита текущей транзакции.
+    """
+    if not keys:
+        return
+    await db.execute(
+        insert(models.StorageDeletion)
+        .values([{"object_key": key} for key in keys])
+        .on_conflict_do_nothing()
+    )
+
+async def upload_files_deduplicated(db: AsyncSession, files: list[UploadFile]) -> dict[str, str | dict]:
+    """
+    Загружает файлы с дедупликацией по SHA-256: если такое содержимое уже лежит
+    в хранилище, запись пропускается и увеличивается счётчик ссылок на объект.
+    """
+    results: dict[str, str | dict] = {}
+    pending: list[tuple[bytes, str, str]] = []
+
+    for file in files:
+        content, content_hash = await read_upload(file)
+        stored = await db.get(models.StoredObject, content_hash, with_for_update=True)
+        if stored is None:
+            pending.append((content, file.filename, content_hash))
+            continue
+
+        stored.ref_count += 1
+        _, field = upload_target(file.filename)
+        results[field] = STORAGE_BASE_URL + stored.object_key
+        if stored.cover_variants:
+            results["cover_variants"] = stored.cover_variants
+
+    if not pending:
+        return results
+
+    uploaded = await upload_contents([(content, filename) for content, filename, _ in pending])
+
+    for _, filename, content_hash in pending:
+        _, field = upload_target(filename)
+        object_key = extract_key(uploaded[field])
+        cover_variants = uploaded.get("cover_variants") if field == "cover_url" else None
+
+        stmt = insert(models.StoredObject).values(
+            content_hash=content_hash,
+            object_key=object_key,
+            ref_count=1,
+            cover_variants=cover_variants
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.StoredObject.content_hash],
+            set_={"ref_count": models.StoredObject.ref_count + 1}
+        ).returning(models.StoredObject.object_key, models.StoredObject.cover_variants)
+        stored = (await db.execute(stmt)).one()
+
+        if stored.object_key != object_key:
+            # параллельная загрузка того же содержимого успела раньше — наша копия лишняя
+            await enqueue_deletions(db, [object_key, *cover_variant_keys(cover_variants)])
+            cover_variants = stored.cover_variants
+
+        results[field] = STORAGE_BASE_URL + stored.object_key
+        if cover_variants:
+            results["cover_variants"] = cover_variants
+
+    return results
+
+async def release_object(
+    db: AsyncSession, url: str | None, cover_variants: dict | None = None
+) -> None:
+    """
+    Уменьшает счётчик ссылок на объект и ставит его в очередь на удаление, когда ссылок не осталось.
+    Объекты, загруженные до дедупликации, удаляются сразу.
+    """
+    if not url:
+        return
+
+    key = extract_key(url)
+    result = await db.execute(
+        select(models.StoredObject)
+        .where(models.StoredObject.object_key == key)
+        .with_for_update()
+    )
+    stored = result.scalar_one_or_none()
+
+    if stored is not None:
+        stored.ref_count -= 1
+        if stored.ref_count > 0:
+            return
+        cover_variants = stored.cover_variants
+        await db.delete(stored)
+
+    await enqueue_deletions(db, [key, *cover_variant_keys(cover_variants)])
+
 
 # ─────────── TRACK ─────────── #
 async def get_track(db: AsyncSession, track_id: UUID) -> models.Track | None:
@@ -33,21 +191,50 @@ async def get_track(db: AsyncSession, track_id: UUID) -> models.Track | None:
     )
     return result.scalar_one_or_none()
 
+def tracks_page(query, skip: int, limit: int, after: UUID | None = None, before: UUID | None = None):
+    """
+    Страница треков в порядке id: по offset или по keyset-курсору (after/before, границы
+    не включаются). Курсор позволяет читать каталог диапазонами id параллельно без
+    дорогих больших offset'ов.
+    """
+    if after is not None:
+        query = query.where(models.Track.id > after)
+    if before is not None:
+        query = query.where(models.Track.id < before)
+    return query.order_by(models.Track.id).offset(skip).limit(limit)
+
 async def get_tracks(
-    db: AsyncSession, skip: int = 0, limit: int = 100
-) -> list[schemas.TrackResponse]:
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None,
+    after: UUID | None = None,
+    before: UUID | None = None
+) -> list[dict]:
     result = await db.execute(
-        select(models.Track).offset(skip).limit(limit)
+        tracks_page(select(*track_columns(cover_size, cover_format, fields)), skip, limit, after, before)
     )
-    tracks = result.scalars().all()
-
-    for track in tracks:
-        if not track.track_url.startswith("http"):
-            track.track_url = STORAGE_BASE_URL + track.track_url
-        if track.cover_url and not track.cover_url.startswith("http"):
-            track.cover_url = STORAGE_BASE_URL + track.cover_url
+    return [dict(row) for row in result.mappings()]
 
-    return tracks
+async def get_tracks_versions(
+    db: AsyncSession,
+    mood: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: UUID | None = None,
+    before: UUID | None = None
+) -> list[tuple]:
+    """Версии строк той же страницы, что вернут get_tracks / get_tracks_by_mood."""
+    query = select(models.Track.id, row_version(models.Track))
+    if mood:
+        try:
+            query = query.where(models.Track.mood == MoodEnum(mood))
+        except ValueError:
+            return []
+    result = await db.execute(tracks_page(query, skip, limit, after, before))
+    return result.all()
 
 # Redis (кэширование)
 r = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
@@ -75,7 +262,7 @@ async def get_random_track(db: AsyncSession, user_id: UUID | None = None) -> sch
 
     random_track_id_str = random.choice(list(tracks))
 
-    print(f"Random track ID for user {user_id} from Redis: {random_track_id_str}")
+    logger.debug(f"Random track ID for user {user_id} from Redis: {random_track_id_str}")
 
     try:
         random_track_id = uuid.UUID(random_track_id_str)
@@ -96,9 +283,14 @@ async def get_tracks_by_mood(
     db: AsyncSession,
     mood: str | None = None,
     skip: int = 0,
-    limit: int = 100
-) -> list[schemas.TrackResponse]:
-    query = select(models.Track)
+    limit: int = 100,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None,
+    after: UUID | None = None,
+    before: UUID | None = None
+) -> list[dict]:
+    query = select(*track_columns(cover_size, cover_format, fields))
 
     if mood:
         try:
@@ -108,18 +300,8 @@ async def get_tracks_by_mood(
 
         query = query.where(models.Track.mood == mood_enum)
 
-    query = query.offset(skip).limit(limit)
-
-    result = await db.execute(query)
-    tracks = result.scalars().all()
-
-    for track in tracks:
-        if not track.track_url.startswith("http"):
-            track.track_url = STORAGE_BASE_URL + track.track_url
-        if track.cover_url and not track.cover_url.startswith("http"):
-            track.cover_url = STORAGE_BASE_URL + track.cover_url
-
-    return [schemas.TrackResponse.from_orm(track) for track in tracks]
+    result = await db.execute(tracks_page(query, skip, limit, after, before))
+    return [dict(row) for row in result.mappings()]
 
 # async def create_track_with_files(
 #     db: AsyncSession,
@@ -160,7 +342,8 @@ async def get_tracks_by_mood(
 async def create_track_with_files(
     db: AsyncSession,
     track_data: schemas.TrackCreate,
-    files: list[UploadFile]
+    files: list[UploadFile],
+    background_tasks: BackgroundTasks | None = None
 ) -> models.Track:
     if len(files) != 2:
         raise HTTPException(status_code=400, detail="Exactly two files (audio and cover) must be provided.")
@@ -169,14 +352,11 @@ async def create_track_with_files(
     if not audio_file:
         raise HTTPException(status_code=400, detail="MP3 file is required.")
 
-    t1 = time.perf_counter()
-    duration = await extract_duration(audio_file)
-    t2 = time.perf_counter()
-    print(f"Duration extraction took {t2 - t1:.2f} seconds")
+    with metrics.timed("track_duration_extraction"):
+        duration = await extract_duration(audio_file)
 
-    upload_results = await upload_files(files)
-    t3 = time.perf_counter()
-    print(f"File upload took {t3 - t2:.2f} seconds")
+    with metrics.timed("track_file_upload"):
+        upload_results = await upload_files_deduplicated(db, files)
 
     uploaded_urls = upload_results
 
@@ -191,12 +371,19 @@ async def create_track_with_files(
         mood=track_data.mood,
         release_year=track_data.release_year,
         track_url=uploaded_urls["track_url"],
-        cover_url=uploaded_urls["cover_url"]
+        cover_url=uploaded_urls["cover_url"],
+        cover_variants=uploaded_urls.get("cover_variants")
     )
 
     db.add(new_track)
     await db.commit()
     await db.refresh(new_track)
+
+    if background_tasks is not None:
+        content = await audio_file.read()
+        background_tasks.add_task(jobs.generate_hls, new_track.id, content)
+        background_tasks.add_task(jobs.generate_waveform, new_track.id, content)
+
     return new_track
 
 # async def create_track_with_files(
@@ -276,9 +463,6 @@ async def update_track(
     await db.refresh(track)
     return track
 
-def extract_key(url: str) -> str:
-        return urllib.parse.unquote(url.replace(STORAGE_BASE_URL, ""))
-
 async def delete_track(db: AsyncSession, track_id: UUID, user_id: UUID) -> bool:
     result = await db.execute(
         select(models.Track).where(models.Track.id == track_id)
@@ -292,11 +476,8 @@ async def delete_track(db: AsyncSession, track_id: UUID, user_id: UUID) -> bool:
     # if track.owner_id != user_id:
     #     raise HTTPException(status_code=403, detail="You do not have permission to delete this track")
 
-    track_key = extract_key(track.track_url)
-    cover_key = extract_key(track.cover_url)
-
-    delete_file(track_key)
-    delete_file(cover_key)
+    await release_object(db, track.track_url)
+    await release_object(db, track.cover_url, track.cover_variants)
 
     await db.delete(track)
     await db.commit()
@@ -320,6 +501,13 @@ async def delete_track(db: AsyncSession, track_id: UUID, user_id: UUID) -> bool:
 #     return True
 
 
+async def get_track_waveform(db: AsyncSession, track_id: UUID) -> bytes | None:
+    result = await db.execute(
+        select(models.TrackWaveform.peaks).where(models.TrackWaveform.track_id == track_id)
+    )
+    return result.scalar_one_or_none()
+
+
 # ─────────── SEARCH ─────────── #
 async def search_tracks(
     db: AsyncSession,
@@ -327,7 +515,10 @@ async def search_tracks(
     search_in: Optional[List[str]] = None,
     skip: int = 0,
     limit: int = 20,
-) -> list[schemas.TrackResponse]:
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
     if not query:
         return []
 
@@ -346,7 +537,7 @@ async def search_tracks(
         conditions.append(models.Track.mood.cast(String).ilike(f"%{query}%"))
 
     stmt = (
-        select(models.Track)
+        select(*track_columns(cover_size, cover_format, fields))
         .where(or_(*conditions))
         .order_by(models.Track.title)
         .offset(skip)
@@ -354,15 +545,7 @@ async def search_tracks(
     )
 
     result = await db.execute(stmt)
-    tracks = result.scalars().all()
-
-    for track in tracks:
-        if not track.track_url.startswith("http"):
-            track.track_url = STORAGE_BASE_URL + track.track_url
-        if track.cover_url and not track.cover_url.startswith("http"):
-            track.cover_url = STORAGE_BASE_URL + track.cover_url
-
-    return [schemas.TrackResponse.from_orm(track) for track in tracks]
+    return [dict(row) for row in result.mappings()]
 
 
 # ─────────── PLAYLIST ─────────── #
@@ -380,7 +563,7 @@ async def create_playlist_with_cover(
     if not image_file:
         raise HTTPException(status_code=400, detail="Image file (.jpg/.jpeg/.png) is required.")
 
-    upload_results = await upload_files(files)
+    upload_results = await upload_files_deduplicated(db, files)
 
     if "cover_url" not in upload_results:
         raise HTTPException(status_code=400, detail="Cover upload failed.")
@@ -389,6 +572,7 @@ async def create_playlist_with_cover(
         name=name,
         is_public=is_public,
         cover_url=upload_results["cover_url"],
+        cover_variants=upload_results.get("cover_variants"),
         user_id=user_id
     )
 
@@ -398,21 +582,110 @@ async def create_playlist_with_cover(
     return new_playlist
 
 
-async def get_user_playlists(db: AsyncSession, user_id: UUID) -> list[models.Playlist]:
+async def select_playlists(
+    db: AsyncSession,
+    conditions: list,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
+    """
+    Плейлисты в форме PlaylistRead двумя запросами-проекциями: сами плейлисты и
+    их треки (только поля из fields) — без ORM-объектов и их selectin-связей.
+    """
     result = await db.execute(
-        select(models.Playlist)
-        .where(models.Playlist.user_id == user_id)
-        .options(joinedload(models.Playlist.tracks))
+        select(
+            models.Playlist.id,
+            models.Playlist.name,
+            cover_url_column(models.Playlist, cover_size, cover_format).label("cover_url")
+        ).where(*conditions)
     )
-    return list(result.scalars().unique())
+    playlists = {row["id"]: {**row, "tracks": []} for row in result.mappings()}
+    if not playlists:
+        return []
 
-async def get_public_playlists(db: AsyncSession) -> list[models.Playlist]:
     result = await db.execute(
-        select(models.Playlist)
-        .where(models.Playlist.is_public == True)
-        .options(joinedload(models.Playlist.tracks))
+        select(
+            models.playlist_track.c.playlist_id.label("_playlist_id"),
+            *track_columns(cover_size, cover_format, fields)
+        )
+        .select_from(models.playlist_track)
+        .join(models.Track, models.Track.id == models.playlist_track.c.track_id)
+        .join(models.Playlist, models.Playlist.id == models.playlist_track.c.playlist_id)
+        .where(*conditions)
+    )
+    for row in result.mappings():
+        track = dict(row)
+        playlists[track.pop("_playlist_id")]["tracks"].append(track)
+
+    return list(playlists.values())
+
+async def get_user_playlists(
+    db: AsyncSession,
+    user_id: UUID,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
+    return await select_playlists(
+        db, [models.Playlist.user_id == user_id], cover_size, cover_format, fields
+    )
+
+async def get_public_playlists(
+    db: AsyncSession,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
+    return await select_playlists(
+        db, [models.Playlist.is_public == True], cover_size, cover_format, fields
+    )
+
+async def get_playlist_view(
+    db: AsyncSession,
+    playlist_id: UUID,
+    user_id: UUID,
+    fields: Sequence[str] | None = None
+) -> Optional[dict]:
+    """Плейлист для чтения (проекция); None, если его нет или он недоступен пользователю."""
+    playlists = await select_playlists(
+        db,
+        [
+            models.Playlist.id == playlist_id,
+            or_(models.Playlist.user_id == user_id, models.Playlist.is_public == True),
+        ],
+        fields=fields
     )
-    return result.unique().scalars().all()
+    return playlists[0] if playlists else None
+
+def playlist_versions_query():
+    return (
+        select(
+            models.Playlist.id, row_version(models.Playlist),
+            models.Track.id, row_version(models.Track)
+        )
+        .select_from(models.Playlist)
+        .outerjoin(models.playlist_track, models.playlist_track.c.playlist_id == models.Playlist.id)
+        .outerjoin(models.Track, models.Track.id == models.playlist_track.c.track_id)
+        .order_by(models.Playlist.id, models.Track.id)
+    )
+
+async def get_public_playlists_versions(db: AsyncSession) -> list[tuple]:
+    result = await db.execute(playlist_versions_query().where(models.Playlist.is_public == True))
+    return result.all()
+
+async def get_user_playlists_versions(db: AsyncSession, user_id: UUID) -> list[tuple]:
+    result = await db.execute(playlist_versions_query().where(models.Playlist.user_id == user_id))
+    return result.all()
+
+async def get_playlist_versions(db: AsyncSession, playlist_id: UUID, user_id: UUID) -> list[tuple]:
+    """Пустой список, если плейлиста нет или он недоступен пользователю — как у get_playlist."""
+    result = await db.execute(
+        playlist_versions_query()
+        .where(models.Playlist.id == playlist_id)
+        .where(or_(models.Playlist.user_id == user_id, models.Playlist.is_public == True))
+    )
+    return result.all()
 
 async def get_playlist(db: AsyncSession, playlist_id: UUID, user_id: UUID) -> Optional[models.Playlist]:
     result = await db.execute(
@@ -478,17 +751,16 @@ async def update_playlist_cover_with_file(
     if user_role != "Administrator" and playlist.user_id != user_id:
         raise HTTPException(status_code=403, detail="You do not have permission to edit this playlist")
 
-    upload_result = await upload_files([file])
+    upload_result = await upload_files_deduplicated(db, [file])
     new_cover_url = upload_result.get("cover_url")
 
     if not new_cover_url:
         raise HTTPException(status_code=400, detail="Cover upload failed.")
 
-    if playlist.cover_url:
-        old_key = extract_key(playlist.cover_url)
-        delete_file(old_key)
+    await release_object(db, playlist.cover_url, playlist.cover_variants)
 
     playlist.cover_url = new_cover_url
+    playlist.cover_variants = upload_result.get("cover_variants")
     await db.commit()
     await db.refresh(playlist)
     return playlist
@@ -531,6 +803,8 @@ async def delete_playlist(db: AsyncSession, playlist_id: UUID, user_id: UUID) ->
     if not playlist:
         return False
 
+    await release_object(db, playlist.cover_url, playlist.cover_variants)
+
     await db.delete(playlist)
     await db.commit()
     return True
@@ -557,13 +831,30 @@ async def remove_from_favorites(db: AsyncSession, user_id: UUID, track_id: UUID)
     await db.commit()
     return result.rowcount > 0
 
-async def get_user_favorites(db: AsyncSession, user_id: UUID) -> list[models.Track]:
+async def get_user_favorites(
+    db: AsyncSession,
+    user_id: UUID,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
     result = await db.execute(
-        select(models.Track)
+        select(*track_columns(cover_size, cover_format, fields))
         .join(models.FavoriteTrack, models.FavoriteTrack.track_id == models.Track.id)
         .where(models.FavoriteTrack.user_id == user_id)
     )
-    return result.scalars().all()
+    return [dict(row) for row in result.mappings()]
+
+
+async def get_user_favorites_versions(db: AsyncSession, user_id: UUID) -> list[tuple]:
+    result = await db.execute(
+        select(models.FavoriteTrack.id, models.Track.id, row_version(models.Track))
+        .select_from(models.FavoriteTrack)
+        .join(models.Track, models.Track.id == models.FavoriteTrack.track_id)
+        .where(models.FavoriteTrack.user_id == user_id)
+        .order_by(models.FavoriteTrack.id)
+    )
+    return result.all()
 
 
 # ─────────── PLAY HISTORY ─────────── #
@@ -618,17 +909,34 @@ async def get_recent_play_history(
     db: AsyncSession,
     user_id: UUID,
     limit: int = 20,
-    offset: int = 0
-) -> list[schemas.PlayHistoryResponse]:
+    offset: int = 0,
+    cover_size: int | None = None,
+    cover_format: str = "webp",
+    fields: Sequence[str] | None = None
+) -> list[dict]:
+    track_fields = fields or TRACK_FIELDS
     result = await db.execute(
-        select(models.PlayHistory)
+        select(
+            models.PlayHistory.id,
+            models.PlayHistory.user_id,
+            models.PlayHistory.track_id,
+            models.PlayHistory.timestamp,
+            models.PlayHistory.played_duration,
+            *track_columns(cover_size, cover_format, track_fields, prefix="track__")
+        )
+        .join(models.Track, models.Track.id == models.PlayHistory.track_id)
         .where(models.PlayHistory.user_id == user_id)
         .order_by(models.PlayHistory.timestamp.desc())
         .offset(offset)
         .limit(limit)
-        .options(joinedload(models.PlayHistory.track))
     )
-    return result.scalars().all()
+
+    entries = []
+    for row in result.mappings():
+        entry = {name: row[name] for name in ("id", "user_id", "track_id", "timestamp", "played_duration")}
+        entry["track"] = {name: row["track__" + name] for name in track_fields}
+        entries.append(entry)
+    return entries
 
 # ─────────── ALBUM ─────────── #
 
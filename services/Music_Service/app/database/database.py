@@ -1,4 +1,4 @@
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.schema import CreateSchema
@@ -7,9 +7,10 @@ from typing import AsyncGenerator
 
 
 class Database_Initializer():
-    def __init__(self, base, schema):
+    def __init__(self, base, schema, upgrades=()):
         self.base = base
         self.schema = schema
+        self.upgrades = upgrades
         self.__async_session_maker = None
 
     def get_schema(self):
@@ -32,6 +33,11 @@ class Database_Initializer():
 
             # create metadata
             await connection.run_sync(self.base.metadata.create_all)
+
+            # create_all создаёт только недостающие таблицы, новые колонки
+            # в уже существующих добавляем сами
+            for statement in self.upgrades:
+                await connection.execute(text(statement))
             await connection.commit()
 
     @property
@@ -40,8 +46,14 @@ class Database_Initializer():
 
 
 SCHEMA = "music"
+# колонки, появившиеся после первого релиза схемы; каждая команда идемпотентна
+UPGRADES = (
+    f"ALTER TABLE {SCHEMA}.tracks ADD COLUMN IF NOT EXISTS hls_url VARCHAR",
+    f"ALTER TABLE {SCHEMA}.tracks ADD COLUMN IF NOT EXISTS cover_variants JSONB",
+    f"ALTER TABLE {SCHEMA}.playlists ADD COLUMN IF NOT EXISTS cover_variants JSONB",
+)
 Base = declarative_base()
-db_initializer = Database_Initializer(Base, SCHEMA)
+db_initializer = Database_Initializer(Base, SCHEMA, UPGRADES)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -1,7 +1,7 @@
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 
-from sqlalchemy import Column, String, Integer, Float, Table, ForeignKey, DateTime, func, UniqueConstraint, Boolean
+from sqlalchemy import Column, String, Integer, Float, Table, ForeignKey, DateTime, func, UniqueConstraint, Boolean, LargeBinary
 from sqlalchemy.orm import relationship
 
 from .database import Base, SCHEMA
@@ -39,7 +39,9 @@ class Track(Base):
     mood = Column(PgEnum(MoodEnum, name="mood_enum", create_type=True), nullable=True)
     release_year = Column(Integer)
     track_url = Column(String, nullable=False)
+    hls_url = Column(String, nullable=True)
     cover_url = Column(String, nullable=True)
+    cover_variants = Column(JSONB, nullable=True)
 
     albums = relationship(
         "Album",
@@ -54,6 +56,34 @@ class Track(Base):
         lazy="selectin"
     )
 
+class TrackWaveform(Base):
+    __tablename__ = "track_waveforms"
+    __table_args__ = {'schema': 'music'}
+
+    track_id = Column(UUID(as_uuid=True), ForeignKey("music.tracks.id", ondelete="CASCADE"), primary_key=True)
+    peaks = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StoredObject(Base):
+    __tablename__ = "stored_objects"
+    __table_args__ = {'schema': 'music'}
+
+    content_hash = Column(String(64), primary_key=True)
+    object_key = Column(String, nullable=False, unique=True)
+    ref_count = Column(Integer, nullable=False, default=1)
+    cover_variants = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StorageDeletion(Base):
+    __tablename__ = "storage_deletions"
+    __table_args__ = {'schema': 'music'}
+
+    object_key = Column(String, primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Playlist(Base):
     __tablename__ = "playlists"
     __table_args__ = {'schema': 'music'}
@@ -64,6 +94,7 @@ class Playlist(Base):
     user_id = Column(UUID(as_uuid=True), nullable=True, index=True)
     is_public = Column(Boolean, default=False)
     cover_url = Column(String, nullable=True)
+    cover_variants = Column(JSONB, nullable=True)
 
     tracks = relationship(
         "Track",
@@ -0,0 +1,144 @@
+import math
+import struct
+
+SEGMENT_DURATION = 6.0
+
+# Битрейты Layer III (кбит/с) по индексу из заголовка кадра
+MPEG1_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0)
+MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0)
+MPEG1_SAMPLE_RATES = (44100, 48000, 32000)
+
+TIMESTAMP_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+
+def parse_frame_header(header: bytes) -> tuple[int, int, int] | None:
+    """
+    Разбирает 4-байтовый заголовок кадра MPEG Layer III.
+    Возвращает (длина кадра в байтах, сэмплов в кадре, частота дискретизации)
+    или None, если это не заголовок кадра.
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version == 1 or layer != 1 or sample_rate_index == 3:
+        return None
+    if bitrate_index in (0, 15):
+        return None
+
+    if version == 3:
+        bitrate = MPEG1_BITRATES[bitrate_index] * 1000
+        sample_rate = MPEG1_SAMPLE_RATES[sample_rate_index]
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        bitrate = MPEG2_BITRATES[bitrate_index] * 1000
+        sample_rate = MPEG1_SAMPLE_RATES[sample_rate_index] // (2 if version == 2 else 4)
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    return frame_length, samples, sample_rate
+
+
+def skip_id3v2(content: bytes) -> int:
+    if len(content) < 10 or content[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in content[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if content[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def iter_frames(content: bytes):
+    """
+    Итерирует по кадрам MP3: (смещение, длина, длительность в секундах).
+    Мусор между кадрами и ID3-теги пропускаются поиском следующего синхрослова.
+    """
+    position = skip_id3v2(content)
+    end = len(content)
+
+    while position + 4 <= end:
+        parsed = parse_frame_header(content[position:position + 4])
+        if parsed is None or position + parsed[0] > end:
+            position = content.find(b"\xff", position + 1)
+            if position == -1:
+                return
+            continue
+
+        frame_length, samples, sample_rate = parsed
+        yield position, frame_length, samples / sample_rate
+        position += frame_length
+
+
+def timestamp_tag(seconds: float) -> bytes:
+    """
+    ID3v2.4 тег с PRIV-фреймом com.apple.streaming.transportStreamTimestamp —
+    обязательная метка времени первого сэмпла для packed audio сегментов HLS.
+    """
+    pts = int(round(seconds * 90000)) & ((1 << 33) - 1)
+    data = TIMESTAMP_OWNER + struct.pack(">Q", pts)
+    frame = b"PRIV" + syncsafe(len(data)) + b"\x00\x00" + data
+    return b"ID3\x04\x00\x00" + syncsafe(len(frame)) + frame
+
+
+def syncsafe(value: int) -> bytes:
+    return bytes(((value >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+
+def segment_mp3(content: bytes, target_duration: float = SEGMENT_DURATION) -> tuple[str, list[bytes]]:
+    """
+    Режет MP3 по границам кадров на сегменты ~target_duration секунд без перекодирования.
+    Возвращает текст медиаплейлиста (сегменты адресуются относительно него как NNNNN.mp3)
+    и содержимое сегментов.
+    """
+    segments: list[bytes] = []
+    durations: list[float] = []
+
+    segment_start = None
+    segment_end = 0
+    segment_duration = 0.0
+    elapsed = 0.0
+
+    for offset, length, duration in iter_frames(content):
+        if segment_start is None:
+            segment_start = offset
+        elif offset != segment_end or segment_duration >= target_duration:
+            segments.append(timestamp_tag(elapsed) + content[segment_start:segment_end])
+            durations.append(segment_duration)
+            elapsed += segment_duration
+            segment_start = offset
+            segment_duration = 0.0
+
+        segment_end = offset + length
+        segment_duration += duration
+
+    if segment_start is not None:
+        segments.append(timestamp_tag(elapsed) + content[segment_start:segment_end])
+        durations.append(segment_duration)
+
+    if not segments:
+        raise ValueError("No MPEG Layer III frames found")
+
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(durations))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for index, duration in enumerate(durations):
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(segment_name(index))
+    lines.append("#EXT-X-ENDLIST")
+
+    return "\n".join(lines) + "\n", segments
+
+
+def segment_name(index: int) -> str:
+    return f"{index:05d}.mp3"
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+
+from .config import load_config
+from .database import db_initializer, models
+from .hls import segment_mp3
+from .logging_setup import setup_logging
+from .storage import extract_key, process_executor, executor, upload_hls, download_bytes_sync
+from .storage import cover_variant_keys, delete_objects_sync, iter_objects
+from .waveform import compute_peaks
+
+logger = logging.getLogger(__name__)
+
+GC_BATCH_SIZE = 1000
+GC_INTERVAL = 10
+GC_RETRY_BASE = 30
+GC_RETRY_MAX = 6 * 60 * 60
+SWEEP_INTERVAL = 24 * 60 * 60
+# объекты моложе этого возраста не считаются сиротами: запись в БД может быть ещё не закоммичена
+SWEEP_GRACE_PERIOD = timedelta(hours=24)
+SWEEP_PREFIXES = ("music/", "images/")
+
+
+async def generate_hls(track_id: UUID, content: bytes) -> None:
+    """
+    Пост-обработка загруженного трека: нарезка MP3 на HLS-сегменты
+    и публикация плейлиста рядом с оригиналом (music/<uuid>/playlist.m3u8).
+    """
+    loop = asyncio.get_event_loop()
+
+    async with db_initializer.async_session_maker() as session:
+        track = await session.get(models.Track, track_id)
+        if track is None:
+            return
+
+        # дедуплицированный MP3 уже мог быть нарезан для другого трека
+        result = await session.execute(
+            select(models.Track.hls_url)
+            .where(models.Track.track_url == track.track_url)
+            .where(models.Track.hls_url.is_not(None))
+            .limit(1)
+        )
+        existing_hls_url = result.scalar_one_or_none()
+        if existing_hls_url:
+            track.hls_url = existing_hls_url
+            await session.commit()
+            return
+
+        try:
+            playlist, segments = await loop.run_in_executor(process_executor, segment_mp3, content)
+        except ValueError as e:
+            logger.warning(f"[hls] Track {track_id} was not segmented: {e}")
+            return
+
+        base_path = extract_key(track.track_url).rsplit(".", 1)[0] + "/"
+        try:
+            track.hls_url = await upload_hls(base_path, playlist, segments)
+        except Exception as e:
+            logger.error(f"[hls] Failed to upload segments for track {track_id}: {e}")
+            return
+
+        await session.commit()
+        logger.info(f"[hls] Track {track_id} segmented into {len(segments)} segments")
+
+
+async def generate_waveform(track_id: UUID, content: bytes) -> None:
+    """
+    Считает пики огибающей трека в пуле процессов и сохраняет их в music.track_waveforms.
+    """
+    loop = asyncio.get_event_loop()
+
+    async with db_initializer.async_session_maker() as session:
+        track = await session.get(models.Track, track_id)
+        if track is None:
+            return
+
+        result = await session.execute(
+            select(models.TrackWaveform.peaks)
+            .join(models.Track, models.Track.id == models.TrackWaveform.track_id)
+            .where(models.Track.track_url == track.track_url)
+            .limit(1)
+        )
+        peaks = result.scalar_one_or_none()
+
+        if peaks is None:
+            try:
+                peaks = await loop.run_in_executor(process_executor, compute_peaks, content)
+            except Exception as e:
+                logger.warning(f"[waveform] Track {track_id} was not decoded: {e}")
+                return
+
+        await session.merge(models.TrackWaveform(track_id=track_id, peaks=peaks))
+        await session.commit()
+
+
+async def backfill_waveforms(batch_size: int = 20) -> int:
+    """
+    Проходит по music.tracks (keyset по id) и считает пики для треков без них.
+    Возвращает количество обработанных треков.
+    """
+    loop = asyncio.get_event_loop()
+    processed = 0
+    last_id = None
+
+    async def process(track_id: UUID, track_url: str) -> bool:
+        try:
+            content = await loop.run_in_executor(executor, download_bytes_sync, extract_key(track_url))
+        except Exception as e:
+            logger.error(f"[waveform] Failed to download track {track_id}: {e}")
+            return False
+        await generate_waveform(track_id, content)
+        return True
+
+    while True:
+        async with db_initializer.async_session_maker() as session:
+            query = (
+                select(models.Track.id, models.Track.track_url)
+                .outerjoin(models.TrackWaveform, models.TrackWaveform.track_id == models.Track.id)
+                .where(models.TrackWaveform.track_id.is_(None))
+                .order_by(models.Track.id)
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.where(models.Track.id > last_id)
+            rows = (await session.execute(query)).all()
+
+        if not rows:
+            break
+
+        results = await asyncio.gather(*(process(track_id, track_url) for track_id, track_url in rows))
+        processed += sum(results)
+        last_id = rows[-1].id
+        logger.info(f"[waveform] Backfilled {processed} tracks")
+
+    return processed
+
+
+async def drain_deletion_queue(batch_size: int = GC_BATCH_SIZE) -> int:
+    """
+    Забирает из music.storage_deletions до batch_size готовых к удалению ключей
+    (SKIP LOCKED, чтобы несколько воркеров не делили одну пачку) и удаляет их
+    одним delete_objects. Неудачные ключи откладываются с экспоненциальной задержкой.
+    Возвращает размер обработанной пачки.
+    """
+    loop = asyncio.get_event_loop()
+
+    async with db_initializer.async_session_maker() as session:
+        result = await session.execute(
+            select(models.StorageDeletion)
+            .where(models.StorageDeletion.next_attempt_at <= func.now())
+            .order_by(models.StorageDeletion.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        entries = result.scalars().all()
+        if not entries:
+            return 0
+
+        keys = [entry.object_key for entry in entries]
+        try:
+            errors = await loop.run_in_executor(executor, delete_objects_sync, keys)
+        except Exception as e:
+            errors = {key: str(e) for key in keys}
+
+        now = datetime.now(timezone.utc)
+        for entry in entries:
+            if entry.object_key not in errors:
+                continue
+            entry.attempts += 1
+            entry.last_error = errors[entry.object_key][:1000]
+            delay = min(GC_RETRY_BASE * 2 ** entry.attempts, GC_RETRY_MAX)
+            entry.next_attempt_at = now + timedelta(seconds=delay)
+
+        deleted = [key for key in keys if key not in errors]
+        if deleted:
+            await session.execute(
+                delete(models.StorageDeletion).where(models.StorageDeletion.object_key.in_(deleted))
+            )
+        await session.commit()
+
+    if errors:
+        logger.warning(f"[gc] {len(errors)} of {len(keys)} objects failed to delete, will retry")
+    return len(keys)
+
+
+async def referenced_keys() -> tuple[set[str], set[str]]:
+    """
+    Собирает ключи хранилища, на которые ссылается БД, и префиксы HLS-каталогов.
+    """
+    keys: set[str] = set()
+    hls_prefixes: set[str] = set()
+
+    def add_url(url: str | None) -> None:
+        if url:
+            keys.add(extract_key(url))
+
+    async with db_initializer.async_session_maker() as session:
+        tracks = await session.stream(
+            select(models.Track.track_url, models.Track.cover_url, models.Track.cover_variants, models.Track.hls_url)
+        )
+        async for track_url, cover_url, cover_variants, hls_url in tracks:
+            add_url(track_url)
+            add_url(cover_url)
+            keys.update(cover_variant_keys(cover_variants))
+            if hls_url:
+                hls_prefixes.add(extract_key(hls_url).rsplit("/", 1)[0] + "/")
+
+        playlists = await session.stream(select(models.Playlist.cover_url, models.Playlist.cover_variants))
+        async for cover_url, cover_variants in playlists:
+            add_url(cover_url)
+            keys.update(cover_variant_keys(cover_variants))
+
+        album_covers = await session.stream_scalars(select(models.Album.cover_url))
+        async for cover_url in album_covers:
+            add_url(cover_url)
+
+        stored = await session.stream(
+            select(models.StoredObject.object_key, models.StoredObject.cover_variants)
+        )
+        async for object_key, cover_variants in stored:
+            keys.add(object_key)
+            keys.update(cover_variant_keys(cover_variants))
+
+    return keys, hls_prefixes
+
+
+def find_orphans_sync(prefix: str, keys: set[str], hls_prefixes: set[str], cutoff: datetime) -> list[str]:
+    orphans = []
+    for obj in iter_objects(prefix):
+        key = obj["Key"]
+        if obj["LastModified"] > cutoff or key in keys:
+            continue
+        if key.rsplit("/", 1)[0] + "/" in hls_prefixes:
+            continue
+        orphans.append(key)
+    return orphans
+
+
+async def sweep_orphans() -> int:
+    """
+    Сверяет music/ и images/ с БД и ставит в очередь на удаление объекты,
+    на которые ничего не ссылается (в т.ч. HLS-сегменты удалённых треков).
+    """
+    loop = asyncio.get_event_loop()
+    keys, hls_prefixes = await referenced_keys()
+    cutoff = datetime.now(timezone.utc) - SWEEP_GRACE_PERIOD
+
+    orphans: list[str] = []
+    for prefix in SWEEP_PREFIXES:
+        orphans += await loop.run_in_executor(
+            executor, find_orphans_sync, prefix, keys, hls_prefixes, cutoff
+        )
+
+    async with db_initializer.async_session_maker() as session:
+        for start in range(0, len(orphans), GC_BATCH_SIZE):
+            await session.execute(
+                insert(models.StorageDeletion)
+                .values([{"object_key": key} for key in orphans[start:start + GC_BATCH_SIZE]])
+                .on_conflict_do_nothing()
+            )
+        await session.commit()
+
+    logger.info(f"[gc] Orphan sweep queued {len(orphans)} objects")
+    return len(orphans)
+
+
+async def run_storage_gc() -> None:
+    """
+    Фоновый цикл сборщика: разбирает очередь удаления и раз в SWEEP_INTERVAL ищет сирот.
+    """
+    last_sweep = time.monotonic()
+    while True:
+        try:
+            while await drain_deletion_queue() == GC_BATCH_SIZE:
+                pass
+            if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                await sweep_orphans()
+        except Exception as e:
+            logger.error(f"[gc] Storage garbage collection failed: {e}")
+        await asyncio.sleep(GC_INTERVAL)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await db_initializer.init_db(str(load_config().PG_ASYNC_DSN))
+    if args.job == "waveforms":
+        await backfill_waveforms(args.batch_size)
+    elif args.job == "sweep-orphans":
+        await sweep_orphans()
+        while await drain_deletion_queue() == GC_BATCH_SIZE:
+            pass
+
+
+if __name__ == "__main__":
+    setup_logging(f"{load_config().SERVICE_NAME}-jobs")
+    parser = argparse.ArgumentParser(description="Music service backfill jobs")
+    parser.add_argument("job", choices=["waveforms", "sweep-orphans"])
+    parser.add_argument("--batch-size", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -41,6 +41,7 @@ class TrackResponse(TrackBase):
     Схема для возврата данных пользователю
     """
     id: UUID
+    hls_url: Optional[HttpUrl] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,36 @@
+"""
+Быстрый путь сериализации для списочных эндпоинтов.
+
+Списки (треки, плейлисты, история) приходят из crud уже словарями из SQL-проекции (URL собраны
+в запросе), поэтому Pydantic-валидация и jsonable_encoder для них не нужны:
+ответ сразу кодируется orjson, который сам понимает UUID, Enum и datetime.
+"""
+import orjson
+from fastapi import Response
+
+# Z для UTC — так же, как datetime сериализует Pydantic
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+# заголовки тела вычисляет сам ответ, из служебного Response их не переносим
+BODY_HEADERS = {"content-length", "content-type"}
+
+
+class ORJSONListResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def fast_json(content, response: Response | None = None) -> ORJSONListResponse:
+    """
+    Отдаёт content через orjson в обход response_model. Заголовки, которые эндпоинт
+    выставил во внедрённый Response (ETag, Cache-Control), переносятся в ответ.
+    """
+    headers = None
+    if response is not None:
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name not in BODY_HEADERS
+        }
+    return ORJSONListResponse(content, headers=headers)
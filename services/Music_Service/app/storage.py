@@ -1,7 +1,11 @@
 import asyncio
+import hashlib
+import json
+import logging
 import os
+import urllib.parse
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from io import BytesIO
 from typing import List
 
@@ -9,6 +13,9 @@ from fastapi import UploadFile, HTTPException
 from fastapi.responses import FileResponse
 
 from .core.config import *
+from .covers import render_cover_variants, CONTENT_TYPES, EXTENSIONS
+from .hls import segment_name
+from .metrics import observe_storage_upload
 
 from mutagen.mp3 import MP3
 from tempfile import NamedTemporaryFile
@@ -18,6 +25,11 @@ load_dotenv(dotenv_path=dotenv_path)
 
 STORAGE_BASE_URL = os.environ.get("STORAGE_BASE_URL")
 
+logger = logging.getLogger(__name__)
+
+def extract_key(url: str) -> str:
+    return urllib.parse.unquote(url.replace(STORAGE_BASE_URL, ""))
+
 # async def list_files():
 #     try:
 #         async with get_s3_client() as s3:
@@ -61,14 +73,47 @@ STORAGE_BASE_URL = os.environ.get("STORAGE_BASE_URL")
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
 
-def list_files():
-    try:
-        response = s3.list_objects(Bucket=BUCKET_NAME)
-        if "Contents" in response:
-            return [obj["Key"] for obj in response["Contents"]]
-        return []
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+LIST_PAGE_SIZE = 1000
+
+def list_files(prefix: str = "", continuation_token: str | None = None, max_keys: int | None = None):
+    """
+    Постранично обходит бакет через list_objects_v2 и отдаёт объекты NDJSON-строками.
+    Если обход остановлен по max_keys, последней строкой отдаётся next_continuation_token.
+    Ошибка до первой строки поднимается HTTPException; после начала ответа статус уже
+    отправлен, поэтому последней строкой отдаются error и next_continuation_token
+    страницы, на которой обход прервался, — с него листинг можно продолжить.
+    """
+    params = {"Bucket": BUCKET_NAME, "Prefix": prefix}
+    if continuation_token:
+        params["ContinuationToken"] = continuation_token
+    listed = 0
+
+    while True:
+        page_size = LIST_PAGE_SIZE if max_keys is None else min(LIST_PAGE_SIZE, max_keys - listed)
+        try:
+            response = s3.list_objects_v2(**params, MaxKeys=page_size)
+        except Exception as e:
+            if not listed:
+                raise HTTPException(status_code=500, detail=str(e))
+            logger.error(f"[storage] Listing of '{prefix}' failed after {listed} keys: {e}")
+            yield json.dumps({"error": str(e), "next_continuation_token": params.get("ContinuationToken")}) + "\n"
+            return
+
+        for obj in response.get("Contents", []):
+            yield json.dumps({
+                "key": obj["Key"],
+                "size": obj["Size"],
+                "last_modified": obj["LastModified"].isoformat(),
+            }) + "\n"
+        listed += response.get("KeyCount", 0)
+
+        next_token = response.get("NextContinuationToken")
+        if not response.get("IsTruncated") or not next_token:
+            return
+        if max_keys is not None and listed >= max_keys:
+            yield json.dumps({"next_continuation_token": next_token}) + "\n"
+            return
+        params["ContinuationToken"] = next_token
 
 def generate_presigned_url(file_path: str) -> str:
     try:
@@ -81,17 +126,33 @@ def generate_presigned_url(file_path: str) -> str:
         raise HTTPException(status_code=500, detail=str(e))
 
 executor = ThreadPoolExecutor(max_workers=40)
+process_executor = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2))
 
-def upload_file_sync(content: bytes, filename: str) -> tuple[str, str]:
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def upload_target(filename: str) -> tuple[str, str]:
     ext = filename.split('.')[-1].lower()
     if ext == "mp3":
-        folder = "music/"
-        key = "track_url"
+        return "music/", "track_url"
     elif ext in ["jpg", "jpeg", "png"]:
-        folder = "images/"
-        key = "cover_url"
-    else:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+        return "images/", "cover_url"
+    raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+
+async def read_upload(file: UploadFile) -> tuple[bytes, str]:
+    """
+    Читает загружаемый файл чанками, попутно считая SHA-256 содержимого.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        chunks.append(chunk)
+    file.file.seek(0)
+    return b"".join(chunks), digest.hexdigest()
+
+def upload_file_sync(content: bytes, filename: str) -> tuple[str, str]:
+    ext = filename.split('.')[-1].lower()
+    folder, key = upload_target(filename)
 
     content_type_map = {
         "mp3": "audio/mpeg",
@@ -108,30 +169,78 @@ def upload_file_sync(content: bytes, filename: str) -> tuple[str, str]:
         temp_path = temp_file.name
 
     try:
-        s3.upload_file(
-            Filename=temp_path,
-            Bucket=BUCKET_NAME,
-            Key=file_path,
-            ExtraArgs={"ContentType": content_type_map[ext]}
-        )
+        with observe_storage_upload(len(content)):
+            s3.upload_file(
+                Filename=temp_path,
+                Bucket=BUCKET_NAME,
+                Key=file_path,
+                ExtraArgs={"ContentType": content_type_map[ext]}
+            )
     finally:
         os.remove(temp_path)
 
     return key, STORAGE_BASE_URL + file_path
 
-async def upload_files(files: list[UploadFile]) -> dict[str, str]:
+async def upload_contents(file_data: list[tuple[bytes, str]]) -> dict[str, str | dict]:
     loop = asyncio.get_event_loop()
-    file_data = []
-    for file in files:
-        content = await file.read()
-        file_data.append((content, file.filename))
-        file.file.seek(0)
-
     tasks = [loop.run_in_executor(executor, upload_file_sync, content, filename)
              for content, filename in file_data]
+    images = [content for content, filename in file_data
+              if filename.split('.')[-1].lower() in ["jpg", "jpeg", "png"]]
+    if images:
+        tasks.append(upload_cover_variants(images[0]))
+
     results = await asyncio.gather(*tasks)
     return {k: v for k, v in results}
 
+def put_object_sync(content: bytes, file_path: str, content_type: str) -> str:
+    with observe_storage_upload(len(content)):
+        s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=file_path,
+            Body=content,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable"
+        )
+    return STORAGE_BASE_URL + file_path
+
+async def upload_cover_variants(content: bytes) -> tuple[str, dict[str, dict[str, str]]]:
+    loop = asyncio.get_event_loop()
+    try:
+        rendered = await loop.run_in_executor(process_executor, render_cover_variants, content)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cover image: {e}")
+
+    base_name = uuid.uuid4()
+    uploads = []
+    for size, formats in rendered.items():
+        for fmt, data in formats.items():
+            file_path = f"images/{base_name}_{size}.{EXTENSIONS[fmt]}"
+            uploads.append((size, fmt, loop.run_in_executor(
+                executor, put_object_sync, data, file_path, CONTENT_TYPES[fmt]
+            )))
+
+    urls = await asyncio.gather(*(task for _, _, task in uploads))
+
+    cover_variants: dict[str, dict[str, str]] = {}
+    for (size, fmt, _), url in zip(uploads, urls):
+        cover_variants.setdefault(size, {})[fmt] = url
+    return "cover_variants", cover_variants
+
+async def upload_hls(base_path: str, playlist: str, segments: list[bytes]) -> str:
+    loop = asyncio.get_event_loop()
+    tasks = [
+        loop.run_in_executor(executor, put_object_sync, segment, f"{base_path}{segment_name(i)}", "audio/mpeg")
+        for i, segment in enumerate(segments)
+    ]
+    await asyncio.gather(*tasks)
+
+    # плейлист публикуется последним, чтобы не ссылаться на недозагруженные сегменты
+    return await loop.run_in_executor(
+        executor, put_object_sync, playlist.encode(), f"{base_path}playlist.m3u8",
+        "application/vnd.apple.mpegurl"
+    )
+
 async def extract_duration(file: UploadFile) -> float:
     content = await file.read()
     audio = MP3(BytesIO(content))
@@ -206,9 +315,28 @@ def download_file(file_path: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def delete_file(file_path: str):
-    try:
-        s3.delete_object(Bucket=BUCKET_NAME, Key=file_path)
-        return {"message": f"The file {file_path} has been deleted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def download_bytes_sync(file_path: str) -> bytes:
+    return s3.get_object(Bucket=BUCKET_NAME, Key=file_path)["Body"].read()
+
+def cover_variant_keys(cover_variants: dict[str, dict[str, str]] | None) -> list[str]:
+    if not cover_variants:
+        return []
+    return [extract_key(url) for formats in cover_variants.values() for url in formats.values()]
+
+def delete_objects_sync(keys: list[str]) -> dict[str, str]:
+    """
+    Пакетно удаляет до 1000 объектов одним запросом. Возвращает ошибки по ключам.
+    """
+    response = s3.delete_objects(
+        Bucket=BUCKET_NAME,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+    )
+    return {
+        error["Key"]: f"{error.get('Code')}: {error.get('Message')}"
+        for error in response.get("Errors", [])
+    }
+
+def iter_objects(prefix: str = ""):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        yield from page.get("Contents", [])
@@ -0,0 +1,31 @@
+import miniaudio
+import numpy as np
+
+PEAKS_BUCKETS = 1000
+# для огибающей хватает низкой частоты дискретизации, а декодирование идёт в разы быстрее
+DECODE_SAMPLE_RATE = 11025
+
+
+def compute_peaks(content: bytes, buckets: int = PEAKS_BUCKETS) -> bytes:
+    """
+    Декодирует MP3 в моно и возвращает `buckets` пиков амплитуды в виде int8 (0..127),
+    нормированных на максимум трека.
+    """
+    decoded = miniaudio.decode(
+        content,
+        output_format=miniaudio.SampleFormat.SIGNED16,
+        nchannels=1,
+        sample_rate=DECODE_SAMPLE_RATE
+    )
+    samples = np.abs(np.frombuffer(decoded.samples, dtype=np.int16).astype(np.int32))
+
+    if samples.size < buckets:
+        samples = np.pad(samples, (0, buckets - samples.size))
+
+    edges = np.linspace(0, samples.size, buckets + 1, dtype=np.int64)[:-1]
+    peaks = np.maximum.reduceat(samples, edges)
+
+    loudest = int(peaks.max())
+    if loudest == 0:
+        return bytes(buckets)
+    return (peaks * 127 // loudest).astype(np.int8).tobytes()
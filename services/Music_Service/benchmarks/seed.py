@@ -0,0 +1,57 @@
+import sys
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import db_initializer
+from app.storage import STORAGE_BASE_URL
+
+# общий генератор данных лежит в services/datagen
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from datagen import DatasetSpec, generate_dataset, load_dataset  # noqa: E402
+from datagen.generator import TITLE_WORDS  # noqa: E402
+from datagen.loader import as_uuids  # noqa: E402
+
+
+@dataclass
+class Catalog:
+    track_ids: list[uuid.UUID] = field(default_factory=list)
+    user_ids: list[uuid.UUID] = field(default_factory=list)
+    playlists: dict[uuid.UUID, uuid.UUID] = field(default_factory=dict)
+    search_terms: tuple[str, ...] = TITLE_WORDS
+
+
+async def reset_schema(dsn: str) -> None:
+    """Пересоздаёт схему music в бенчмарк-базе и инициализирует db_initializer."""
+    engine = create_async_engine(dsn)
+    async with engine.begin() as connection:
+        await connection.execute(text("DROP SCHEMA IF EXISTS music CASCADE"))
+        await connection.execute(text("DROP TYPE IF EXISTS genre_enum, mood_enum CASCADE"))
+    await engine.dispose()
+    await db_initializer.init_db(dsn)
+
+
+async def seed_catalog(dsn: str, tracks: int, users: int, seed: int = 42) -> tuple[Catalog, dict]:
+    """
+    Генерирует синтетический каталог (datagen) и грузит его через COPY.
+    Бенчмарк ходит от имени пользователей, у которых есть плейлисты.
+    Объекты хранилища не создаются — списочные эндпоинты их не читают.
+    """
+    dataset = generate_dataset(DatasetSpec(tracks=tracks, users=users, seed=seed))
+    stats = await load_dataset(dsn, dataset, base_url=STORAGE_BASE_URL or "https://storage.local/")
+
+    owners, first_playlist = np.unique(dataset.playlist_users, return_index=True)
+    user_ids = as_uuids(dataset.user_ids[owners])
+    playlist_ids = as_uuids(dataset.playlist_ids[first_playlist])
+
+    catalog = Catalog(
+        track_ids=as_uuids(dataset.track_ids),
+        user_ids=user_ids,
+        playlists=dict(zip(user_ids, playlist_ids)),
+    )
+    return catalog, stats
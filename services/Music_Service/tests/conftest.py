@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+# storage читает адрес хранилища при импорте app
+os.environ.setdefault("STORAGE_BASE_URL", "https://storage.local/")
+
+import pytest  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app import storage  # noqa: E402
+from app.database import db_initializer  # noqa: E402
+
+from .stubs import InMemoryS3  # noqa: E402
+
+# тесты с БД идут против отдельной базы Postgres: схема music пересоздаётся перед каждым
+TEST_PG_DSN = os.environ.get("TEST_PG_DSN")
+
+
+async def reset_schema(dsn: str) -> None:
+    engine = create_async_engine(dsn)
+    async with engine.begin() as connection:
+        await connection.execute(text("DROP SCHEMA IF EXISTS music CASCADE"))
+        await connection.execute(text("DROP TYPE IF EXISTS genre_enum, mood_enum CASCADE"))
+    await engine.dispose()
+    await db_initializer.init_db(dsn)
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутины теста в одном event loop поверх пустой схемы music."""
+    if not TEST_PG_DSN:
+        pytest.skip("TEST_PG_DSN is not set")
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(reset_schema(TEST_PG_DSN))
+    yield loop.run_until_complete
+    loop.run_until_complete(db_initializer.async_session_maker.kw["bind"].dispose())
+    loop.close()
+
+
+@pytest.fixture
+def s3(monkeypatch) -> InMemoryS3:
+    client = InMemoryS3()
+    monkeypatch.setattr(storage, "s3", client)
+    return client
+
@@ -0,0 +1,100 @@
+import struct
+import threading
+from datetime import datetime, timezone
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+from PIL import Image
+
+# MPEG-1 Layer III, 128 кбит/с, 44.1 кГц, без CRC: кадр 417 байт, 1152 сэмпла
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME_LENGTH = 417
+
+
+class InMemoryS3:
+    """
+    Минимальная замена boto3-клиента S3 для тех вызовов, что делает app.storage.
+    Потокобезопасна: клиент вызывается из пула потоков.
+    """
+
+    def __init__(self) -> None:
+        self.objects: dict[str, tuple[bytes, datetime]] = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[Key] = (bytes(Body), datetime.now(timezone.utc))
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, "rb") as file:
+            self.put_object(Bucket, Key, file.read())
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            entry = self.objects.get(Key)
+        if entry is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        return {"Body": BytesIO(entry[0]), "ContentLength": len(entry[0])}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        with self._lock:
+            for obj in Delete["Objects"]:
+                self.objects.pop(obj["Key"], None)
+        return {"Errors": []}
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None):
+        with self._lock:
+            keys = sorted(key for key in self.objects if key.startswith(Prefix))
+            if ContinuationToken:
+                keys = [key for key in keys if key > ContinuationToken]
+            page = keys[:MaxKeys]
+            contents = [
+                {"Key": key, "Size": len(self.objects[key][0]), "LastModified": self.objects[key][1]}
+                for key in page
+            ]
+        truncated = len(keys) > MaxKeys
+        response = {"Contents": contents, "KeyCount": len(contents), "IsTruncated": truncated}
+        if truncated:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name):
+        client = self
+
+        class Paginator:
+            def paginate(self, **params):
+                while True:
+                    page = client.list_objects_v2(**params)
+                    yield page
+                    if not page["IsTruncated"]:
+                        return
+                    params["ContinuationToken"] = page["NextContinuationToken"]
+
+        return Paginator()
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return f"https://stub.local/{Params['Key']}?expires={ExpiresIn}"
+
+
+def make_mp3(seed: int, duration: float = 30.0) -> bytes:
+    """
+    Синтетический MP3 из кадров с нулевыми данными: проходит через mutagen и нарезку HLS.
+    Первые байты полезной нагрузки зависят от seed, чтобы файлы не дедуплицировались.
+    """
+    frames = max(1, int(duration * 44100 / 1152))
+    payload = struct.pack(">Q", seed).ljust(MP3_FRAME_LENGTH - len(MP3_FRAME_HEADER), b"\x00")
+    silent = bytes(MP3_FRAME_LENGTH - len(MP3_FRAME_HEADER))
+    return MP3_FRAME_HEADER + payload + (MP3_FRAME_HEADER + silent) * (frames - 1)
+
+
+def make_cover(seed: int, size: int = 800) -> bytes:
+    color = ((seed * 67) % 256, (seed * 131) % 256, (seed * 197) % 256)
+    buffer = BytesIO()
+    Image.new("RGB", (size, size), color).save(buffer, format="PNG")
+    return buffer.getvalue()
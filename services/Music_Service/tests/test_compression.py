@@ -0,0 +1,139 @@
+import asyncio
+import gzip
+
+import pytest
+from starlette.datastructures import Headers
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate_encoding
+
+MINIMUM_SIZE = 100
+LINE = b'{"key": "music/track.mp3"}\n'
+
+
+def streaming_app(chunks: list[bytes], headers: list[tuple[bytes, bytes]] | None = None):
+    """ASGI-приложение, которое отдаёт тело кусками, как StreamingResponse."""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": headers or [(b"content-type", b"application/x-ndjson")],
+        })
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    return app
+
+
+def plain_app(body: bytes, content_type: bytes = b"application/json", extra_headers=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *extra_headers]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def call(app, accept_encoding: str = "gzip") -> tuple[Headers, list[dict]]:
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = CompressionMiddleware(app, minimum_size=MINIMUM_SIZE)
+    asyncio.run(middleware(scope, receive, send))
+    return Headers(raw=messages[0]["headers"]), messages[1:]
+
+
+def body_of(messages: list[dict]) -> bytes:
+    return b"".join(message.get("body", b"") for message in messages)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("*", "br"),
+    ("br;q=0, *", "gzip"),
+    ("*;q=0", None),
+    ("identity;q=0, gzip", "gzip"),
+    ("identity;q=0", None),
+    ("deflate", None),
+    ("gzip;q=bogus", None),
+    ("", None),
+])
+def test_negotiation_follows_q_values(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_negotiation_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip;q=0.1") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+
+
+def test_body_above_threshold_is_compressed():
+    body = LINE * 10
+    headers, messages = call(plain_app(body, extra_headers=[(b"etag", b'"v1"')]))
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == '"v1-gzip"'
+    assert int(headers["content-length"]) == len(body_of(messages))
+    assert gzip.decompress(body_of(messages)) == body
+
+
+def test_body_below_threshold_is_passed_through():
+    body = LINE
+    headers, messages = call(plain_app(body))
+
+    assert "content-encoding" not in headers
+    assert body_of(messages) == body
+
+
+@pytest.mark.parametrize("extra_headers, content_type", [
+    ([(b"content-encoding", b"br")], b"application/json"),
+    ([], b"image/webp"),
+])
+def test_encoded_and_incompressible_responses_are_passed_through(extra_headers, content_type):
+    body = LINE * 10
+    headers, messages = call(plain_app(body, content_type, extra_headers))
+
+    assert headers.getlist("content-encoding") == [value.decode() for _, value in extra_headers]
+    assert body_of(messages) == body
+
+
+def test_small_stream_is_not_compressed():
+    # проксированный ответ шлюза: много мелких кусков, в сумме меньше порога
+    chunks = [LINE[:10], LINE[10:], LINE[:5]]
+    headers, messages = call(streaming_app(chunks))
+
+    assert "content-encoding" not in headers
+    assert body_of(messages) == b"".join(chunks)
+    assert messages[-1]["more_body"] is False
+
+
+def test_stream_is_compressed_once_threshold_is_reached():
+    chunks = [LINE] * 10
+    headers, messages = call(streaming_app(chunks))
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    # первые куски копятся до порога, дальше каждый кусок сжимается и отдаётся сразу
+    first_compressed = -(-MINIMUM_SIZE // len(LINE))
+    assert len(messages) == len(chunks) - first_compressed + 2
+    assert gzip.decompress(body_of(messages)) == b"".join(chunks)
+
+
+def test_without_acceptable_encoding_response_is_untouched():
+    body = LINE * 10
+    headers, messages = call(plain_app(body), accept_encoding="identity")
+
+    assert "content-encoding" not in headers
+    assert messages == [{"type": "http.response.body", "body": body}]
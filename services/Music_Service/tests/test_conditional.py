@@ -0,0 +1,82 @@
+import uuid
+
+from fastapi import Request, Response
+
+from app.conditional import (
+    PRIVATE_CACHE_CONTROL, PUBLIC_CACHE_CONTROL, conditional_response, etag_matches, make_etag
+)
+
+
+def make_request(path: str = "/tracks", query: str = "", if_none_match: str | None = None) -> Request:
+    headers = [(b"host", b"music-service")]
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": headers,
+    })
+
+
+ROWS = [(uuid.UUID(int=1), 100), (uuid.UUID(int=2), 205)]
+
+
+def test_etag_is_stable_and_strong():
+    etag = make_etag(make_request(), ROWS)
+
+    assert etag == make_etag(make_request(), list(ROWS))
+    assert etag.startswith('"') and etag.endswith('"')
+    assert not etag.startswith("W/")
+
+
+def test_etag_changes_with_row_versions_and_membership():
+    etag = make_etag(make_request(), ROWS)
+
+    assert make_etag(make_request(), [ROWS[0], (ROWS[1][0], 206)]) != etag
+    assert make_etag(make_request(), ROWS[:1]) != etag
+    assert make_etag(make_request(), ROWS[::-1]) != etag
+
+
+def test_etag_depends_on_path_and_query():
+    etag = make_etag(make_request(), ROWS)
+
+    assert make_etag(make_request(query="limit=10"), ROWS) != etag
+    assert make_etag(make_request(query="fields=id"), ROWS) != make_etag(make_request(query="fields=title"), ROWS)
+    assert make_etag(make_request(path="/favorites"), ROWS) != etag
+
+
+def test_etag_matching_follows_weak_comparison():
+    etag = make_etag(make_request(), ROWS)
+    opaque = etag.strip('"')
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f"W/{etag}", etag)
+    # суффиксы, которые добавляет CompressionMiddleware
+    assert etag_matches(f'"{opaque}-gzip"', etag)
+    assert etag_matches(f'W/"{opaque}-br"', etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_conditional_response_returns_304_for_current_copy():
+    etag = make_etag(make_request(), ROWS)
+
+    not_modified = conditional_response(make_request(if_none_match=etag), Response(), ROWS, PRIVATE_CACHE_CONTROL)
+
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.headers["vary"] == "Authorization"
+
+
+def test_conditional_response_sets_headers_on_stale_copy():
+    response = Response()
+
+    assert conditional_response(make_request(if_none_match='"stale"'), response, ROWS) is None
+    assert response.headers["etag"] == make_etag(make_request(), ROWS)
+    assert response.headers["cache-control"] == PUBLIC_CACHE_CONTROL
+    assert "vary" not in response.headers
@@ -0,0 +1,81 @@
+import math
+import struct
+
+import pytest
+
+from app.hls import TIMESTAMP_OWNER, iter_frames, parse_frame_header, segment_mp3, segment_name, skip_id3v2
+
+from .stubs import MP3_FRAME_HEADER, MP3_FRAME_LENGTH, make_mp3
+
+FRAME_DURATION = 1152 / 44100
+
+
+def split_tag(segment: bytes) -> tuple[bytes, bytes]:
+    size = skip_id3v2(segment)
+    return segment[:size], segment[size:]
+
+
+def tag_pts(tag: bytes) -> int:
+    owner = tag.index(TIMESTAMP_OWNER) + len(TIMESTAMP_OWNER)
+    return struct.unpack(">Q", tag[owner:owner + 8])[0]
+
+
+def id3v2(payload: bytes) -> bytes:
+    size = bytes(((len(payload) >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+    return b"ID3\x03\x00\x00" + size + payload
+
+
+def test_parse_frame_header():
+    assert parse_frame_header(MP3_FRAME_HEADER) == (MP3_FRAME_LENGTH, 1152, 44100)
+    # с padding-битом кадр на байт длиннее
+    assert parse_frame_header(b"\xff\xfb\x92\x00") == (MP3_FRAME_LENGTH + 1, 1152, 44100)
+    assert parse_frame_header(b"\xff\xfb\xf0\x00") is None  # запрещённый битрейт
+    assert parse_frame_header(b"ID3\x04") is None
+
+
+def test_segments_cover_the_track_without_reencoding():
+    content = make_mp3(1, duration=20.0)
+
+    playlist, segments = segment_mp3(content)
+
+    frames = len(content) // MP3_FRAME_LENGTH
+    assert len(segments) == math.ceil(frames * FRAME_DURATION / 6.0)
+    assert b"".join(split_tag(segment)[1] for segment in segments) == content
+
+    lines = playlist.splitlines()
+    assert lines[0] == "#EXTM3U" and lines[-1] == "#EXT-X-ENDLIST"
+    assert "#EXT-X-TARGETDURATION:7" in lines
+    durations = [float(line[len("#EXTINF:"):-1]) for line in lines if line.startswith("#EXTINF:")]
+    assert [line for line in lines if not line.startswith("#")] == [segment_name(i) for i in range(len(segments))]
+    assert sum(durations) == pytest.approx(frames * FRAME_DURATION)
+    assert all(duration < 6.0 + FRAME_DURATION for duration in durations)
+
+
+def test_segments_carry_running_timestamps():
+    _, segments = segment_mp3(make_mp3(2, duration=20.0))
+
+    pts = [tag_pts(split_tag(segment)[0]) for segment in segments]
+    frames = [len(split_tag(segment)[1]) // MP3_FRAME_LENGTH for segment in segments]
+
+    assert pts[0] == 0
+    for i in range(1, len(segments)):
+        assert pts[i] == round(sum(frames[:i]) * FRAME_DURATION * 90000)
+
+
+def test_id3_tag_and_garbage_between_frames_are_skipped():
+    frames = make_mp3(3, duration=2.0)
+    content = id3v2(b"\x00" * 100) + frames[:MP3_FRAME_LENGTH * 10] + b"junk" + frames[MP3_FRAME_LENGTH * 10:]
+
+    offsets = [offset for offset, _, _ in iter_frames(content)]
+    _, segments = segment_mp3(content)
+
+    assert offsets[0] == 110
+    assert len(offsets) == len(frames) // MP3_FRAME_LENGTH
+    # разрыв между кадрами начинает новый сегмент
+    assert len(segments) == 2
+    assert b"junk" not in b"".join(segments)
+
+
+def test_content_without_frames_is_rejected():
+    with pytest.raises(ValueError):
+        segment_mp3(b"not an mp3 at all" * 100)
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app import jobs
+from app.database import db_initializer, models
+from app.database.enums import GenreEnum
+from app.storage import STORAGE_BASE_URL
+
+OLD = timedelta(days=2)
+
+
+def put_object(s3, key: str, age: timedelta = OLD) -> None:
+    """Объект, загруженный age назад."""
+    s3.objects[key] = (key.encode(), datetime.now(timezone.utc) - age)
+
+
+def variants(name: str) -> dict[str, dict[str, str]]:
+    return {"64": {"webp": f"{STORAGE_BASE_URL}images/{name}_64.webp", "jpeg": f"{STORAGE_BASE_URL}images/{name}_64.jpg"}}
+
+
+async def add(*rows) -> None:
+    async with db_initializer.async_session_maker() as session:
+        session.add_all(rows)
+        await session.commit()
+
+
+async def queued_keys() -> set[str]:
+    async with db_initializer.async_session_maker() as session:
+        return set(await session.scalars(select(models.StorageDeletion.object_key)))
+
+
+async def enqueue(*keys: str) -> None:
+    await add(*(models.StorageDeletion(object_key=key) for key in keys))
+
+
+def test_sweep_queues_only_old_unreferenced_objects(run, s3):
+    run(add(
+        models.Track(
+            title="Track", artist="Artist", duration=10.0, genre=GenreEnum.pop,
+            track_url=f"{STORAGE_BASE_URL}music/track.mp3",
+            hls_url=f"{STORAGE_BASE_URL}music/track/playlist.m3u8",
+            cover_url=f"{STORAGE_BASE_URL}images/track.png",
+            cover_variants=variants("track"),
+        ),
+        models.Playlist(name="Playlist", cover_url=f"{STORAGE_BASE_URL}images/playlist.png", cover_variants=variants("playlist")),
+        models.Album(title="Album", artist="Artist", cover_url=f"{STORAGE_BASE_URL}images/album.png"),
+        # загружено через /files/upload и ещё ни к чему не привязано
+        models.StoredObject(content_hash="a" * 64, object_key="music/stored.mp3", cover_variants=None),
+        models.StoredObject(content_hash="b" * 64, object_key="images/stored.png", cover_variants=variants("stored")),
+    ))
+    referenced = [
+        "music/track.mp3", "music/track/playlist.m3u8", "music/track/segment_00000.mp3",
+        "images/track.png", "images/playlist.png", "images/album.png",
+        "music/stored.mp3", "images/stored.png",
+    ] + [
+        f"images/{name}_64.{ext}" for name in ("track", "playlist", "stored") for ext in ("webp", "jpg")
+    ]
+    for key in referenced:
+        put_object(s3, key)
+    orphans = ["music/deleted.mp3", "music/deleted/segment_00000.mp3", "images/deleted_64.webp"]
+    for key in orphans:
+        put_object(s3, key)
+    # свежие объекты не трогаем: запись о них могла ещё не закоммититься
+    put_object(s3, "music/fresh.mp3", age=timedelta(hours=1))
+    put_object(s3, "images/fresh.png", age=jobs.SWEEP_GRACE_PERIOD - timedelta(minutes=1))
+    # вне music/ и images/ сборщик не смотрит
+    put_object(s3, "exports/old.json")
+
+    assert run(jobs.sweep_orphans()) == len(orphans)
+    assert run(queued_keys()) == set(orphans)
+
+
+def test_sweep_does_not_duplicate_queued_keys(run, s3):
+    put_object(s3, "music/deleted.mp3")
+    run(enqueue("music/deleted.mp3"))
+
+    run(jobs.sweep_orphans())
+
+    assert run(queued_keys()) == {"music/deleted.mp3"}
+
+
+def test_drain_deletes_queued_objects(run, s3):
+    for key in ("music/a.mp3", "music/b.mp3", "music/kept.mp3"):
+        put_object(s3, key)
+    run(enqueue("music/a.mp3", "music/b.mp3"))
+
+    assert run(jobs.drain_deletion_queue()) == 2
+    assert set(s3.objects) == {"music/kept.mp3"}
+    assert run(queued_keys()) == set()
+    assert run(jobs.drain_deletion_queue()) == 0
+
+
+def test_failed_deletions_are_retried_with_backoff(run, s3, monkeypatch):
+    for key in ("music/a.mp3", "music/b.mp3"):
+        put_object(s3, key)
+    run(enqueue("music/a.mp3", "music/b.mp3"))
+    delete_objects = s3.delete_objects
+
+    def fail_on_b(Bucket, Delete):
+        delete_objects(Bucket, {"Objects": [obj for obj in Delete["Objects"] if obj["Key"] != "music/b.mp3"]})
+        return {"Errors": [{"Key": "music/b.mp3", "Code": "AccessDenied", "Message": "denied"}]}
+
+    monkeypatch.setattr(s3, "delete_objects", fail_on_b)
+    started = datetime.now(timezone.utc)
+    assert run(jobs.drain_deletion_queue()) == 2
+
+    async def entry() -> models.StorageDeletion:
+        async with db_initializer.async_session_maker() as session:
+            return await session.get(models.StorageDeletion, "music/b.mp3")
+
+    failed = run(entry())
+    assert run(queued_keys()) == {"music/b.mp3"}
+    assert failed.attempts == 1
+    assert failed.last_error == "AccessDenied: denied"
+    assert failed.next_attempt_at - started >= timedelta(seconds=jobs.GC_RETRY_BASE * 2)
+    # до next_attempt_at ключ не забирается
+    assert run(jobs.drain_deletion_queue()) == 0
+
+    def unavailable(Bucket, Delete):
+        raise OSError("timeout")
+
+    monkeypatch.setattr(s3, "delete_objects", unavailable)
+
+    async def retry_now() -> None:
+        async with db_initializer.async_session_maker() as session:
+            (await session.get(models.StorageDeletion, "music/b.mp3")).next_attempt_at = started
+            await session.commit()
+
+    run(retry_now())
+    assert run(jobs.drain_deletion_queue()) == 1
+    failed = run(entry())
+    assert failed.attempts == 2
+    assert failed.next_attempt_at - started >= timedelta(seconds=jobs.GC_RETRY_BASE * 4)
+    assert "music/b.mp3" in s3.objects
+
+
+def test_drain_skips_entries_claimed_by_another_worker(run, s3):
+    put_object(s3, "music/a.mp3")
+    run(enqueue("music/a.mp3"))
+
+    async def drain_while_locked() -> int:
+        async with db_initializer.async_session_maker() as session:
+            await session.execute(select(models.StorageDeletion).with_for_update())
+            return await jobs.drain_deletion_queue()
+
+    assert run(drain_while_locked()) == 0
+    assert "music/a.mp3" in s3.objects
+    assert run(jobs.drain_deletion_queue()) == 1
@@ -0,0 +1,114 @@
+import hashlib
+from io import BytesIO
+
+from fastapi import UploadFile
+from sqlalchemy import select
+
+from app import crud
+from app.database import db_initializer, models
+from app.storage import STORAGE_BASE_URL, extract_key
+
+from .stubs import make_cover, make_mp3
+
+
+def upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=BytesIO(content), filename=filename)
+
+
+async def upload_and_commit(*files: UploadFile) -> dict:
+    async with db_initializer.async_session_maker() as session:
+        results = await crud.upload_files_deduplicated(session, list(files))
+        await session.commit()
+    return results
+
+
+async def release_and_commit(url: str, cover_variants: dict | None = None) -> None:
+    async with db_initializer.async_session_maker() as session:
+        await crud.release_object(session, url, cover_variants)
+        await session.commit()
+
+
+async def stored(content: bytes) -> models.StoredObject | None:
+    async with db_initializer.async_session_maker() as session:
+        return await session.get(models.StoredObject, hashlib.sha256(content).hexdigest())
+
+
+async def queued_keys() -> set[str]:
+    async with db_initializer.async_session_maker() as session:
+        return set(await session.scalars(select(models.StorageDeletion.object_key)))
+
+
+def variant_keys(cover_variants: dict) -> set[str]:
+    return {extract_key(url) for formats in cover_variants.values() for url in formats.values()}
+
+
+def test_duplicate_upload_shares_one_object(run, s3):
+    content = make_mp3(1, duration=1.0)
+
+    first = run(upload_and_commit(upload(content, "first.mp3")))
+    second = run(upload_and_commit(upload(content, "second.mp3")))
+
+    assert first == second
+    assert list(s3.objects) == [extract_key(first["track_url"])]
+    assert run(stored(content)).ref_count == 2
+
+
+def test_object_is_deleted_only_after_last_release(run, s3):
+    content = make_mp3(2, duration=1.0)
+    url = run(upload_and_commit(upload(content, "track.mp3")))["track_url"]
+    run(upload_and_commit(upload(content, "track.mp3")))
+
+    run(release_and_commit(url))
+
+    assert run(stored(content)).ref_count == 1
+    assert run(queued_keys()) == set()
+
+    run(release_and_commit(url))
+
+    assert run(stored(content)) is None
+    assert run(queued_keys()) == {extract_key(url)}
+
+
+def test_cover_variants_are_released_with_the_cover(run, s3):
+    content = make_cover(3, size=100)
+    results = run(upload_and_commit(upload(content, "cover.png")))
+    cover_variants = results["cover_variants"]
+    assert run(upload_and_commit(upload(content, "cover.png")))["cover_variants"] == cover_variants
+
+    run(release_and_commit(results["cover_url"], cover_variants))
+    assert run(queued_keys()) == set()
+
+    # варианты берутся из stored_objects, а не из аргумента вызывающего
+    run(release_and_commit(results["cover_url"]))
+    assert run(queued_keys()) == {extract_key(results["cover_url"])} | variant_keys(cover_variants)
+
+
+def test_concurrent_upload_loser_is_queued_for_deletion(run, s3, monkeypatch):
+    content = make_mp3(4, duration=1.0)
+    content_hash = hashlib.sha256(content).hexdigest()
+    upload_contents = crud.upload_contents
+
+    async def upload_after_winner(file_data):
+        # параллельная загрузка того же файла коммитится, пока наша идёт в хранилище
+        async with db_initializer.async_session_maker() as session:
+            session.add(models.StoredObject(content_hash=content_hash, object_key="music/winner.mp3", ref_count=1))
+            await session.commit()
+        return await upload_contents(file_data)
+
+    monkeypatch.setattr(crud, "upload_contents", upload_after_winner)
+    results = run(upload_and_commit(upload(content, "track.mp3")))
+
+    loser = set(s3.objects) - {"music/winner.mp3"}
+    assert results["track_url"] == STORAGE_BASE_URL + "music/winner.mp3"
+    assert run(stored(content)).ref_count == 2
+    assert len(loser) == 1
+    assert run(queued_keys()) == loser
+
+
+def test_legacy_object_without_row_is_deleted_immediately(run, s3):
+    cover_variants = {"64": {"webp": STORAGE_BASE_URL + "images/legacy_64.webp"}}
+
+    run(release_and_commit(STORAGE_BASE_URL + "images/legacy.png", cover_variants))
+    run(release_and_commit(None))
+
+    assert run(queued_keys()) == {"images/legacy.png", "images/legacy_64.webp"}
@@ -0,0 +1,121 @@
+import time
+import uuid
+
+import jwt
+import pytest
+from starlette.requests import Request
+
+from app import token_claims
+from app.token_claims import JWT_AUDIENCE, ClaimsCache, get_request_claims, verify_token
+
+SECRET = "test-secret-long-enough-for-hs256-keys"
+
+
+def make_token(secret: str = SECRET, **claims) -> str:
+    payload = {"sub": str(uuid.UUID(int=1)), "email": "user@example.com", "group_id": 1, "aud": JWT_AUDIENCE}
+    payload.setdefault("exp", int(time.time()) + 60)
+    payload.update(claims)
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def make_request(token: str | None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch) -> ClaimsCache:
+    cache = ClaimsCache(maxsize=2)
+    monkeypatch.setattr(token_claims, "claims_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def decodes(monkeypatch) -> list[str]:
+    calls = []
+    decode = token_claims.jwt.decode
+
+    def counting_decode(token, *args, **kwargs):
+        calls.append(token)
+        return decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(token_claims.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_valid_token_is_decoded_once(decodes):
+    token = make_token()
+
+    first = verify_token(token, SECRET)
+    second = verify_token(token, SECRET)
+
+    assert first is second
+    assert first.user_id == uuid.UUID(int=1)
+    assert first.role == "User"
+    assert decodes == [token]
+
+
+def test_expired_token_is_not_served_from_cache(decodes):
+    expires_at = int(time.time()) + 1
+    token = make_token(exp=expires_at)
+    assert verify_token(token, SECRET) is not None
+
+    time.sleep(expires_at - time.time() + 0.01)
+
+    assert verify_token(token, SECRET) is None
+    # запись из кэша выброшена, токен заново проверен и отвергнут
+    assert decodes == [token, token]
+
+
+def test_tampered_token_with_same_payload_is_rejected():
+    expires_at = int(time.time()) + 60
+    token = make_token(exp=expires_at)
+    assert verify_token(token, SECRET) is not None
+
+    header, payload, signature = token.split(".")
+    forged = ".".join([header, payload, signature[::-1]])
+    resigned = make_token(secret="attacker-secret-long-enough-for-hs256", exp=expires_at)
+
+    assert resigned.split(".")[1] == payload
+    assert verify_token(forged, SECRET) is None
+    assert verify_token(resigned, SECRET) is None
+
+
+def test_rejected_tokens_are_not_cached(decodes):
+    token = make_token(secret="attacker-secret-long-enough-for-hs256")
+
+    assert verify_token(token, SECRET) is None
+    assert verify_token(token, SECRET) is None
+    assert decodes == [token, token]
+
+
+def test_cache_evicts_least_recently_used(decodes):
+    first, second, third = (make_token(sub=str(uuid.UUID(int=i))) for i in range(1, 4))
+
+    for token in (first, second, first, third):
+        verify_token(token, SECRET)
+    verify_token(first, SECRET)
+    verify_token(second, SECRET)
+
+    assert decodes == [first, second, third, second]
+
+
+def test_request_claims_are_verified_once_per_request(monkeypatch):
+    calls = []
+
+    def counting_verify(token, secret):
+        calls.append(token)
+        return verify_token(token, secret)
+
+    monkeypatch.setattr(token_claims, "verify_token", counting_verify)
+    token = make_token()
+    request = make_request(token)
+
+    claims = get_request_claims(request, SECRET)
+
+    assert get_request_claims(request, SECRET) is claims
+    assert calls == [token]
+    assert get_request_claims(make_request(token), SECRET) is claims
+    assert calls == [token, token]
+    assert get_request_claims(make_request(None), SECRET) is None
+    assert calls == [token, token]
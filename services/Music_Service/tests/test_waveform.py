@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import waveform
+from app.waveform import PEAKS_BUCKETS, compute_peaks
+
+from .stubs import make_mp3
+
+
+def decoded(samples) -> SimpleNamespace:
+    return SimpleNamespace(samples=np.asarray(samples, dtype=np.int16).tobytes())
+
+
+def test_silent_track_has_flat_waveform():
+    peaks = compute_peaks(make_mp3(1, duration=5.0))
+
+    assert peaks == bytes(PEAKS_BUCKETS)
+
+
+def test_peaks_are_normalized_to_the_loudest_bucket(monkeypatch):
+    # громкость растёт линейно: пики бакетов тоже растут, последний — 127
+    ramp = np.repeat(np.arange(1, 101) * 300, 50)
+    ramp[::2] *= -1
+    monkeypatch.setattr(waveform.miniaudio, "decode", lambda *args, **kwargs: decoded(ramp))
+
+    peaks = np.frombuffer(compute_peaks(b"mp3", buckets=100), dtype=np.int8)
+
+    assert len(peaks) == 100
+    assert peaks[-1] == 127
+    assert (np.diff(peaks.astype(np.int16)) >= 0).all()
+    assert peaks[49] == pytest.approx(127 * 50 // 100, abs=1)
+
+
+def test_short_track_is_padded_to_bucket_count(monkeypatch):
+    monkeypatch.setattr(waveform.miniaudio, "decode", lambda *args, **kwargs: decoded([1000, -2000, 500]))
+
+    peaks = np.frombuffer(compute_peaks(b"mp3", buckets=10), dtype=np.int8)
+
+    assert peaks.tolist() == [63, 127, 31, 0, 0, 0, 0, 0, 0, 0]
+
+
+def test_extreme_amplitude_does_not_overflow(monkeypatch):
+    monkeypatch.setattr(waveform.miniaudio, "decode", lambda *args, **kwargs: decoded([-32768, 32767, 0, 0]))
+
+    peaks = np.frombuffer(compute_peaks(b"mp3", buckets=2), dtype=np.int8)
+
+    assert peaks.tolist() == [127, 0]
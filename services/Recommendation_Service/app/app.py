@@ -1,20 +1,30 @@
 import logging
 from uuid import UUID
 from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 import redis.asyncio as redis
-import jwt
-from .crud import get_recommended_tracks, get_recommended_tracks_from_db
+from .crud import get_recommended_tracks, get_recommended_tracks_from_db, get_similar_tracks, refill_pending_queues
 from .database import get_async_session, db_initializer
 from .config import load_config
-from .fetch_from_music_service.fetch_all_tracks import fetch_all_tracks_from_music_service
+from .logging_setup import setup_logging
+from .compression import CompressionMiddleware
+from .metrics import setup_metrics
+from .token_claims import get_request_claims
+from .fetch_from_music_service.fetch_all_tracks import refresh_catalog, close_http_client
+from .cooccurrence import init_model
 from .schemas import schemas
 from fastapi_utils.tasks import repeat_every
 
 cfg = load_config()
+# выбор рекомендаций пишет по несколько сообщений на каждый запрос /my-wave
+setup_logging(cfg.SERVICE_NAME, sampling={
+    "app.recommendation": 0.05,
+    "app.scoring": 0.05,
+    "app.redis_recent": 0.05,
+})
 logger = logging.getLogger(cfg.SERVICE_NAME)
 
 app = FastAPI(
@@ -30,11 +40,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+setup_metrics(app)
 
 @app.on_event("startup")
 async def on_startup():
     await db_initializer.init_db(str(cfg.PG_ASYNC_DSN))
     logger.info("DB initialized.")
+    init_model(cfg.COOCCURRENCE_DIR)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_http_client()
 
 
 @app.on_event("startup")
@@ -42,33 +60,26 @@ async def on_startup():
 async def refresh_music_cache_task() -> None:
     logger.info("Background task: обновляем кэш треков в Redis")
     try:
-        await fetch_all_tracks_from_music_service()
+        await refresh_catalog()
         logger.info("Кэш треков успешно обновлен")
     except Exception as e:
         logger.error(f"Ошибка при обновлении кэша треков: {e}")
 
-def extract_email_data(token: str) -> Optional[tuple[str, UUID]]:
+@app.on_event("startup")
+@repeat_every(seconds=2, wait_first=True)
+async def refill_wave_queues_task() -> None:
+    # дополняет очереди «Моей волны», опустевшие ниже LOW_WATER
     try:
-        data = jwt.decode(token, cfg.JWT_SECRET, algorithms=["HS256"], audience=["fastapi-users:auth"])
-        email = data.get("email")
-        user_id = data.get("sub")
-        if email and user_id:
-            return email, UUID(user_id)
+        while await refill_pending_queues():
+            pass
     except Exception as e:
-        logger.warning(f"JWT decode failed: {e}")
-        return None
-    return None
-
+        logger.error(f"Ошибка при дополнении очередей рекомендаций: {e}")
 
 async def get_current_user(request: Request) -> tuple[str, UUID]:
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="Invalid auth")
-    token = auth_header.split(" ")[1]
-    user_data = extract_email_data(token)
-    if not user_data:
+    claims = get_request_claims(request, cfg.JWT_SECRET)
+    if claims is None or not claims.email or claims.user_id is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return user_data
+    return claims.email, claims.user_id
 
 
 @app.get("/", include_in_schema=False)
@@ -88,4 +99,12 @@ async def my_wave(
     db: AsyncSession = Depends(get_async_session),
 ):
     email, user_id = user
-    return await get_recommended_tracks(db, user_id)
\ No newline at end of file
+    return await get_recommended_tracks(db, user_id)
+
+@app.get("/tracks/{track_id}/similar", response_model=list[schemas.TrackResponse])
+async def similar_tracks(track_id: UUID, limit: int = Query(20, ge=1, le=100)):
+    """
+    Похожие треки для радио и автовоспроизведения: ближайшие соседи по метаданным
+    и совместной встречаемости.
+    """
+    return await get_similar_tracks(track_id, limit)
@@ -1,13 +1,139 @@
+"""
+Клиент Redis с отслеживанием здоровья соединения по исходам реальных команд.
+
+Отдельного PING перед командами нет: каждая команда (и пайплайн целиком) сообщает
+предохранителю, дошла ли она до сервера. После FAILURE_THRESHOLD сетевых ошибок подряд
+предохранитель размыкается, и команды сразу падают с RedisCircuitOpenError, не дожидаясь
+таймаутов. Через PROBE_INTERVAL одна команда проходит пробой (half-open): успех
+замыкает предохранитель, ошибка снова размыкает его. Ошибки ответа сервера
+(ResponseError и т. п.) означают, что Redis доступен, и считаются успехом.
+
+Состояние отдаётся метрикой redis_circuit_state (0 — closed, 1 — half-open, 2 — open).
+"""
+import logging
+import time
+from typing import Callable
+
 import redis.asyncio as redis
-from redis.exceptions import RedisError
-
-redis_client = redis.Redis(host="redis", port=6379, db=0, decode_responses=True)
-
-async def check_redis_connection():
-    try:
-        await redis_client.ping()
-        print("[cache] Redis is connected")
-    except RedisError as e:
-        print(f"[cache] Redis connection error: {e}")
-        return False
-    return True
\ No newline at end of file
+from prometheus_client import Counter, Gauge
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 5
+PROBE_INTERVAL = 5.0
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half-open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+REDIS_CIRCUIT_STATE = Gauge(
+    "redis_circuit_state",
+    "Состояние предохранителя Redis: 0 — closed, 1 — half-open, 2 — open"
+)
+REDIS_CIRCUIT_TRANSITIONS = Counter(
+    "redis_circuit_transitions_total",
+    "Переходы предохранителя Redis по новому состоянию",
+    ["state"]
+)
+
+
+class RedisCircuitOpenError(RedisConnectionError):
+    """Команда не отправлена: предохранитель разомкнут. Ловится как обычная RedisError."""
+
+
+class RedisHealth:
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        probe_interval: float = PROBE_INTERVAL,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        REDIS_CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(f"[cache] Redis circuit {self.state} -> {state}")
+        self.state = state
+        REDIS_CIRCUIT_STATE.set(STATE_VALUES[state])
+        REDIS_CIRCUIT_TRANSITIONS.labels(state=state).inc()
+
+    def available(self) -> bool:
+        """Стоит ли начинать работу с Redis; ничего не отправляет и состояние не меняет."""
+        if self.state == OPEN:
+            return self.clock() - self.opened_at >= self.probe_interval
+        return not (self.state == HALF_OPEN and self.probe_in_flight)
+
+    def acquire(self) -> bool:
+        """Разрешение на команду; в half-open пропускает ровно одну пробную."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.probe_interval:
+                return False
+            self._transition(HALF_OPEN)
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probe_in_flight = False
+        self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+            self._transition(OPEN)
+
+    def release(self) -> None:
+        # команду отменили до ответа — исход неизвестен, пробу нужно повторить
+        self.probe_in_flight = False
+
+    async def call(self, command, *args, **kwargs):
+        if not self.acquire():
+            raise RedisCircuitOpenError("Redis circuit is open")
+        try:
+            result = await command(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError, OSError):
+            self.record_failure()
+            raise
+        except Exception:
+            # сервер ответил ошибкой — соединение живо
+            self.record_success()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+
+redis_health = RedisHealth()
+
+
+class HealthTrackedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        return await redis_health.call(super().execute, raise_on_error)
+
+
+class HealthTrackedRedis(redis.Redis):
+    async def execute_command(self, *args, **options):
+        return await redis_health.call(super().execute_command, *args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> HealthTrackedPipeline:
+        return HealthTrackedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_client = HealthTrackedRedis(host="redis", port=6379, db=0, decode_responses=True)
@@ -0,0 +1,174 @@
+"""
+Колоночный снимок каталога в памяти процесса для отбора кандидатов.
+
+Строится из catalog:meta (HSCAN) и перестраивается, когда меняется catalog:version.
+Настроение и жанр хранятся категориальными кодами, год и длительность — числовыми
+массивами, позиция трека в массивах — его индекс. Исключение недавно прослушанных —
+булева маска за миллисекунды даже на 1M треков; полные данные читаются из Redis
+только для выбранных треков.
+
+Для ранжирования снимок держит матрицу признаков (см. features): one-hot настроения
+и жанра плюс стандартизованные год и длительность вместе с их квадратами — так
+гауссова близость к предпочтениям пользователя остаётся линейной и весь каталог
+оценивается одним умножением матрицы на вектор (scoring.py).
+"""
+import asyncio
+import logging
+import time
+from typing import Iterable
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from . import catalog_store
+
+logger = logging.getLogger(__name__)
+
+# как часто сверяем catalog:version с загруженным снимком
+VERSION_CHECK_INTERVAL = 5.0
+
+
+class CatalogSnapshot:
+    def __init__(
+        self,
+        version: int,
+        ids: list[str],
+        moods: list[str],
+        genres: list[str],
+        years: list[str],
+        durations: list[str]
+    ) -> None:
+        self.version = version
+        self.ids = np.array(ids, dtype=object)
+        self.index = {track_id: i for i, track_id in enumerate(ids)}
+
+        self.mood_names, mood_codes = np.unique(np.array(moods, dtype=object), return_inverse=True)
+        self.genre_names, genre_codes = np.unique(np.array(genres, dtype=object), return_inverse=True)
+        self.mood_codes = mood_codes.astype(np.int16)
+        self.genre_codes = genre_codes.astype(np.int16)
+
+        self.years = np.array([float(year) if year else np.nan for year in years], dtype=np.float32)
+        self.durations = np.array([float(d) if d else np.nan for d in durations], dtype=np.float32)
+
+        self.year_center, self.year_scale = _center_scale(self.years)
+        self.duration_center, self.duration_scale = _center_scale(self.durations)
+        self.features = self._build_features()
+
+    def _build_features(self) -> np.ndarray:
+        """
+        Колонки: [настроения | жанры | year_z, year_z², duration_z, duration_z²].
+        Неизвестный год/длительность кладём нулём — как трек со средним значением.
+        """
+        moods, genres = len(self.mood_names), len(self.genre_names)
+        features = np.zeros((len(self), moods + genres + 4), dtype=np.float32)
+        rows = np.arange(len(self))
+        features[rows, self.mood_codes] = 1.0
+        features[rows, moods + self.genre_codes] = 1.0
+
+        offset = moods + genres
+        for column, values, center, scale in (
+            (offset, self.years, self.year_center, self.year_scale),
+            (offset + 2, self.durations, self.duration_center, self.duration_scale),
+        ):
+            z = np.nan_to_num((values - center) / scale)
+            features[:, column] = z
+            features[:, column + 1] = z * z
+        return features
+
+    @property
+    def genre_offset(self) -> int:
+        return len(self.mood_names)
+
+    @property
+    def numeric_offset(self) -> int:
+        return len(self.mood_names) + len(self.genre_names)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, track_ids: Iterable[str]) -> np.ndarray:
+        return np.array(
+            [self.index[track_id] for track_id in track_ids if track_id in self.index],
+            dtype=np.int64
+        )
+
+    def id_mask(self, track_ids: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.positions(track_ids)] = True
+        return mask
+
+    def track_ids(self, positions: np.ndarray) -> list[str]:
+        return self.ids[positions].tolist()
+
+
+def _center_scale(values: np.ndarray) -> tuple[float, float]:
+    known = values[~np.isnan(values)]
+    if not len(known):
+        return 0.0, 1.0
+    return float(known.mean()), float(known.std()) or 1.0
+
+
+def build_snapshot(version: int, rows: list[tuple[str, str]]) -> CatalogSnapshot:
+    ids, moods, genres, years, durations = [], [], [], [], []
+    for track_id, meta in rows:
+        mood, genre, year, duration = catalog_store.parse_meta(meta)
+        ids.append(track_id)
+        moods.append(mood)
+        genres.append(genre)
+        years.append(year)
+        durations.append(duration)
+    return CatalogSnapshot(version, ids, moods, genres, years, durations)
+
+
+async def load_snapshot() -> CatalogSnapshot:
+    started = time.perf_counter()
+    version = await catalog_store.get_version()
+    rows = [row async for row in catalog_store.iter_meta()]
+    # разбор и сборка матрицы признаков на 1M треков — секунды CPU: не на event loop
+    snapshot = await asyncio.to_thread(build_snapshot, version, rows)
+    logger.info(
+        f"[catalog] Snapshot v{version} loaded: {len(snapshot)} tracks "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return snapshot
+
+
+_snapshot: CatalogSnapshot | None = None
+_checked_at = 0.0
+_reload_task: asyncio.Task | None = None
+_load_lock = asyncio.Lock()
+
+
+async def _reload() -> None:
+    global _snapshot
+    try:
+        _snapshot = await load_snapshot()
+    except Exception as e:
+        logger.error(f"[catalog] Snapshot reload failed: {e}")
+
+
+async def get_snapshot() -> CatalogSnapshot | None:
+    """
+    Текущий снимок. Первый вызов ждёт загрузки; дальше при смене catalog:version
+    новый снимок строится в фоне, а запросы до его готовности обслуживает старый.
+    """
+    global _checked_at, _reload_task
+    if _snapshot is None:
+        async with _load_lock:
+            if _snapshot is None:
+                await _reload()
+                _checked_at = time.monotonic()
+        return _snapshot
+
+    if time.monotonic() - _checked_at >= VERSION_CHECK_INTERVAL:
+        _checked_at = time.monotonic()
+        try:
+            version = await catalog_store.get_version()
+        except RedisError as e:
+            # Redis недоступен (или разомкнут предохранитель) — работаем на текущем снимке
+            logger.warning(f"[catalog] Version check failed, serving snapshot v{_snapshot.version}: {e}")
+            return _snapshot
+        if version != _snapshot.version and (_reload_task is None or _reload_task.done()):
+            _reload_task = asyncio.create_task(_reload())
+
+    return _snapshot
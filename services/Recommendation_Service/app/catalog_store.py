@@ -0,0 +1,232 @@
+"""
+Каталог треков в Redis в структурированном виде вместо одного JSON-блоба:
+
+    catalog:track:{id}      — hash с полями трека
+    catalog:ids             — set всех id
+    catalog:meta            — hash id → "дайджест|mood|genre|year|duration": по нему merge
+                              находит изменения, а процессы строят колоночный снимок
+    catalog:version         — счётчик, растёт при каждом изменении каталога
+
+Кандидатов отбирает колоночный снимок (catalog_snapshot.py), из Redis читаются только
+hash'и выбранных треков; merge переписывает только изменившиеся треки.
+
+Прежние версии держали каталог JSON-блобом cached_all_tracks, а потом ещё set'ы
+catalog:mood:* и catalog:genre:*; merge один раз удаляет оставшиеся ключи (drop_legacy_keys).
+"""
+import hashlib
+import logging
+from typing import Iterable
+
+from .broker.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "catalog"
+IDS_KEY = f"{KEY_PREFIX}:ids"
+# JSON-блоб всего каталога, который заменило это хранилище
+LEGACY_CACHE_KEY = "cached_all_tracks"
+# set имён индексов настроений/жанров, которые писали прежние версии
+LEGACY_INDEXES_KEY = f"{KEY_PREFIX}:indexes"
+META_KEY = f"{KEY_PREFIX}:meta"
+VERSION_KEY = f"{KEY_PREFIX}:version"
+# сколько команд отправляем одним пайплайном
+WRITE_BATCH = 5000
+
+TRACK_FIELDS = (
+    "title", "artist", "duration", "genre", "mood",
+    "release_year", "track_url", "cover_url", "hls_url",
+)
+FLOAT_FIELDS = {"duration"}
+INT_FIELDS = {"release_year"}
+
+
+def track_key(track_id: str) -> str:
+    return f"{KEY_PREFIX}:track:{track_id}"
+
+
+def encode_track(track: dict) -> dict[str, str]:
+    """Поля трека для HSET: None хранится пустой строкой."""
+    return {
+        field: "" if track.get(field) is None else str(track[field])
+        for field in TRACK_FIELDS
+    }
+
+
+def track_meta(fields: dict[str, str]) -> str:
+    """
+    Дайджест полей трека плюс поля для отбора кандидатов: по дайджесту merge находит
+    изменившиеся треки, остальное читает catalog_snapshot без обращения к hash'ам.
+    """
+    digest = hashlib.blake2b("\x1f".join(fields[field] for field in TRACK_FIELDS).encode(), digest_size=8)
+    return "|".join((
+        digest.hexdigest(), fields["mood"], fields["genre"], fields["release_year"], fields["duration"]
+    ))
+
+
+def parse_meta(meta: str) -> tuple[str, str, str, str]:
+    """mood, genre, release_year, duration из значения catalog:meta (пустая строка — нет значения)."""
+    _, mood, genre, year, duration = meta.split("|", 4)
+    return mood, genre, year, duration
+
+
+def decode_track(track_id: str, data: dict[str, str]) -> dict:
+    track = {"id": track_id}
+    for field in TRACK_FIELDS:
+        value = data.get(field) or None
+        if value is not None and field in FLOAT_FIELDS:
+            value = float(value)
+        elif value is not None and field in INT_FIELDS:
+            value = int(value)
+        track[field] = value
+    return track
+
+
+def batched(items: list, size: int = WRITE_BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ─────────── READ ─────────── #
+async def get_version() -> int:
+    return int(await redis_client.get(VERSION_KEY) or 0)
+
+
+async def count_tracks() -> int:
+    return await redis_client.scard(IDS_KEY)
+
+
+async def all_track_ids() -> set[str]:
+    return await redis_client.smembers(IDS_KEY)
+
+
+async def iter_meta(count: int = WRITE_BATCH):
+    """Все пары (id, meta) через HSCAN, чтобы не блокировать Redis одним огромным ответом."""
+    async for track_id, meta in redis_client.hscan_iter(META_KEY, count=count):
+        yield track_id, meta
+
+
+async def get_tracks(track_ids: Iterable[str]) -> list[dict]:
+    """Треки по id одним пайплайном; отсутствующие в каталоге пропускаются."""
+    track_ids = list(track_ids)
+    tracks = []
+    for chunk in batched(track_ids):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for track_id in chunk:
+                pipe.hgetall(track_key(track_id))
+            rows = await pipe.execute()
+        tracks.extend(decode_track(track_id, row) for track_id, row in zip(chunk, rows) if row)
+    return tracks
+
+
+# ─────────── WRITE ─────────── #
+def queue_upsert(pipe, track_id: str, fields: dict[str, str], meta: str) -> None:
+    pipe.hset(track_key(track_id), mapping=fields)
+    pipe.hset(META_KEY, track_id, meta)
+    pipe.sadd(IDS_KEY, track_id)
+
+
+def queue_remove(pipe, track_id: str) -> None:
+    pipe.delete(track_key(track_id))
+    pipe.hdel(META_KEY, track_id)
+    pipe.srem(IDS_KEY, track_id)
+
+
+_legacy_dropped = False
+
+
+async def drop_legacy_keys() -> None:
+    """
+    Один раз за жизнь процесса удаляет ключи прежних форматов: JSON-блоб каталога
+    и set'ы настроений/жанров.
+    """
+    global _legacy_dropped
+    if _legacy_dropped:
+        return
+    legacy = await redis_client.smembers(LEGACY_INDEXES_KEY)
+    removed = await redis_client.delete(LEGACY_CACHE_KEY, LEGACY_INDEXES_KEY, *legacy)
+    if removed:
+        logger.info(f"[catalog] Dropped {removed} legacy catalog keys")
+    _legacy_dropped = True
+
+
+async def merge_snapshot(tracks: list[dict]) -> dict[str, int]:
+    """
+    Сливает свежий снимок каталога с тем, что лежит в Redis: сравнение по словарю
+    id → meta за один проход, запись только новых/изменившихся треков и удаление
+    исчезнувших пакетными пайплайнами. Версия растёт, только если что-то изменилось.
+    """
+    await drop_legacy_keys()
+    current: dict[str, str] = await redis_client.hgetall(META_KEY)
+    if (not current and await count_tracks()) or any(meta.count("|") != 4 for meta in current.values()):
+        # каталог записан без meta или старым форматом — один раз перестраиваем его целиком
+        version = await publish_snapshot(tracks)
+        return {"added": len(tracks), "updated": 0, "removed": 0, "version": version}
+
+    incoming: dict[str, tuple[dict[str, str], str]] = {}
+    for track in tracks:
+        fields = encode_track(track)
+        incoming[str(track["id"])] = (fields, track_meta(fields))
+
+    changed = [track_id for track_id, (_, meta) in incoming.items() if current.get(track_id) != meta]
+    removed = [track_id for track_id in current if track_id not in incoming]
+
+    for chunk in batched(changed):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for track_id in chunk:
+                fields, meta = incoming[track_id]
+                queue_upsert(pipe, track_id, fields, meta)
+            await pipe.execute()
+
+    for chunk in batched(removed):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for track_id in chunk:
+                queue_remove(pipe, track_id)
+            await pipe.execute()
+
+    if changed or removed:
+        version = await redis_client.incr(VERSION_KEY)
+    else:
+        version = await get_version()
+
+    added = sum(1 for track_id in changed if track_id not in current)
+    return {"added": added, "updated": len(changed) - added, "removed": len(removed), "version": version}
+
+
+async def publish_snapshot(tracks: list[dict]) -> int:
+    """
+    Полностью заменяет каталог: пишет hash'и треков, собирает catalog:ids и meta во
+    временных ключах и атомарно подменяет их через RENAME, затем удаляет треки, которых
+    больше нет.
+    Возвращает новую версию каталога.
+    """
+    ids = [str(track["id"]) for track in tracks]
+    stale_ids = await all_track_ids() - set(ids)
+
+    await redis_client.delete(f"{IDS_KEY}:next", f"{META_KEY}:next")
+    for chunk in batched(list(zip(ids, tracks))):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for track_id, track in chunk:
+                fields = encode_track(track)
+                pipe.hset(track_key(track_id), mapping=fields)
+                pipe.hset(f"{META_KEY}:next", track_id, track_meta(fields))
+            await pipe.execute()
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for chunk in batched(ids):
+            pipe.sadd(f"{IDS_KEY}:next", *chunk)
+        await pipe.execute()
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        if ids:
+            pipe.rename(f"{IDS_KEY}:next", IDS_KEY)
+            pipe.rename(f"{META_KEY}:next", META_KEY)
+        else:
+            pipe.delete(IDS_KEY, META_KEY)
+        pipe.incr(VERSION_KEY)
+        version = (await pipe.execute())[-1]
+
+    for chunk in batched(list(stale_ids)):
+        await redis_client.delete(*(track_key(track_id) for track_id in chunk))
+
+    logger.info(f"[catalog] Published {len(ids)} tracks, removed {len(stale_ids)}, version {version}")
+    return version
@@ -21,6 +21,12 @@ class Config(BaseSettings):
         alias='JWT_SECRET'
     )
 
+    COOCCURRENCE_DIR: str = Field(
+        default='/mnt/cooccurrence',
+        env='COOCCURRENCE_DIR',
+        alias='COOCCURRENCE_DIR'
+    )
+
     SERVICE_NAME: str = "RecommendationService"
 
     class Config:
@@ -0,0 +1,166 @@
+"""
+Модель item-item совместной встречаемости: top-N похожих треков для каждого трека.
+
+Строится офлайн (cooccurrence_job.py) и хранится каталогом .npy-файлов — CSR-матрицей:
+
+    ids.npy      — S36, id треков по возрастанию (строка i — трек ids[i])
+    indptr.npy   — int64, соседи строки i лежат в indices/scores[indptr[i]:indptr[i + 1]]
+    indices.npy  — int32, номера строк соседей
+    scores.npy   — float16, сходство соседей, внутри строки по убыванию
+    embeddings.npy — float16, плотный вектор трека из SVD матрицы пользователь × трек
+                   (нормирован; для индекса похожих треков, similar_index.py)
+
+Каждая сборка пишется в отдельный каталог, ссылка `current` переключается на неё
+атомарно. Сервис открывает файлы через np.load(mmap_mode="r"): страницы общие для
+всех воркеров на хосте и подгружаются по мере обращения, а поиск строки по id —
+бинарный поиск по отсортированному ids.npy, без словаря в памяти каждого процесса.
+"""
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CURRENT_LINK = "current"
+# сколько сборок хранить: предыдущая может быть ещё открыта воркерами
+KEEP_BUILDS = 2
+# как часто проверяем, не переключилась ли ссылка на новую сборку
+RELOAD_INTERVAL = 60.0
+
+
+class CooccurrenceModel:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        self.indptr = np.load(path / "indptr.npy", mmap_mode="r")
+        self.indices = np.load(path / "indices.npy", mmap_mode="r")
+        self.scores = np.load(path / "scores.npy", mmap_mode="r")
+        # в сборках без эмбеддингов похожие треки ищутся только по метаданным
+        embeddings = path / "embeddings.npy"
+        self.embeddings = np.load(embeddings, mmap_mode="r") if embeddings.exists() else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, track_id: str) -> int | None:
+        key = track_id.encode()
+        row = int(np.searchsorted(self.ids, key))
+        if row < len(self.ids) and self.ids[row] == key:
+            return row
+        return None
+
+    def rows(self, track_ids: np.ndarray) -> np.ndarray:
+        """Номера строк для массива id разом; -1 для треков, которых нет в модели."""
+        keys = np.asarray(track_ids).astype("S36")
+        if not len(self.ids):
+            return np.full(len(keys), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        return np.where(self.ids[rows] == keys, rows, -1)
+
+    def neighbors(self, track_id: str) -> tuple[list[str], np.ndarray]:
+        row = self.row(track_id)
+        if row is None:
+            return [], np.empty(0, dtype=np.float32)
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        ids = [track.decode() for track in self.ids[self.indices[start:stop]]]
+        return ids, self.scores[start:stop].astype(np.float32)
+
+    def candidates(self, seed_ids: Iterable[str]) -> dict[str, float]:
+        """Соседи всех seed-треков с суммарным сходством; сами seed'ы не входят."""
+        seeds = set(seed_ids)
+        scores: dict[str, float] = {}
+        for seed in seeds:
+            ids, sims = self.neighbors(seed)
+            for track_id, sim in zip(ids, sims.tolist()):
+                if track_id not in seeds:
+                    scores[track_id] = scores.get(track_id, 0.0) + sim
+        return scores
+
+
+def save_model(
+    base_dir: str | Path,
+    ids: np.ndarray,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    scores: np.ndarray,
+    embeddings: np.ndarray | None = None
+) -> Path:
+    """Пишет сборку в новый каталог и переключает на неё ссылку current; старые сборки удаляет."""
+    base_dir = Path(base_dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    # имена сортируются в порядке сборки
+    path = base_dir / f"build-{time.time_ns()}"
+    path.mkdir()
+
+    np.save(path / "ids.npy", ids.astype("S36"))
+    np.save(path / "indptr.npy", indptr.astype(np.int64))
+    np.save(path / "indices.npy", indices.astype(np.int32))
+    np.save(path / "scores.npy", scores.astype(np.float16))
+    if embeddings is not None:
+        np.save(path / "embeddings.npy", embeddings.astype(np.float16))
+
+    link = base_dir / CURRENT_LINK
+    tmp_link = base_dir / f"{CURRENT_LINK}.tmp"
+    tmp_link.unlink(missing_ok=True)
+    tmp_link.symlink_to(path.name)
+    os.replace(tmp_link, link)
+
+    # уже открытые mmap'ы удалённых файлов остаются рабочими до закрытия
+    builds = sorted(base_dir.glob("build-*"))
+    for stale in builds[:-KEEP_BUILDS]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return path
+
+
+def load_model(base_dir: str | Path) -> CooccurrenceModel | None:
+    link = Path(base_dir) / CURRENT_LINK
+    if not link.exists():
+        return None
+    path = link.resolve()
+    started = time.perf_counter()
+    model = CooccurrenceModel(path)
+    logger.info(
+        f"[cooccurrence] Model {path.name} mapped: {len(model)} tracks, "
+        f"{len(model.indices)} neighbors in {time.perf_counter() - started:.2f}s"
+    )
+    return model
+
+
+_model: CooccurrenceModel | None = None
+_base_dir: Path | None = None
+_checked_at = 0.0
+
+
+def init_model(base_dir: str | Path) -> None:
+    """Открывает текущую сборку при старте; без модели рекомендации работают по метаданным."""
+    global _model, _base_dir, _checked_at
+    _base_dir = Path(base_dir)
+    _checked_at = time.monotonic()
+    try:
+        _model = load_model(_base_dir)
+    except (OSError, ValueError) as e:
+        logger.error(f"[cooccurrence] Failed to load model: {e}")
+        _model = None
+    if _model is None:
+        logger.warning(f"[cooccurrence] No model in {_base_dir}, co-occurrence candidates disabled.")
+
+
+def get_model() -> CooccurrenceModel | None:
+    """Текущая модель; раз в RELOAD_INTERVAL проверяет, не опубликована ли новая сборка."""
+    global _model, _checked_at
+    if _base_dir is None or time.monotonic() - _checked_at < RELOAD_INTERVAL:
+        return _model
+
+    _checked_at = time.monotonic()
+    link = _base_dir / CURRENT_LINK
+    if link.exists() and (_model is None or link.resolve() != _model.path):
+        try:
+            _model = load_model(_base_dir)
+        except (OSError, ValueError) as e:
+            logger.error(f"[cooccurrence] Failed to reload model: {e}")
+    return _model
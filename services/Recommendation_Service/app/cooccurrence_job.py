@@ -0,0 +1,192 @@
+"""
+Офлайн-сборка модели совместной встречаемости треков (формат — см. cooccurrence.py).
+
+Читает music.play_history и music.favorite_tracks серверным курсором порциями по
+CHUNK_SIZE строк, собирает разреженную матрицу пользователь × трек (log(1 + прослушивания)
+плюс вес избранного), нормирует столбцы и считает косинусное сходство треков блоками
+строк X^T·X, оставляя для каждого трека TOP_N соседей. Заодно сохраняет
+эмбеддинги треков — усечённое SVD той же матрицы (X^T·X ≈ V·S²·V^T).
+
+    python -m app.cooccurrence_job
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+from sqlalchemy import column, func, literal, select, table
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .config import load_config
+from .cooccurrence import save_model
+from .logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50_000
+# треков в одном блоке произведения X^T·X: ограничивает память на промежуточную матрицу
+ITEM_BLOCK = 2_000
+TOP_N = 50
+FAVORITE_WEIGHT = 3.0
+# у пользователей с огромной историей пар квадратично много, а сигнала мало:
+# берём их самые весомые треки
+MAX_ITEMS_PER_USER = 500
+EMBEDDING_DIM = 32
+
+play_history = table("play_history", column("user_id"), column("track_id"), schema="music")
+favorite_tracks = table("favorite_tracks", column("user_id"), column("track_id"), schema="music")
+
+
+class Interactions:
+    """Накопитель троек (пользователь, трек, вес) с плотной нумерацией id."""
+
+    def __init__(self) -> None:
+        self.users: dict[str, int] = {}
+        self.tracks: dict[str, int] = {}
+        self.rows: list[np.ndarray] = []
+        self.cols: list[np.ndarray] = []
+        self.weights: list[np.ndarray] = []
+
+    def add(self, rows, weight) -> None:
+        users, tracks, values = [], [], []
+        for user_id, track_id, value in rows:
+            users.append(self.users.setdefault(str(user_id), len(self.users)))
+            tracks.append(self.tracks.setdefault(str(track_id), len(self.tracks)))
+            values.append(value)
+        self.rows.append(np.array(users, dtype=np.int32))
+        self.cols.append(np.array(tracks, dtype=np.int32))
+        self.weights.append(weight(np.array(values, dtype=np.float32)))
+
+    def matrix(self) -> sparse.csr_matrix:
+        shape = (len(self.users), len(self.tracks))
+        if not self.rows:
+            return sparse.csr_matrix(shape, dtype=np.float32)
+        # повторы (user, track) из истории и избранного складываются
+        return sparse.coo_matrix(
+            (np.concatenate(self.weights), (np.concatenate(self.rows), np.concatenate(self.cols))),
+            shape=shape
+        ).tocsr()
+
+
+async def read_interactions(dsn: str) -> Interactions:
+    interactions = Interactions()
+    engine = create_async_engine(dsn)
+    sources = (
+        (
+            "play_history",
+            select(play_history.c.user_id, play_history.c.track_id, func.count())
+            .group_by(play_history.c.user_id, play_history.c.track_id),
+            np.log1p,
+        ),
+        (
+            # пара (user, track) в избранном уникальна
+            "favorite_tracks",
+            select(favorite_tracks.c.user_id, favorite_tracks.c.track_id, literal(1)),
+            lambda values: np.full_like(values, FAVORITE_WEIGHT),
+        ),
+    )
+    try:
+        async with engine.connect() as conn:
+            for name, query, weight in sources:
+                result = await conn.stream(query.execution_options(yield_per=CHUNK_SIZE))
+                async for rows in result.partitions(CHUNK_SIZE):
+                    interactions.add(rows, weight)
+                logger.info(
+                    f"[cooccurrence] Read {name}: {len(interactions.users)} users, "
+                    f"{len(interactions.tracks)} tracks so far"
+                )
+    finally:
+        await engine.dispose()
+    return interactions
+
+
+def cap_user_items(matrix: sparse.csr_matrix, limit: int = MAX_ITEMS_PER_USER) -> sparse.csr_matrix:
+    counts = np.diff(matrix.indptr)
+    for user in np.flatnonzero(counts > limit):
+        start, stop = matrix.indptr[user], matrix.indptr[user + 1]
+        weights = matrix.data[start:stop]
+        weights[np.argpartition(weights, len(weights) - limit)[:len(weights) - limit]] = 0
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def top_neighbors(block: sparse.csr_matrix, first_row: int, top_n: int = TOP_N):
+    """Для каждой строки блока — top_n соседей по убыванию сходства, без самого трека."""
+    indptr, indices, scores = [0], [], []
+    for i in range(block.shape[0]):
+        start, stop = block.indptr[i], block.indptr[i + 1]
+        cols, sims = block.indices[start:stop], block.data[start:stop]
+        keep = cols != first_row + i
+        cols, sims = cols[keep], sims[keep]
+        if len(sims) > top_n:
+            best = np.argpartition(sims, len(sims) - top_n)[-top_n:]
+            cols, sims = cols[best], sims[best]
+        order = np.argsort(sims)[::-1]
+        indices.append(cols[order])
+        scores.append(sims[order])
+        indptr.append(indptr[-1] + len(order))
+    return np.array(indptr[1:], dtype=np.int64), indices, scores
+
+
+def item_embeddings(matrix: sparse.csr_matrix, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Строки V·sqrt(S) усечённого SVD, нормированные; нули, если данных на SVD не хватает."""
+    dim = min(dim, min(matrix.shape) - 1)
+    if dim < 1:
+        return np.zeros((matrix.shape[1], 1), dtype=np.float32)
+    _, singular, vt = svds(matrix, k=dim)
+    embeddings = (vt.T * np.sqrt(singular)).astype(np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def build_model(interactions: Interactions, top_n: int = TOP_N):
+    """CSR top-N соседей и эмбеддинги; строки и столбцы упорядочены по id трека."""
+    ids = np.array(list(interactions.tracks), dtype="S36")
+    order = np.argsort(ids)
+    matrix = cap_user_items(interactions.matrix())[:, order].tocsc()
+
+    # косинус: нормируем столбцы, тогда X^T·X — матрица сходств
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = (matrix @ sparse.diags(1.0 / norms)).tocsr().astype(np.float32)
+    transposed = matrix.T.tocsr()
+
+    indptr, indices, scores = [np.zeros(1, dtype=np.int64)], [], []
+    for start in range(0, matrix.shape[1], ITEM_BLOCK):
+        block = (transposed[start:start + ITEM_BLOCK] @ matrix).tocsr()
+        block_indptr, block_indices, block_scores = top_neighbors(block, start, top_n)
+        indptr.append(block_indptr + indptr[-1][-1])
+        indices.extend(block_indices)
+        scores.extend(block_scores)
+
+    return (
+        ids[order],
+        np.concatenate(indptr),
+        np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+        np.concatenate(scores) if scores else np.empty(0, dtype=np.float32),
+        item_embeddings(matrix),
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    cfg = load_config()
+    started = time.perf_counter()
+    interactions = await read_interactions(str(cfg.PG_ASYNC_DSN))
+    ids, indptr, indices, scores, embeddings = build_model(interactions, args.top_n)
+    path = save_model(args.output or cfg.COOCCURRENCE_DIR, ids, indptr, indices, scores, embeddings)
+    logger.info(
+        f"[cooccurrence] Built {path.name}: {len(ids)} tracks, {len(indices)} neighbors "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    setup_logging(f"{load_config().SERVICE_NAME}-jobs")
+    parser = argparse.ArgumentParser(description="Build the item-item co-occurrence model")
+    parser.add_argument("--top-n", type=int, default=TOP_N)
+    parser.add_argument("--output", help="model directory (default: COOCCURRENCE_DIR)")
+    asyncio.run(main(parser.parse_args()))
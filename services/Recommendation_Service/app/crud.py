@@ -1,3 +1,4 @@
+import asyncio
 import random
 
 from sqlalchemy.future import select
@@ -6,18 +7,27 @@ from uuid import UUID
 from typing import List, Set
 import logging
 
-from .recommendation_service import save_start_index
 from .schemas import UserRecommendationUpdate, TrackResponse
+from .database import db_initializer
 from .database.models import UserRecommendation
-from .fetch_from_music_service.fetch_all_tracks import fetch_all_tracks_from_music_service
+from . import catalog_store
+from .catalog_snapshot import get_snapshot
+from .similar_index import get_index
+from .fetch_from_music_service.fetch_all_tracks import ensure_catalog
 from .fetch_from_music_service.fetch_analytics import fetch_user_analytics
-from .redis_recent import track_recent_key, push_recent_track_ids, MAX_RECENT
-from .recommendation import recommend_tracks
-from .broker.redis import redis_client
+from .redis_recent import track_recent_key, MAX_RECENT
+from .recommendation import recommend_tracks, select_tracks, RECOMMENDATION_SIZE
+from . import wave_queue
+from .scoring import analytics_fields
+from .broker.redis import redis_client, redis_health
 from fastapi import HTTPException
+from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
+# сколько /my-wave ждёт аналитику, когда подбирает треки на лету
+ONLINE_ANALYTICS_TIMEOUT = 2.0
+
 
 async def get_recommended_tracks_from_db(db: AsyncSession, user_id: UUID) -> List[TrackResponse]:
     result = await db.execute(select(UserRecommendation).where(UserRecommendation.user_id == user_id))
@@ -50,72 +60,177 @@ async def upsert_user_recommendation(db: AsyncSession, user_id: UUID, data: User
     await db.refresh(recommendation)
     return recommendation
 
+async def save_user_recommendation(db: AsyncSession, user_id: UUID, analytics: dict, track_ids: List[str]) -> None:
+    fields = analytics_fields(analytics)
+    update_data = UserRecommendationUpdate(
+        recommended_tracks=track_ids,
+        avg_duration_from_history=fields.get('avg_duration_from_history', None),
+        avg_release_year_from_history=fields.get('avg_release_year_from_history', None),
+        top_genres_from_history=fields.get('top_genres_from_history', None),
+        top_moods_from_history=fields.get('top_moods_from_history', None),
+        avg_duration_from_favorites=fields.get('avg_duration_from_favorites', None),
+        avg_release_year_from_favorites=fields.get('avg_release_year_from_favorites', None),
+        top_genres_from_favorites=fields.get('top_genres_from_favorites', None),
+        top_moods_from_favorites=fields.get('top_moods_from_favorites', None),
+        total_plays=fields.get('total_plays', None),
+        total_favorites=fields.get('total_favorites', None),
+        most_favorite_tracks=fields.get('most_favorite_tracks', []),
+    )
+
+    await upsert_user_recommendation(db, user_id, update_data)
+
+
+def to_track_responses(tracks: List[dict]) -> List[TrackResponse]:
+    return [
+        TrackResponse(
+            id=str(t["id"]),
+            title=t.get("title") or "",
+            artist=t.get("artist") or "",
+            track_url=t.get("track_url") or "",
+            cover_url=t.get("cover_url") or ""
+        ) for t in tracks
+    ]
+
+
 # Получаем рекомендованные треки
 async def get_recommended_tracks(db: AsyncSession, user_id: UUID) -> List[TrackResponse]:
+    """
+    Отдаёт следующую порцию из заранее подобранной очереди пользователя; подбор на лету —
+    только если очередь пуста (первый запрос, истёкший TTL). Без Redis нет ни очереди,
+    ни данных треков — отвечаем 503, а не пустым списком.
+    """
+    # без PING: состояние выводится из исходов обычных команд
+    if not redis_health.available():
+        logger.error(f"[{user_id}] Redis circuit is open. Cannot fetch recommendations.")
+        raise HTTPException(status_code=503, detail="Recommendations are temporarily unavailable")
+
+    try:
+        queued_ids = await wave_queue.pop_tracks(user_id, RECOMMENDATION_SIZE)
+        # тот же скрипт, что снял треки, уже записал их в недавние
+        selected = await catalog_store.get_tracks(queued_ids) if queued_ids else []
+    except RedisError as e:
+        logger.error(f"[{user_id}] Wave queue unavailable: {e}")
+        selected = []
+
+    if selected:
+        recommended_tracks_details = to_track_responses(selected)
+        random.shuffle(recommended_tracks_details)
+        return recommended_tracks_details
+
+    logger.info(f"[{user_id}] Wave queue is empty, generating recommendations online")
+    try:
+        await wave_queue.request_refill(user_id)
+    except RedisError as e:
+        logger.error(f"[{user_id}] Failed to schedule wave queue refill: {e}")
+
+    try:
+        return await generate_recommended_tracks(db, user_id)
+    except RedisError as e:
+        logger.error(f"[{user_id}] Redis error while generating recommendations: {e}")
+        raise HTTPException(status_code=503, detail="Recommendations are temporarily unavailable")
+
+
+async def generate_recommended_tracks(db: AsyncSession, user_id: UUID) -> List[TrackResponse]:
     recent_key = track_recent_key(user_id)
 
     try:
-        recent_ids_list = await redis_client.lrange(recent_key, 0, MAX_RECENT - 1)
-        recent_ids: Set[str] = set(recent_ids_list)
-    except Exception as e:
+        recent_ids: Set[str] = set(await redis_client.lrange(recent_key, 0, MAX_RECENT - 1))
+    except RedisError as e:
         logger.error(f"[{user_id}] Redis error: {e}")
         recent_ids = set()
 
     logger.info(f"[{user_id}] Recent IDs count: {len(recent_ids)}")
 
-    analytics = await fetch_user_analytics(user_id)
+    # запрос ждёт аналитику сам, поэтому таймаут короче, чем у фонового дополнения
+    analytics = await fetch_user_analytics(user_id, timeout=ONLINE_ANALYTICS_TIMEOUT)
     if not analytics:
         logger.error(f"[{user_id}] No analytics data found")
         return []
 
-    all_tracks = await fetch_all_tracks_from_music_service()
-    logger.info(f"[{user_id}] Total tracks fetched: {len(all_tracks)}")
+    await ensure_catalog()
+    catalog = await get_snapshot()
+    logger.info(f"[{user_id}] Catalog snapshot size: {len(catalog) if catalog else 0}")
 
-    if not all_tracks:
+    if not catalog:
         return []
 
-    all_ids = {str(t["id"]) for t in all_tracks}
+    # если недавние покрывают почти весь каталог, recommend_tracks сбросит историю
+    selected_ids = await recommend_tracks(user_id, analytics, catalog, recent_ids)
+    selected = await catalog_store.get_tracks(selected_ids)
 
-    if recent_ids.issuperset(all_ids):
-        logger.info(f"[{user_id}] Recent IDs cover all tracks, resetting recent history")
-        await redis_client.delete(recent_key)
-        recent_ids = set()
+    recommended_tracks_details = to_track_responses(selected)
 
-    filtered_tracks = [t for t in all_tracks if str(t["id"]) not in recent_ids]
+    await save_user_recommendation(db, user_id, analytics, [t.id for t in recommended_tracks_details])
+    random.shuffle(recommended_tracks_details)
 
-    if len(filtered_tracks) < 6:
-        logger.info(f"[{user_id}] Not enough filtered tracks, resetting recent history")
-        filtered_tracks = all_tracks
+    return recommended_tracks_details
 
-    selected = await recommend_tracks(user_id, analytics, filtered_tracks, recent_ids)
 
-    recommended_tracks_details = [
-        TrackResponse(
-            id=str(t["id"]),
-            title=t.get("title", ""),
-            artist=t.get("artist", ""),
-            track_url=t.get("track_url", ""),
-            cover_url=t.get("cover_url", "")
-        ) for t in selected
-    ]
+async def get_similar_tracks(track_id: UUID, limit: int) -> List[TrackResponse]:
+    await ensure_catalog()
+    catalog = await get_snapshot()
+    if not catalog:
+        raise HTTPException(status_code=503, detail="Catalog is not loaded yet")
 
-    update_data = UserRecommendationUpdate(
-        recommended_tracks=[t.id for t in recommended_tracks_details],
-        avg_duration_from_history=analytics.get('avg_duration_from_history', None),
-        avg_release_year_from_history=analytics.get('avg_release_year_from_history', None),
-        top_genres_from_history=analytics.get('top_genres_from_history', None),
-        top_moods_from_history=analytics.get('top_moods_from_history', None),
-        avg_duration_from_favorites=analytics.get('avg_duration_from_favorites', None),
-        avg_release_year_from_favorites=analytics.get('avg_release_year_from_favorites', None),
-        top_genres_from_favorites=analytics.get('top_genres_from_favorites', None),
-        top_moods_from_favorites=analytics.get('top_moods_from_favorites', None),
-        total_plays=analytics.get('total_plays', None),
-        total_favorites=analytics.get('total_favorites', None),
-        most_favorite_tracks=analytics.get('most_favorite_tracks', []),
-    )
+    index = await get_index(catalog)
+    if index is None:
+        raise HTTPException(status_code=503, detail="Similar tracks index is not built yet")
 
-    await upsert_user_recommendation(db, user_id, update_data)
-    await push_recent_track_ids(redis_client, user_id, [t["id"] for t in selected if t.get("id")])
-    random.shuffle(recommended_tracks_details)
+    similar_ids = index.search(str(track_id), limit)
+    if similar_ids is None:
+        raise HTTPException(status_code=404, detail="Track not found")
 
-    return recommended_tracks_details
\ No newline at end of file
+    return to_track_responses(await catalog_store.get_tracks(similar_ids))
+
+
+async def refill_wave_queue(user_id: str) -> int:
+    """Дополняет очередь пользователя до QUEUE_SIZE; возвращает число добавленных треков."""
+    analytics = await fetch_user_analytics(user_id)
+    if not analytics:
+        logger.error(f"[{user_id}] No analytics data found, wave queue is not refilled")
+        return 0
+
+    await ensure_catalog()
+    catalog = await get_snapshot()
+    if not catalog:
+        return 0
+
+    queued = await wave_queue.queued_tracks(user_id)
+    missing = wave_queue.QUEUE_SIZE - len(queued)
+    if missing <= 0:
+        return 0
+
+    recent = await redis_client.lrange(track_recent_key(user_id), 0, MAX_RECENT - 1)
+    excluded = set(queued) | set(recent)
+    if len(catalog) - len(catalog.positions(excluded)) < missing:
+        # каталог меньше очереди и истории вместе: недавние треки могут повториться
+        excluded = set(queued)
+
+    # скоринг каталога — numpy без GIL, event loop на это время не блокируется
+    track_ids = await asyncio.to_thread(select_tracks, analytics, catalog, excluded, missing)
+    await wave_queue.push_tracks(user_id, track_ids)
+
+    async with db_initializer.async_session_maker() as db:
+        await save_user_recommendation(db, UUID(user_id), analytics, queued + track_ids)
+    return len(track_ids)
+
+
+async def refill_pending_queues() -> int:
+    """Один проход фоновой задачи: дополняет очереди пользователей из wave:refill."""
+    user_ids = await wave_queue.pending_users(wave_queue.REFILL_BATCH)
+    if not user_ids:
+        return 0
+
+    semaphore = asyncio.Semaphore(wave_queue.REFILL_CONCURRENCY)
+
+    async def refill(user_id: str) -> int:
+        async with semaphore:
+            try:
+                return await refill_wave_queue(user_id)
+            except Exception as e:
+                logger.error(f"[{user_id}] Wave queue refill failed: {e}")
+                return 0
+
+    added = await asyncio.gather(*(refill(user_id) for user_id in user_ids))
+    logger.info(f"[wave] Refilled {len(user_ids)} queues with {sum(added)} tracks")
+    return len(user_ids)
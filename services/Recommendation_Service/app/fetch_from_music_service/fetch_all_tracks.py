@@ -1,86 +1,160 @@
+import asyncio
 import httpx
 import logging
-import json
-from redis.asyncio import Redis
+from uuid import UUID
 from redis.exceptions import RedisError
 
+from .. import catalog_store
+
 logger = logging.getLogger(__name__)
 
 MUSIC_SERVICE_URL = "http://music-service:5002/tracks"
-CACHE_KEY = "cached_all_tracks"
-CACHE_TTL = 300
 
-redis_client = Redis(host="redis", port=6379, db=0, decode_responses=True)
+PAGE_SIZE = 1000
+# каталог читается диапазонами id параллельно, каждый диапазон — keyset-курсором
+PARTITIONS = 16
+CONCURRENCY = 8
+PAGE_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+_http_client: httpx.AsyncClient | None = None
+_refresh_lock = asyncio.Lock()
+
+
+class IncompleteCatalogError(Exception):
+    """Не удалось получить часть каталога — такой снимок публиковать нельзя."""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Общий клиент с пулом соединений к music-service на всё время жизни процесса."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def partition_bounds(partitions: int = PARTITIONS) -> list[tuple[str | None, str | None]]:
+    """
+    Делит пространство UUID на равные диапазоны (id треков — uuid4, распределены равномерно).
+    Границы вида 10000000-0000-0000-0000-000000000000 не бывают uuid4, поэтому
+    исключающие границы курсора ничего не теряют.
+    """
+    step = (1 << 128) // partitions
+    bounds = [None] + [str(UUID(int=step * i)) for i in range(1, partitions)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
 
 async def update_tracks_in_redis(all_tracks):
-    try:
-        cached_tracks_data = await redis_client.get(CACHE_KEY)
-        if cached_tracks_data:
-            cached_tracks = json.loads(cached_tracks_data)
-        else:
-            cached_tracks = []
-
-        track_ids_in_cache = {track["id"] for track in cached_tracks}
-
-        for track in all_tracks:
-            track_id = track["id"]
-            track_version = track.get("updated_at", "default")
-
-            if track_id in track_ids_in_cache:
-                for cached_track in cached_tracks:
-                    if cached_track["id"] == track_id and cached_track.get("updated_at") != track_version:
-                        cached_tracks.remove(cached_track)
-                        cached_tracks.append(track)
-                        logger.info(f"[cache] Track {track_id} updated in cache.")
-                        break
-            else:
-                cached_tracks.append(track)
-
-        await redis_client.set(CACHE_KEY, json.dumps(cached_tracks), ex=CACHE_TTL)
-        logger.info(f"[cache] Saved {len(cached_tracks)} tracks in Redis.")
+    if not all_tracks:
+        logger.warning("[cache] Empty catalog snapshot, keeping the cached one.")
+        return
 
+    try:
+        stats = await catalog_store.merge_snapshot(all_tracks)
+        logger.info(
+            f"[cache] Catalog merged: {stats['added']} added, {stats['updated']} updated, "
+            f"{stats['removed']} removed, version {stats['version']}."
+        )
     except RedisError as e:
         logger.warning(f"[cache] Failed to update Redis: {e}")
     except Exception as e:
         logger.error(f"[cache] Unexpected error: {e}")
 
 
-async def fetch_all_tracks_from_music_service(limit_per_page: int = 100) -> list[dict]:
+async def fetch_page(client: httpx.AsyncClient, params: dict) -> list[dict]:
+    for attempt in range(1, PAGE_RETRIES + 1):
+        try:
+            response = await client.get(MUSIC_SERVICE_URL, params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            # 4xx не исправится повтором
+            if e.response.status_code < 500 or attempt == PAGE_RETRIES:
+                raise IncompleteCatalogError(f"HTTP {e.response.status_code} for page {params}") from e
+            logger.warning(f"[music-service] HTTP {e.response.status_code}, retrying page {params}")
+        except httpx.RequestError as e:
+            if attempt == PAGE_RETRIES:
+                raise IncompleteCatalogError(f"Request failed for page {params}: {e}") from e
+            logger.warning(f"[music-service] Request failed ({e}), retrying page {params}")
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+async def fetch_partition(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    after: str | None,
+    before: str | None
+) -> list[dict]:
+    tracks = []
+    while True:
+        params = {"limit": PAGE_SIZE}
+        if after:
+            params["after"] = after
+        if before:
+            params["before"] = before
+
+        async with semaphore:
+            page = await fetch_page(client, params)
+
+        tracks.extend(page)
+        if len(page) < PAGE_SIZE:
+            return tracks
+        after = page[-1]["id"]
+
+
+async def fetch_all_tracks_from_music_service() -> list[dict]:
+    """
+    Полный снимок каталога: диапазоны id читаются параллельно (не больше CONCURRENCY
+    запросов одновременно), страницы повторяются при сбоях. Если хоть одна страница
+    так и не получена, бросает IncompleteCatalogError вместо частичного результата;
+    остальные диапазоны при этом отменяются, а не дочитываются впустую.
+    """
+    client = get_http_client()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
     try:
-        cached = await redis_client.get(CACHE_KEY)
-        if cached:
-            logger.info(f"[cache] Loaded from Redis: {CACHE_KEY}")
-            return json.loads(cached)
-    except RedisError as e:
-        logger.warning(f"[cache] Redis unavailable during get: {e}")
-
-    logger.info("[cache] Cache is empty or Redis is unavailable — fetching from music-service.")
-    all_tracks = []
-    skip = 0
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        while True:
-            params = {"skip": skip, "limit": limit_per_page}
-            try:
-                response = await client.get(MUSIC_SERVICE_URL, params=params)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"[music-service] HTTP {e.response.status_code}: {e}")
-                break
-            except httpx.RequestError as e:
-                logger.error(f"[music-service] Request failed: {e}")
-                break
-
-            tracks = response.json()
-            if not tracks:
-                break
-
-            all_tracks.extend(tracks)
-            skip += limit_per_page
-
+        async with asyncio.TaskGroup() as group:
+            partitions = [
+                group.create_task(fetch_partition(client, semaphore, after, before))
+                for after, before in partition_bounds()
+            ]
+    except* IncompleteCatalogError as errors:
+        raise errors.exceptions[0]
+    return [track for partition in partitions for track in partition.result()]
+
+
+async def refresh_catalog() -> int:
+    """Перечитывает каталог из music-service и обновляет его в Redis; возвращает число треков."""
+    logger.info("[cache] Fetching catalog from music-service.")
+    all_tracks = await fetch_all_tracks_from_music_service()
+    await update_tracks_in_redis(all_tracks)
+    return len(all_tracks)
+
+
+async def ensure_catalog() -> None:
+    """Холодный старт: если каталога в Redis ещё нет, загружает его сразу, не дожидаясь фоновой задачи."""
     try:
-        await update_tracks_in_redis(all_tracks)
+        if await catalog_store.count_tracks():
+            return
     except RedisError as e:
-        logger.warning(f"[cache] Failed to save in Redis: {e}")
-
-    return all_tracks
+        logger.warning(f"[cache] Redis unavailable during catalog check: {e}")
+        return
+
+    async with _refresh_lock:
+        # параллельные запросы ждут одну загрузку, а не запускают свои
+        if await catalog_store.count_tracks():
+            return
+        logger.info("[cache] Catalog is empty — fetching from music-service.")
+        try:
+            await refresh_catalog()
+        except IncompleteCatalogError as e:
+            logger.error(f"[cache] Catalog fetch incomplete, nothing published: {e}")
@@ -7,10 +7,10 @@ logger = logging.getLogger(__name__)
 # ANALYTICS_SERVICE_URL = "http://analytics-service:5003/user/analytics/raw-data/{user_id}"
 ANALYTICS_SERVICE_URL = "http://analytics-service:5003/user/analytics/raw-data"
 
-async def fetch_user_analytics(user_id: UUID) -> dict:
+async def fetch_user_analytics(user_id: UUID, timeout: float = 10.0) -> dict:
     url = f"{ANALYTICS_SERVICE_URL}?user_id={user_id}&internal=true"
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=timeout) as client:
             response = await client.get(url)
             response.raise_for_status()
             data = response.json()
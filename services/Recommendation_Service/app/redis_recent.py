@@ -2,7 +2,7 @@ from uuid import UUID
 from typing import List
 import logging
 
-from .broker.redis import check_redis_connection
+from .broker.redis import redis_client as default_client, redis_health
 
 logger = logging.getLogger(__name__)
 MAX_RECENT = 100
@@ -12,25 +12,41 @@ def track_recent_key(user_id: UUID) -> str:
     return f"user:{user_id}:recent_tracks"
 
 
-async def push_recent_track_ids(redis_client, user_id: UUID, track_ids: List[str]):
-    redis_connected = await check_redis_connection()
-    if not redis_connected:
-        print(f"[{user_id}] Redis connection failed. Cannot fetch recommendations.")
-        return []
+# Перемещает id в голову списка недавних (без дублей) и обрезает список — атомарно,
+# за один EVALSHA вместо LREM + LPUSH на каждый трек и отдельного LTRIM.
+# KEYS[1] — список недавних; ARGV[1] — MAX_RECENT, ARGV[2] — 1, чтобы сначала
+# очистить историю; ARGV[3..] — id треков
+PUSH_RECENT_LUA = """
+if ARGV[2] == '1' then
+    redis.call('DEL', KEYS[1])
+end
+for i = 3, #ARGV do
+    redis.call('LREM', KEYS[1], 0, ARGV[i])
+    redis.call('LPUSH', KEYS[1], ARGV[i])
+end
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+return redis.call('LLEN', KEYS[1])
+"""
+
+push_recent_script = default_client.register_script(PUSH_RECENT_LUA)
+
+
+async def push_recent_track_ids(redis_client, user_id: UUID, track_ids: List[str], reset: bool = False) -> None:
+    # без PING: состояние выводится из исходов обычных команд
+    if not redis_health.available():
+        logger.warning(f"[{user_id}] Redis circuit is open. Recent track history not updated.")
+        return
 
-    if not track_ids:
+    if not track_ids and not reset:
         logger.warning(f"[{user_id}] No track IDs provided to update recent track history.")
         return
 
-    key = track_recent_key(user_id)
-
     try:
-        for tid in track_ids:
-            if await redis_client.lrem(key, 0, tid) == 0:
-                await redis_client.lpush(key, tid)
-
-        await redis_client.ltrim(key, 0, MAX_RECENT - 1)
-
+        await push_recent_script(
+            keys=[track_recent_key(user_id)],
+            args=[MAX_RECENT, int(reset), *track_ids],
+            client=redis_client
+        )
         logger.info(f"[{user_id}] Updated recent track history in Redis with {len(track_ids)} tracks.")
 
     except Exception as e:
@@ -0,0 +1,116 @@
+"""
+Ранжирование каталога по вектору предпочтений пользователя.
+
+Вектор строится из аналитики: веса жанров и настроений (избранное весит больше
+истории, первые места в топе — больше последних) и близость к средним году и
+длительности. Близость гауссова: -(x - μ)² / 2σ² раскрывается в линейную
+комбинацию x и x² (константа на порядок не влияет), поэтому скор каждого трека —
+одно умножение матрицы признаков снимка на вектор, а top-k берётся argpartition
+без полной сортировки.
+
+Если загружена модель совместной встречаемости (cooccurrence.py), соседи последних
+избранных треков пользователя становятся кандидатами: к их скору добавляется
+суммарное сходство с этими треками.
+"""
+import numpy as np
+
+from .catalog_snapshot import CatalogSnapshot
+from .cooccurrence import CooccurrenceModel
+
+# вклад источников аналитики
+FAVORITES_WEIGHT = 1.0
+HISTORY_WEIGHT = 0.6
+# вклад совпадений по жанру/настроению относительно близости по году и длительности
+GENRE_WEIGHT = 1.0
+MOOD_WEIGHT = 0.8
+YEAR_WEIGHT = 0.5
+DURATION_WEIGHT = 0.3
+# ширина гауссовой близости в исходных единицах: годы и секунды
+YEAR_SIGMA = 6.0
+DURATION_SIGMA = 60.0
+# вклад сходства по совместной встречаемости
+COOCCURRENCE_WEIGHT = 2.0
+# равномерный шум, чтобы при равных скорах выдача менялась от запроса к запросу
+JITTER = 0.1
+
+rng = np.random.default_rng()
+
+
+def analytics_fields(analytics: dict) -> dict:
+    """Поля аналитики: analytics-service отдаёт их под ключом "analytics"."""
+    return analytics.get("analytics") or analytics
+
+
+def ranked_weights(values: list[str] | None, weight: float) -> dict[str, float]:
+    # первое место в топе — полный вес, дальше 1/2, 1/3...
+    return {value: weight / rank for rank, value in enumerate(values or [], start=1) if value}
+
+
+def _mean(*values: float | None) -> float | None:
+    # analytics-service отдаёт 0, когда считать среднее было не по чему
+    known = [value for value in values if value]
+    return sum(known) / len(known) if known else None
+
+
+def preference_vector(analytics: dict, catalog: CatalogSnapshot) -> np.ndarray:
+    fields = analytics_fields(analytics)
+    weights = np.zeros(catalog.features.shape[1], dtype=np.float32)
+
+    for offset, names, key, scale in (
+        (0, catalog.mood_names, "top_moods", MOOD_WEIGHT),
+        (catalog.genre_offset, catalog.genre_names, "top_genres", GENRE_WEIGHT),
+    ):
+        preferences: dict[str, float] = {}
+        for source, source_weight in (("favorites", FAVORITES_WEIGHT), ("history", HISTORY_WEIGHT)):
+            for value, weight in ranked_weights(fields.get(f"{key}_from_{source}"), source_weight).items():
+                preferences[value] = preferences.get(value, 0.0) + weight
+        codes = np.searchsorted(names, list(preferences))
+        for code, (value, weight) in zip(codes, preferences.items()):
+            if code < len(names) and names[code] == value:
+                weights[offset + code] = scale * weight
+
+    numeric = catalog.numeric_offset
+    for column, key, center, spread, sigma, scale in (
+        (numeric, "avg_release_year", catalog.year_center, catalog.year_scale, YEAR_SIGMA, YEAR_WEIGHT),
+        (numeric + 2, "avg_duration", catalog.duration_center, catalog.duration_scale, DURATION_SIGMA, DURATION_WEIGHT),
+    ):
+        target = _mean(fields.get(f"{key}_from_favorites"), fields.get(f"{key}_from_history"))
+        if target is None:
+            continue
+        mu = (target - center) / spread
+        variance = (sigma / spread) ** 2
+        weights[column] = scale * mu / variance
+        weights[column + 1] = -scale / (2 * variance)
+
+    return weights
+
+
+def add_cooccurrence(scores: np.ndarray, analytics: dict, catalog: CatalogSnapshot, model: CooccurrenceModel) -> None:
+    seeds = [str(track_id) for track_id in analytics_fields(analytics).get("most_favorite_tracks") or []]
+    candidates = model.candidates(seeds)
+    positions, similarities = [], []
+    for track_id, similarity in candidates.items():
+        position = catalog.index.get(track_id)
+        if position is not None:
+            positions.append(position)
+            similarities.append(similarity)
+    if positions:
+        scores[positions] += COOCCURRENCE_WEIGHT * np.array(similarities, dtype=np.float32)
+
+
+def score_tracks(analytics: dict, catalog: CatalogSnapshot, model: CooccurrenceModel | None = None) -> np.ndarray:
+    scores = catalog.features @ preference_vector(analytics, catalog)
+    if model is not None:
+        add_cooccurrence(scores, analytics, catalog, model)
+    scores += rng.random(len(scores), dtype=np.float32) * np.float32(JITTER)
+    return scores
+
+
+def top_k(scores: np.ndarray, available: np.ndarray, k: int) -> np.ndarray:
+    """Позиции k лучших доступных треков по убыванию скора."""
+    k = min(k, int(np.count_nonzero(available)))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    scores = np.where(available, scores, -np.inf)
+    best = np.argpartition(scores, len(scores) - k)[-k:]
+    return best[np.argsort(scores[best])[::-1]]
@@ -0,0 +1,203 @@
+"""
+Индекс ближайших соседей для «похожих треков» (GET /tracks/{id}/similar).
+
+Вектор трека — взвешенные one-hot настроения и жанра, стандартизованные год и
+длительность из снимка каталога плюс эмбеддинг из модели совместной встречаемости
+(если трек в ней есть); вектор нормирован, сходство — скалярное произведение.
+
+До BRUTE_FORCE_LIMIT треков поиск точный: одно умножение всей матрицы на вектор.
+Для больших каталогов — IVF: сферический k-means делит векторы на ~sqrt(n) списков,
+хранящихся подряд во float16, запрос сравнивается с центроидами и сканирует только
+NPROBE ближайших списков (единицы тысяч векторов вместо миллиона).
+
+Индекс пересобирается в фоне при смене версии каталога или сборки модели. Центроиды
+переиспользуются: новые векторы только раскладываются по готовым спискам, а k-means
+обучается заново, когда каталог заметно изменился в размере или в составе признаков.
+"""
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from .catalog_snapshot import CatalogSnapshot
+from .cooccurrence import CooccurrenceModel, get_model
+
+logger = logging.getLogger(__name__)
+
+BRUTE_FORCE_LIMIT = 50_000
+NPROBE = 16
+KMEANS_SAMPLE = 65_536
+KMEANS_ITERATIONS = 10
+# размер пакета при раскладке по спискам: пакет × число списков float32 в памяти
+ASSIGN_BATCH = 8192
+# доля изменения размера каталога, после которой центроиды обучаются заново
+RETRAIN_DRIFT = 0.2
+
+MOOD_WEIGHT = 1.0
+GENRE_WEIGHT = 1.0
+YEAR_WEIGHT = 0.5
+DURATION_WEIGHT = 0.3
+EMBEDDING_WEIGHT = 1.5
+
+rng = np.random.default_rng()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def track_vectors(catalog: CatalogSnapshot, model: CooccurrenceModel | None) -> np.ndarray:
+    features = catalog.features
+    numeric = catalog.numeric_offset
+    meta = np.concatenate([
+        features[:, :catalog.genre_offset] * MOOD_WEIGHT,
+        features[:, catalog.genre_offset:numeric] * GENRE_WEIGHT,
+        features[:, [numeric]] * YEAR_WEIGHT,
+        features[:, [numeric + 2]] * DURATION_WEIGHT,
+    ], axis=1)
+    blocks = [_normalize(meta)]
+
+    if model is not None and model.embeddings is not None:
+        rows = model.rows(catalog.ids)
+        embeddings = np.zeros((len(catalog), model.embeddings.shape[1]), dtype=np.float32)
+        known = rows >= 0
+        embeddings[known] = model.embeddings[rows[known]]
+        blocks.append(embeddings * EMBEDDING_WEIGHT)
+
+    return _normalize(np.concatenate(blocks, axis=1)).astype(np.float32)
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        batch = vectors[start:start + ASSIGN_BATCH].astype(np.float32)
+        assignment[start:start + ASSIGN_BATCH] = np.argmax(batch @ centroids.T, axis=1)
+    return assignment
+
+
+def train_centroids(vectors: np.ndarray, lists: int) -> np.ndarray:
+    """Сферический k-means на случайной выборке векторов."""
+    sample = vectors[rng.choice(len(vectors), size=min(KMEANS_SAMPLE, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # пустой список сохраняет прежний центроид
+        filled = np.bincount(assignment, minlength=lists) > 0
+        centroids[filled] = _normalize(sums[filled])
+    return centroids
+
+
+class SimilarIndex:
+    def __init__(
+        self,
+        catalog: CatalogSnapshot,
+        model: CooccurrenceModel | None,
+        previous: "SimilarIndex | None" = None
+    ) -> None:
+        self.catalog = catalog
+        self.key = index_key(catalog, model)
+        vectors = track_vectors(catalog, model)
+        self.dim = vectors.shape[1]
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+
+        if len(vectors) <= BRUTE_FORCE_LIMIT:
+            self.vectors = vectors
+            return
+
+        if previous is not None and previous.reusable_for(len(vectors), self.dim):
+            self.centroids, self.trained_size = previous.centroids, previous.trained_size
+        else:
+            lists = int(np.clip(np.sqrt(len(vectors)), 16, 4096))
+            self.centroids, self.trained_size = train_centroids(vectors, lists), len(vectors)
+
+        assignment = assign_lists(vectors, self.centroids)
+        self.order = np.argsort(assignment, kind="stable")
+        self.slot = np.empty_like(self.order)
+        self.slot[self.order] = np.arange(len(self.order))
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(self.centroids)))])
+        self.vectors = vectors[self.order].astype(np.float16)
+
+    def reusable_for(self, size: int, dim: int) -> bool:
+        return (
+            self.centroids is not None
+            and self.dim == dim
+            and abs(size - self.trained_size) <= RETRAIN_DRIFT * self.trained_size
+        )
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def search(self, track_id: str, k: int) -> list[str] | None:
+        """Id k ближайших к треку по убыванию сходства; None, если трека нет в индексе."""
+        position = self.catalog.index.get(track_id)
+        if position is None:
+            return None
+
+        if self.centroids is None:
+            query = self.vectors[position]
+            positions = np.arange(len(self.vectors))
+            scores = self.vectors @ query
+        else:
+            query = self.vectors[self.slot[position]].astype(np.float32)
+            probes = np.argpartition(self.centroids @ query, len(self.centroids) - NPROBE)[-NPROBE:]
+            # списки лежат подряд: срезы без копирования fancy-индексом
+            ranges = [(self.offsets[p], self.offsets[p + 1]) for p in probes]
+            positions = np.concatenate([self.order[start:stop] for start, stop in ranges])
+            scores = np.concatenate([self.vectors[start:stop].astype(np.float32) @ query for start, stop in ranges])
+
+        scores[positions == position] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        best = np.argpartition(scores, len(scores) - k)[-k:]
+        best = best[np.argsort(scores[best])[::-1]]
+        return self.catalog.track_ids(positions[best])
+
+
+def index_key(catalog: CatalogSnapshot, model: CooccurrenceModel | None) -> tuple:
+    return catalog.version, model.path if model is not None else None
+
+
+_index: SimilarIndex | None = None
+_build_task: asyncio.Task | None = None
+_build_lock = asyncio.Lock()
+
+
+async def _rebuild(catalog: CatalogSnapshot, model: CooccurrenceModel | None) -> None:
+    global _index
+    started = time.perf_counter()
+    try:
+        # numpy отпускает GIL на матричных операциях, event loop при сборке не стоит
+        _index = await asyncio.to_thread(SimilarIndex, catalog, model, _index)
+    except Exception as e:
+        logger.error(f"[similar] Index build failed: {e}")
+        return
+    mode = "brute-force" if _index.centroids is None else f"IVF with {len(_index.centroids)} lists"
+    logger.info(
+        f"[similar] Index for catalog v{catalog.version} built ({mode}, {len(_index)} tracks) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+async def get_index(catalog: CatalogSnapshot) -> SimilarIndex | None:
+    """
+    Индекс для текущих снимка и модели. Первый вызов ждёт сборки; дальше при их смене
+    новый индекс строится в фоне, а запросы до его готовности обслуживает старый.
+    """
+    global _build_task
+    model = get_model()
+    if _index is None:
+        async with _build_lock:
+            if _index is None:
+                await _rebuild(catalog, model)
+        return _index
+
+    if _index.key != index_key(catalog, model) and (_build_task is None or _build_task.done()):
+        _build_task = asyncio.create_task(_rebuild(catalog, model))
+    return _index
@@ -0,0 +1,138 @@
+"""
+Проверка JWT с кэшем проверенных claims.
+
+Токен проверяется не больше одного раза за время жизни в процессе: результат
+хранится в ограниченном LRU по SHA-256 токена до его `exp`, а в пределах запроса
+claims лежат в request.state.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from uuid import UUID
+
+import jwt
+from starlette.requests import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+JWT_ALGORITHMS = ["HS256"]
+JWT_AUDIENCE = ["fastapi-users:auth"]
+
+CLAIMS_CACHE_SIZE = 10_000
+# токены без exp всё равно не держим в кэше вечно
+CLAIMS_MAX_TTL = 60 * 60
+
+ROLE_MAP = {
+    "0": "DefaultUser",
+    "1": "User",
+    "2": "Artist",
+    "3": "Administrator"
+}
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    token: str = field(repr=False)
+    payload: dict[str, Any]
+
+    @property
+    def email(self) -> Optional[str]:
+        return self.payload.get("email")
+
+    @property
+    def user_id(self) -> Optional[UUID]:
+        sub = self.payload.get("sub")
+        try:
+            return UUID(sub) if sub else None
+        except ValueError:
+            return None
+
+    @property
+    def group_id(self) -> int:
+        return self.payload.get("group_id", 0)
+
+    @property
+    def role(self) -> str:
+        return ROLE_MAP.get(str(self.group_id), "DefaultUser")
+
+
+class ClaimsCache:
+    """LRU проверенных токенов: sha256(token) -> (claims, момент истечения)."""
+
+    def __init__(self, maxsize: int = CLAIMS_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[TokenClaims, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[TokenClaims]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key: bytes, claims: TokenClaims, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+claims_cache = ClaimsCache()
+
+
+def verify_token(token: str, secret: str) -> Optional[TokenClaims]:
+    """
+    Возвращает claims проверенного токена или None, если токен невалиден или истёк.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = claims_cache.get(key)
+    if claims is not None:
+        return claims
+
+    try:
+        payload = jwt.decode(token, secret, algorithms=JWT_ALGORITHMS, audience=JWT_AUDIENCE)
+    except jwt.ExpiredSignatureError:
+        logger.info("Token expired")
+        return None
+    except jwt.InvalidTokenError as e:
+        logger.warning(f"Invalid token: {e}")
+        return None
+
+    now = time.time()
+    expires_at = min(payload.get("exp", now + CLAIMS_MAX_TTL), now + CLAIMS_MAX_TTL)
+    claims = TokenClaims(token=token, payload=payload)
+    claims_cache.put(key, claims, expires_at)
+    return claims
+
+
+def bearer_token(connection: HTTPConnection) -> Optional[str]:
+    auth_header = connection.headers.get("authorization")
+    if not auth_header or not auth_header.lower().startswith("bearer "):
+        return None
+    return auth_header.split(" ", 1)[1].strip() or None
+
+
+def get_request_claims(connection: HTTPConnection, secret: str) -> Optional[TokenClaims]:
+    """
+    Claims текущего запроса: токен из Authorization проверяется один раз,
+    остальные зависимости и middleware получают тот же объект из request.state.
+    """
+    state = connection.state
+    if hasattr(state, "token_claims"):
+        return state.token_claims
+
+    token = bearer_token(connection)
+    claims = verify_token(token, secret) if token else None
+    state.token_claims = claims
+    return claims
@@ -0,0 +1,89 @@
+"""
+Очереди заранее подобранных рекомендаций «Моей волны».
+
+    user:{id}:wave_queue  — list id треков, которые отдадут следующие запросы /my-wave
+    wave:refill           — set пользователей, чьи очереди нужно дополнить
+
+/my-wave снимает из головы очереди RECOMMENDATION_SIZE треков Lua-скриптом, который за
+тот же EVALSHA переносит их в список недавних и, если в очереди осталось меньше
+LOW_WATER, ставит пользователя в wave:refill: всё состояние обновляется атомарно за
+один round-trip. Фоновая задача (crud.refill_pending_queues) дополняет очереди из
+wave:refill до QUEUE_SIZE; SPOP раздаёт пользователей между воркерами, так что одну
+очередь одновременно дополняет один процесс. Очередь живёт QUEUE_TTL: у неактивного
+пользователя она исчезает сама, а устаревшие предпочтения не задерживаются надолго.
+"""
+import logging
+from uuid import UUID
+
+from .broker.redis import redis_client
+from .redis_recent import MAX_RECENT, track_recent_key
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 60
+LOW_WATER = 18
+QUEUE_TTL = 30 * 60
+REFILL_KEY = "wave:refill"
+# пользователей за один проход фоновой задачи и одновременных дополнений
+REFILL_BATCH = 50
+REFILL_CONCURRENCY = 8
+
+
+def wave_queue_key(user_id: UUID | str) -> str:
+    return f"user:{user_id}:wave_queue"
+
+
+# KEYS: очередь, список недавних, wave:refill
+# ARGV: сколько снять, MAX_RECENT, LOW_WATER, id пользователя
+POP_TRACKS_LUA = """
+local popped = redis.call('LPOP', KEYS[1], ARGV[1])
+if popped then
+    for _, track_id in ipairs(popped) do
+        redis.call('LREM', KEYS[2], 0, track_id)
+        redis.call('LPUSH', KEYS[2], track_id)
+    end
+    redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[2]) - 1)
+else
+    popped = {}
+end
+if redis.call('LLEN', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('SADD', KEYS[3], ARGV[4])
+end
+return popped
+"""
+
+pop_tracks_script = redis_client.register_script(POP_TRACKS_LUA)
+
+
+async def pop_tracks(user_id: UUID, count: int) -> list[str]:
+    """
+    Снимает до count id из очереди и записывает их в недавние; при нехватке ставит
+    пользователя на дополнение.
+    """
+    return await pop_tracks_script(
+        keys=[wave_queue_key(user_id), track_recent_key(user_id), REFILL_KEY],
+        args=[count, MAX_RECENT, LOW_WATER, str(user_id)]
+    )
+
+
+async def request_refill(user_id: UUID) -> None:
+    await redis_client.sadd(REFILL_KEY, str(user_id))
+
+
+async def pending_users(count: int) -> list[str]:
+    return await redis_client.spop(REFILL_KEY, count) or []
+
+
+async def queued_tracks(user_id: UUID | str) -> list[str]:
+    return await redis_client.lrange(wave_queue_key(user_id), 0, -1)
+
+
+async def push_tracks(user_id: UUID | str, track_ids: list[str]) -> None:
+    if not track_ids:
+        return
+    key = wave_queue_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.rpush(key, *track_ids)
+        pipe.ltrim(key, 0, QUEUE_SIZE - 1)
+        pipe.expire(key, QUEUE_TTL)
+        await pipe.execute()
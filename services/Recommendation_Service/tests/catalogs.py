@@ -0,0 +1,16 @@
+import uuid
+
+from app.catalog_snapshot import CatalogSnapshot
+
+
+def make_catalog(tracks: list[tuple[str, str, int | None, float | None]], version: int = 1) -> CatalogSnapshot:
+    """Снимок из (mood, genre, год, длительность); id треков — uuid4, порядок как у tracks."""
+    ids = [str(uuid.uuid4()) for _ in tracks]
+    return CatalogSnapshot(
+        version,
+        ids,
+        [mood for mood, _, _, _ in tracks],
+        [genre for _, genre, _, _ in tracks],
+        ["" if year is None else str(year) for _, _, year, _ in tracks],
+        ["" if duration is None else str(duration) for _, _, _, duration in tracks],
+    )
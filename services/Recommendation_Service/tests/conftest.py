@@ -0,0 +1,20 @@
+import pytest
+
+from app.catalog_snapshot import CatalogSnapshot
+
+from .catalogs import make_catalog
+
+
+@pytest.fixture
+def catalog() -> CatalogSnapshot:
+    tracks = []
+    for mood, genre, year, duration in (
+        ("happy", "pop", 2015, 200.0),
+        ("sad", "rock", 1985, 320.0),
+        ("calm", "jazz", 1965, 400.0),
+        ("energetic", "electronic", 2020, 180.0),
+    ):
+        # по 25 почти одинаковых треков в каждом кластере
+        for i in range(25):
+            tracks.append((mood, genre, year + i % 3, duration + i))
+    return make_catalog(tracks)
@@ -0,0 +1,107 @@
+import asyncio
+import uuid
+
+import fakeredis
+import pytest
+
+from app import catalog_store
+from app.catalog_snapshot import load_snapshot
+
+
+def make_track(**fields) -> dict:
+    track = {
+        "id": str(uuid.uuid4()),
+        "title": "Title",
+        "artist": "Artist",
+        "duration": 200.0,
+        "genre": "pop",
+        "mood": "happy",
+        "release_year": 2015,
+        "track_url": "music/track.mp3",
+        "cover_url": None,
+        "hls_url": None,
+    }
+    track.update(fields)
+    return track
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(catalog_store, "redis_client", client)
+    monkeypatch.setattr(catalog_store, "_legacy_dropped", False)
+    return client
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_first_merge_adds_everything(redis):
+    tracks = [make_track() for _ in range(3)]
+
+    stats = run(catalog_store.merge_snapshot(tracks))
+
+    assert stats == {"added": 3, "updated": 0, "removed": 0, "version": 1}
+    assert run(catalog_store.count_tracks()) == 3
+    assert run(catalog_store.get_tracks([tracks[0]["id"]])) == [tracks[0]]
+
+
+def test_unchanged_snapshot_writes_nothing(redis):
+    tracks = [make_track() for _ in range(3)]
+    run(catalog_store.merge_snapshot(tracks))
+
+    stats = run(catalog_store.merge_snapshot([dict(track) for track in tracks]))
+
+    assert stats == {"added": 0, "updated": 0, "removed": 0, "version": 1}
+
+
+def test_merge_writes_only_changed_and_removes_missing(redis):
+    kept, changed, removed = make_track(), make_track(), make_track()
+    run(catalog_store.merge_snapshot([kept, changed, removed]))
+
+    changed = dict(changed, mood="sad", hls_url="music/track/playlist.m3u8")
+    added = make_track(genre="rock")
+    stats = run(catalog_store.merge_snapshot([kept, changed, added]))
+
+    assert stats == {"added": 1, "updated": 1, "removed": 1, "version": 2}
+    assert run(catalog_store.all_track_ids()) == {kept["id"], changed["id"], added["id"]}
+    assert run(catalog_store.get_tracks([changed["id"], removed["id"]])) == [changed]
+    assert not run(redis.exists(catalog_store.track_key(removed["id"])))
+
+
+def test_merge_rebuilds_catalog_written_without_meta(redis):
+    stale = make_track()
+    run(redis.sadd(catalog_store.IDS_KEY, stale["id"]))
+    run(redis.hset(catalog_store.track_key(stale["id"]), mapping={"title": "old"}))
+    tracks = [make_track(), make_track()]
+
+    stats = run(catalog_store.merge_snapshot(tracks))
+
+    assert stats["added"] == 2
+    assert run(catalog_store.all_track_ids()) == {track["id"] for track in tracks}
+    assert not run(redis.exists(catalog_store.track_key(stale["id"])))
+
+
+def test_merge_drops_legacy_keys_once(redis):
+    run(redis.set(catalog_store.LEGACY_CACHE_KEY, "[]"))
+    run(redis.sadd(catalog_store.LEGACY_INDEXES_KEY, "catalog:mood:happy"))
+    run(redis.sadd("catalog:mood:happy", "some-id"))
+
+    run(catalog_store.merge_snapshot([make_track()]))
+
+    assert not run(redis.exists(
+        catalog_store.LEGACY_CACHE_KEY, catalog_store.LEGACY_INDEXES_KEY, "catalog:mood:happy"
+    ))
+
+
+def test_snapshot_is_built_from_meta(redis):
+    tracks = [make_track(), make_track(mood="sad", genre="rock", release_year=None)]
+    run(catalog_store.merge_snapshot(tracks))
+
+    snapshot = run(load_snapshot())
+
+    assert snapshot.version == 1
+    assert set(snapshot.ids) == {track["id"] for track in tracks}
+    assert list(snapshot.mood_names) == ["happy", "sad"]
+    assert list(snapshot.genre_names) == ["pop", "rock"]
@@ -0,0 +1,148 @@
+import uuid
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from app import cooccurrence, cooccurrence_job
+from app.cooccurrence import CURRENT_LINK, KEEP_BUILDS, get_model, init_model, load_model, save_model
+from app.cooccurrence_job import FAVORITE_WEIGHT, Interactions, build_model, cap_user_items
+
+TRACKS = [str(uuid.UUID(int=i)) for i in range(1, 6)]
+T0, T1, T2, T3, T4 = TRACKS
+
+# T0 и T1 слушают одни и те же пользователи, T2 и T3 — другие; T4 слушают в одиночку
+PLAYS = [
+    ("u1", T0, 3), ("u1", T1, 3),
+    ("u2", T0, 1), ("u2", T1, 1),
+    ("u3", T2, 2), ("u3", T3, 2),
+    ("u4", T2, 1), ("u4", T3, 1), ("u4", T0, 1),
+    ("u5", T4, 1),
+]
+FAVORITES = [("u4", T3, 1)]
+
+
+def interactions(plays=PLAYS, favorites=FAVORITES) -> Interactions:
+    # те же веса, что read_interactions
+    result = Interactions()
+    result.add(plays, np.log1p)
+    result.add(favorites, lambda values: np.full_like(values, FAVORITE_WEIGHT))
+    return result
+
+
+def dense_similarities(interactions: Interactions) -> tuple[list[str], np.ndarray]:
+    """Косинусное сходство треков напрямую по плотной матрице — эталон для сборки."""
+    matrix = interactions.matrix().toarray()
+    norms = np.linalg.norm(matrix, axis=0)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+    similarities = matrix.T @ matrix
+    np.fill_diagonal(similarities, 0.0)
+    return list(interactions.tracks), similarities
+
+
+def neighbor_map(model, track_id: str) -> dict[str, float]:
+    ids, scores = model.neighbors(track_id)
+    return dict(zip(ids, scores.tolist()))
+
+
+def test_interactions_weight_plays_and_favorites():
+    source = interactions()
+    matrix, users, tracks = source.matrix(), source.users, source.tracks
+
+    assert matrix[users["u1"], tracks[T0]] == pytest.approx(np.log1p(3))
+    # прослушивания и избранное одной пары складываются
+    assert matrix[users["u4"], tracks[T3]] == pytest.approx(np.log1p(1) + FAVORITE_WEIGHT)
+    assert matrix.nnz == len(PLAYS)
+
+
+def test_heavy_users_keep_their_heaviest_tracks():
+    matrix = sparse.csr_matrix(np.array([
+        [5.0, 1.0, 4.0, 2.0, 3.0],
+        [1.0, 1.0, 0.0, 0.0, 0.0],
+    ], dtype=np.float32))
+
+    capped = cap_user_items(matrix, limit=3).toarray()
+
+    assert capped[0].tolist() == [5.0, 0.0, 4.0, 0.0, 3.0]
+    assert capped[1].tolist() == [1.0, 1.0, 0.0, 0.0, 0.0]
+
+
+def test_build_matches_dense_cosine(monkeypatch, tmp_path):
+    # блоки по два трека: строки разных блоков склеиваются в одну CSR-матрицу
+    monkeypatch.setattr(cooccurrence_job, "ITEM_BLOCK", 2)
+    source = interactions()
+    track_ids, similarities = dense_similarities(source)
+
+    save_model(tmp_path, *build_model(source))
+    model = load_model(tmp_path)
+
+    assert [track.decode() for track in model.ids] == sorted(TRACKS)
+    for i, track_id in enumerate(track_ids):
+        expected = {track_ids[j]: similarities[i, j] for j in np.flatnonzero(similarities[i])}
+        assert neighbor_map(model, track_id) == pytest.approx(expected, abs=1e-3)
+
+    assert model.neighbors(T0)[0][0] == T1
+    assert model.neighbors(T2)[0][0] == T3
+    assert model.neighbors(T4)[0] == []
+
+
+def test_build_keeps_top_n_by_similarity():
+    rng = np.random.default_rng(3)
+    tracks = [str(uuid.UUID(int=i)) for i in range(1, 41)]
+    plays = [
+        (f"u{user}", tracks[track], int(rng.integers(1, 10)))
+        for user in range(60)
+        for track in rng.choice(len(tracks), size=8, replace=False)
+    ]
+    source = interactions(plays, [])
+    track_ids, similarities = dense_similarities(source)
+
+    ids, indptr, indices, scores, embeddings = build_model(source, top_n=5)
+
+    assert len(indptr) == len(ids) + 1
+    assert embeddings.shape[0] == len(ids)
+    for row, track_id in enumerate(ids.astype(str)):
+        row_scores = scores[indptr[row]:indptr[row + 1]]
+        row_ids = ids[indices[indptr[row]:indptr[row + 1]]].astype(str)
+        assert len(row_scores) == 5
+        assert track_id not in row_ids
+        assert (np.diff(row_scores) <= 0).all()
+        expected = np.sort(similarities[track_ids.index(track_id)])[::-1][:5]
+        assert row_scores == pytest.approx(expected, abs=1e-5)
+
+
+def test_lookup_by_id_uses_sorted_ids(tmp_path):
+    save_model(tmp_path, *build_model(interactions()))
+    model = load_model(tmp_path)
+    missing = str(uuid.UUID(int=100))
+
+    assert [model.row(track_id) for track_id in TRACKS] == list(range(len(TRACKS)))
+    assert model.row(missing) is None
+    assert model.rows(np.array([T3, missing, T0])).tolist() == [3, -1, 0]
+    assert model.candidates([T0, T1]).keys() == {T2, T3}
+
+
+def test_publish_switches_current_and_prunes_old_builds(tmp_path):
+    builds = [save_model(tmp_path, *build_model(interactions())) for _ in range(KEEP_BUILDS + 1)]
+
+    assert (tmp_path / CURRENT_LINK).resolve() == builds[-1]
+    assert sorted(tmp_path.glob("build-*")) == builds[-KEEP_BUILDS:]
+    assert load_model(tmp_path).path == builds[-1]
+
+
+def test_service_reloads_published_build(monkeypatch, tmp_path):
+    for name in ("_model", "_base_dir", "_checked_at"):
+        monkeypatch.setattr(cooccurrence, name, getattr(cooccurrence, name))
+
+    init_model(tmp_path)
+    assert get_model() is None
+
+    monkeypatch.setattr(cooccurrence, "RELOAD_INTERVAL", 0.0)
+    first = save_model(tmp_path, *build_model(interactions()))
+    assert get_model().path == first
+    assert neighbor_map(get_model(), T0).keys() == {T1, T2, T3}
+
+    # пользователь u6 связывает T4 с T1
+    second = save_model(tmp_path, *build_model(interactions(PLAYS + [("u6", T4, 5), ("u6", T1, 5)])))
+    assert get_model().path == second
+    assert get_model().neighbors(T4)[0] == [T1]
@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from app.fetch_from_music_service import fetch_all_tracks
+from app.fetch_from_music_service.fetch_all_tracks import IncompleteCatalogError, fetch_all_tracks_from_music_service
+
+
+class MusicService:
+    """Отдаёт /tracks keyset-страницами, как music-service; failing — границы before, на которых отвечает 404."""
+
+    def __init__(self, track_ids: list[str], failing: set[str] = frozenset()) -> None:
+        self.track_ids = sorted(track_ids)
+        self.failing = failing
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(0)
+        params = request.url.params
+        if params.get("before") in self.failing:
+            return httpx.Response(404)
+        after, before = params.get("after"), params.get("before")
+        ids = [
+            track_id for track_id in self.track_ids
+            if (after is None or track_id > after) and (before is None or track_id < before)
+        ]
+        return httpx.Response(200, json=[{"id": track_id} for track_id in ids[:int(params["limit"])]])
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    monkeypatch.setattr(fetch_all_tracks, "PAGE_SIZE", 3)
+
+    def serve(service: MusicService) -> None:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(service))
+        monkeypatch.setattr(fetch_all_tracks, "get_http_client", lambda: client)
+
+    return serve
+
+
+def test_catalog_is_assembled_from_all_partitions(serve):
+    track_ids = [str(uuid.uuid4()) for _ in range(200)]
+    service = MusicService(track_ids)
+    serve(service)
+
+    tracks = asyncio.run(fetch_all_tracks_from_music_service())
+
+    assert sorted(track["id"] for track in tracks) == sorted(track_ids)
+
+
+def test_failed_partition_cancels_the_rest(serve):
+    # в остальных диапазонах страниц столько, что без отмены они читались бы ещё долго
+    track_ids = [str(uuid.uuid4()) for _ in range(20_000)]
+    first_bound = fetch_all_tracks.partition_bounds()[0][1]
+    service = MusicService(track_ids, failing={first_bound})
+    serve(service)
+
+    async def fetch() -> int:
+        with pytest.raises(IncompleteCatalogError):
+            await fetch_all_tracks_from_music_service()
+        requests = service.requests
+        await asyncio.sleep(0.05)
+        return service.requests - requests
+
+    assert asyncio.run(fetch()) == 0
+    assert service.requests < 100
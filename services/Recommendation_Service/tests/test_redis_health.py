@@ -0,0 +1,173 @@
+import asyncio
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError, ResponseError, TimeoutError
+
+from app.broker import redis as broker
+from app.broker.redis import CLOSED, HALF_OPEN, OPEN, HealthTrackedRedis, RedisCircuitOpenError, RedisHealth
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeCommand:
+    """Команда, которая по очереди возвращает заданные исходы: исключение или значение."""
+
+    def __init__(self, *outcomes) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "OK"
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def health(clock) -> RedisHealth:
+    return RedisHealth(clock=clock)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def fail(health: RedisHealth, error: Exception, times: int) -> None:
+    for _ in range(times):
+        with pytest.raises(type(error)):
+            run(health.call(FakeCommand(error)))
+
+
+@pytest.mark.parametrize("error", [ConnectionError("refused"), TimeoutError("timeout"), OSError("reset")])
+def test_circuit_opens_after_threshold_network_errors(health, error):
+    fail(health, error, broker.FAILURE_THRESHOLD - 1)
+    assert health.state == CLOSED
+
+    fail(health, error, 1)
+    assert health.state == OPEN
+
+    command = FakeCommand()
+    with pytest.raises(RedisCircuitOpenError):
+        run(health.call(command))
+    assert command.calls == 0
+    assert not health.available()
+
+
+def test_success_resets_failure_count(health):
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD - 1)
+    run(health.call(FakeCommand("OK")))
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD - 1)
+
+    assert health.state == CLOSED
+
+
+def test_server_errors_count_as_success(health):
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD - 1)
+    fail(health, ResponseError("WRONGTYPE"), broker.FAILURE_THRESHOLD * 2)
+
+    assert health.state == CLOSED
+    assert health.failures == 0
+
+
+def test_half_open_lets_through_a_single_probe(health, clock):
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD)
+
+    clock.now += broker.PROBE_INTERVAL - 0.1
+    assert not health.acquire()
+
+    clock.now += 0.1
+    assert health.available()
+    assert health.acquire()
+    assert health.state == HALF_OPEN
+    # пока проба не вернулась, остальные команды не отправляются
+    assert not health.available()
+    assert not health.acquire()
+
+    health.record_success()
+    assert health.state == CLOSED
+    assert health.acquire()
+
+
+def test_failed_probe_reopens_circuit(health, clock):
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD)
+    clock.now += broker.PROBE_INTERVAL
+
+    fail(health, TimeoutError("timeout"), 1)
+
+    assert health.state == OPEN
+    assert health.opened_at == clock.now
+    with pytest.raises(RedisCircuitOpenError):
+        run(health.call(FakeCommand()))
+
+
+def test_cancelled_probe_is_retried(health, clock):
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD)
+    clock.now += broker.PROBE_INTERVAL
+
+    fail(health, asyncio.CancelledError(), 1)
+
+    assert health.state == HALF_OPEN
+    assert run(health.call(FakeCommand("PONG"))) == "PONG"
+    assert health.state == CLOSED
+
+
+@pytest.fixture
+def server(monkeypatch, health) -> fakeredis.FakeServer:
+    monkeypatch.setattr(broker, "redis_health", health)
+    return fakeredis.FakeServer()
+
+
+def tracked_client(server: fakeredis.FakeServer) -> HealthTrackedRedis:
+    fake = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return HealthTrackedRedis(connection_pool=fake.connection_pool, decode_responses=True)
+
+
+def test_client_commands_are_tracked(server, health):
+    client = tracked_client(server)
+    assert run(client.set("key", "value"))
+
+    server.connected = False
+    for _ in range(broker.FAILURE_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            run(client.get("key"))
+
+    assert health.state == OPEN
+    with pytest.raises(RedisCircuitOpenError):
+        run(client.get("key"))
+
+
+def test_pipeline_is_accounted_as_one_command(server, health, clock):
+    client = tracked_client(server)
+
+    async def pipeline(size: int):
+        async with client.pipeline(transaction=False) as pipe:
+            for i in range(size):
+                pipe.set(f"key{i}", i)
+            return await pipe.execute()
+
+    server.connected = False
+    with pytest.raises(ConnectionError):
+        run(pipeline(10))
+    assert health.failures == 1
+
+    fail(health, ConnectionError("refused"), broker.FAILURE_THRESHOLD - 1)
+    with pytest.raises(RedisCircuitOpenError):
+        run(pipeline(3))
+
+    server.connected = True
+    clock.now += broker.PROBE_INTERVAL
+    assert run(pipeline(3)) == [True, True, True]
+    assert health.state == CLOSED
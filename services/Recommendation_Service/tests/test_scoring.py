@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app import scoring
+from app.cooccurrence import load_model, save_model
+from app.scoring import _mean, analytics_fields, preference_vector, ranked_weights, score_tracks, top_k
+
+from .catalogs import make_catalog
+
+POP_FAN = {
+    "analytics": {
+        "top_genres_from_favorites": ["pop"],
+        "top_moods_from_favorites": ["happy"],
+        "top_genres_from_history": ["pop", "rock"],
+        "top_moods_from_history": ["happy"],
+        "avg_release_year_from_favorites": 2016,
+        "avg_release_year_from_history": 0,
+        "avg_duration_from_favorites": 205.0,
+        "avg_duration_from_history": 0,
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(scoring, "JITTER", 0.0)
+
+
+def test_analytics_fields_unwraps_service_response():
+    assert analytics_fields({"analytics": {"total_plays": 3}}) == {"total_plays": 3}
+    assert analytics_fields({"total_plays": 3}) == {"total_plays": 3}
+
+
+def test_ranked_weights_decay_by_rank_and_skip_empty():
+    assert ranked_weights(["pop", "", "rock"], 1.0) == {"pop": 1.0, "rock": 1.0 / 3}
+    assert ranked_weights(None, 1.0) == {}
+
+
+def test_mean_ignores_missing_and_zero_values():
+    assert _mean(2000, 0) == 2000
+    assert _mean(2000, 2010) == 2005
+    assert _mean(None, 0) is None
+
+
+def test_preference_vector_weights_preferred_categories(catalog):
+    weights = preference_vector(POP_FAN, catalog)
+    moods = dict(zip(catalog.mood_names, weights[:catalog.genre_offset]))
+    genres = dict(zip(catalog.genre_names, weights[catalog.genre_offset:catalog.numeric_offset]))
+
+    assert moods["happy"] > 0 and moods["sad"] == 0
+    assert genres["pop"] > genres["rock"] > 0
+    assert genres["jazz"] == 0
+    # гауссова близость: отрицательный коэффициент при квадрате
+    assert weights[catalog.numeric_offset + 1] < 0
+    assert weights[catalog.numeric_offset + 3] < 0
+
+
+def test_score_tracks_ranks_matching_cluster_first(catalog):
+    scores = score_tracks(POP_FAN, catalog)
+    best = catalog.track_ids(top_k(scores, np.ones(len(catalog), dtype=bool), 10))
+
+    assert {catalog.genre_names[catalog.genre_codes[catalog.index[track_id]]] for track_id in best} == {"pop"}
+
+
+def test_score_tracks_without_preferences_is_flat(catalog):
+    scores = score_tracks({}, catalog)
+    assert np.allclose(scores, 0.0)
+
+
+def test_unknown_preferences_are_ignored(catalog):
+    analytics = {"top_genres_from_favorites": ["polka"], "top_moods_from_favorites": ["angry"]}
+    assert not preference_vector(analytics, catalog).any()
+
+
+def test_cooccurrence_neighbors_are_boosted(catalog, tmp_path):
+    seed, neighbor = catalog.ids[0], catalog.ids[60]
+    ids = np.array(sorted([seed, neighbor]), dtype="S36")
+    # два трека — соседи друг друга
+    save_model(tmp_path, ids, np.array([0, 1, 2]), np.array([1, 0]), np.array([0.9, 0.9]))
+    model = load_model(tmp_path)
+
+    analytics = {"most_favorite_tracks": [seed]}
+    plain = score_tracks(analytics, catalog)
+    boosted = score_tracks(analytics, catalog, model)
+
+    position = catalog.index[neighbor]
+    assert boosted[position] == pytest.approx(plain[position] + scoring.COOCCURRENCE_WEIGHT * 0.9, abs=1e-3)
+    assert boosted[catalog.index[seed]] == plain[catalog.index[seed]]
+
+
+def test_top_k_returns_best_available_in_order():
+    scores = np.array([0.5, 3.0, 2.0, 1.0, 4.0], dtype=np.float32)
+    available = np.array([True, True, True, True, False])
+
+    assert top_k(scores, available, 3).tolist() == [1, 2, 3]
+    assert top_k(scores, available, 10).tolist() == [1, 2, 3, 0]
+    assert top_k(scores, np.zeros(5, dtype=bool), 3).size == 0
+
+
+def test_unknown_year_and_duration_score_as_average():
+    catalog = make_catalog([("happy", "pop", 2000, None), ("happy", "pop", None, 200.0)])
+    assert np.isfinite(catalog.features).all()
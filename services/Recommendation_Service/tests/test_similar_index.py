@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app import similar_index
+from app.similar_index import SimilarIndex
+
+from .catalogs import make_catalog
+
+
+def genre_of(catalog, track_id: str) -> str:
+    return catalog.genre_names[catalog.genre_codes[catalog.index[track_id]]]
+
+
+def test_brute_force_search_returns_same_cluster_without_query(catalog):
+    index = SimilarIndex(catalog, None)
+    query = catalog.ids[0]
+
+    result = index.search(query, 10)
+
+    assert index.centroids is None
+    assert len(result) == 10
+    assert query not in result
+    assert {genre_of(catalog, track_id) for track_id in result} == {"pop"}
+
+
+def test_search_orders_by_similarity(catalog):
+    index = SimilarIndex(catalog, None)
+    query = catalog.ids[0]
+
+    result = index.search(query, len(catalog))
+    query_vector = index.vectors[catalog.index[query]]
+    similarities = [float(index.vectors[catalog.index[track_id]] @ query_vector) for track_id in result]
+
+    assert similarities == sorted(similarities, reverse=True)
+
+
+def test_search_unknown_track_and_small_catalog():
+    catalog = make_catalog([("happy", "pop", 2000, 200.0)])
+    index = SimilarIndex(catalog, None)
+
+    assert index.search("missing", 5) is None
+    assert index.search(catalog.ids[0], 5) == []
+
+
+def test_ivf_search_finds_neighbors_from_probed_lists(monkeypatch):
+    monkeypatch.setattr(similar_index, "BRUTE_FORCE_LIMIT", 100)
+    rng = np.random.default_rng(7)
+    tracks = [
+        (f"mood{i % 8}", f"genre{i % 12}", int(rng.integers(1960, 2024)), float(rng.integers(120, 420)))
+        for i in range(3000)
+    ]
+    catalog = make_catalog(tracks)
+
+    ivf = SimilarIndex(catalog, None)
+    monkeypatch.setattr(similar_index, "BRUTE_FORCE_LIMIT", len(catalog))
+    exact = SimilarIndex(catalog, None)
+
+    assert ivf.centroids is not None
+    recall = []
+    for query in catalog.ids[:50]:
+        found = ivf.search(query, 10)
+        assert query not in found
+        assert {genre_of(catalog, track_id) for track_id in found[:3]} == {genre_of(catalog, query)}
+        recall.append(len(set(found) & set(exact.search(query, 10))) / 10)
+    assert np.mean(recall) >= 0.8
+
+
+def test_rebuild_reuses_centroids_until_catalog_drifts(monkeypatch):
+    monkeypatch.setattr(similar_index, "BRUTE_FORCE_LIMIT", 100)
+    tracks = [(f"mood{i % 4}", f"genre{i % 6}", 1990 + i % 30, 150.0 + i % 200) for i in range(1000)]
+    first = SimilarIndex(make_catalog(tracks), None)
+
+    grown = SimilarIndex(make_catalog(tracks + tracks[:100]), None, first)
+    assert grown.centroids is first.centroids
+
+    doubled = SimilarIndex(make_catalog(tracks * 2), None, first)
+    assert doubled.centroids is not first.centroids
+    assert doubled.trained_size == 2000
+
+
+@pytest.mark.parametrize("k", [1, 5, 99, 500])
+def test_search_never_returns_more_than_catalog(catalog, k):
+    result = SimilarIndex(catalog, None).search(catalog.ids[5], k)
+    assert len(result) == min(k, len(catalog) - 1)
+    assert len(set(result)) == len(result)
@@ -9,17 +9,17 @@ import json
 from fastapi.middleware.cors import CORSMiddleware
 
 import time
-from jose import jwt, JWTError
 from .redis_client import r
+from .logging_setup import setup_logging
+from .compression import CompressionMiddleware
+from .metrics import setup_metrics
+from .token_claims import get_request_claims
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/jwt/login")
 
 # Initialize logger
+setup_logging("user-service")
 logger = logging.getLogger("user-service")
-logging.basicConfig(
-    level=20,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 
 logger.info("Configuration loading...")
 cfg: config.Config = config.load_config()
@@ -40,25 +40,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+setup_metrics(app)
 
 JWT_SECRET = cfg.jwt_secret.get_secret_value()
 @app.middleware("http")
 async def update_user_activity_middleware(request: Request, call_next):
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-        try:
-            payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience="fastapi-users:auth")
-            user_id = payload.get("sub")
-            if user_id:
-                current_time = int(time.time())
-                print(f"User ID: {user_id} - last activity time: {current_time}")
-                await r.setex(f"user:{user_id}:last_activity", 3600, current_time)
-                await r.sadd("active_users", user_id)
-            else:
-                print("No user_id found in token.")
-        except JWTError as e:
-            print(f"JWT Error: {e}")
+    claims = get_request_claims(request, JWT_SECRET)
+    if claims is not None:
+        user_id = claims.payload.get("sub")
+        if user_id:
+            current_time = int(time.time())
+            logger.debug(f"User {user_id} last activity time: {current_time}")
+            await r.setex(f"user:{user_id}:last_activity", 3600, current_time)
+            await r.sadd("active_users", user_id)
+        else:
+            logger.debug("No user_id found in token")
 
     response = await call_next(request)
     return response
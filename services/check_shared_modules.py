@@ -0,0 +1,86 @@
+"""
+Проверка общих модулей сервисов.
+
+У каждого сервиса свой Docker-контекст (services/<Service>), поэтому модули,
+общие для всех сервисов и шлюза, лежат в каждом app/ копией. Скрипт сравнивает
+копии и падает с diff'ом, если они разошлись; с --sync раскладывает версию
+одного сервиса по остальным.
+
+    python services/check_shared_modules.py
+    python services/check_shared_modules.py --sync Music_Service
+"""
+import argparse
+import difflib
+import sys
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parent
+SERVICES = (
+    "Analytics_Service",
+    "Music_Service",
+    "Recommendation_Service",
+    "User_Service",
+    "policy_enforcer",
+)
+SHARED_MODULES = (
+    "compression.py",
+    "logging_setup.py",
+    "metrics.py",
+    "token_claims.py",
+)
+
+
+def module_path(service: str, module: str) -> Path:
+    return SERVICES_DIR / service / "app" / module
+
+
+def check(reference: str) -> list[str]:
+    """Unified diff каждой разошедшейся копии относительно сервиса reference."""
+    diffs = []
+    for module in SHARED_MODULES:
+        expected = module_path(reference, module).read_text().splitlines(keepends=True)
+        for service in SERVICES:
+            if service == reference:
+                continue
+            path = module_path(service, module)
+            actual = path.read_text().splitlines(keepends=True) if path.exists() else []
+            diffs.extend(difflib.unified_diff(
+                expected, actual,
+                fromfile=f"{reference}/app/{module}", tofile=f"{service}/app/{module}"
+            ))
+    return diffs
+
+
+def sync(reference: str) -> None:
+    for module in SHARED_MODULES:
+        content = module_path(reference, module).read_text()
+        for service in SERVICES:
+            path = module_path(service, module)
+            if service != reference and (not path.exists() or path.read_text() != content):
+                path.write_text(content)
+                print(f"updated {service}/app/{module}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that shared service modules are identical")
+    parser.add_argument("--reference", choices=SERVICES, default=SERVICES[0],
+                        help="service whose copies the others are compared with")
+    parser.add_argument("--sync", choices=SERVICES, metavar="SERVICE",
+                        help="copy the shared modules of SERVICE to all other services")
+    args = parser.parse_args()
+
+    if args.sync:
+        sync(args.sync)
+        return 0
+
+    diffs = check(args.reference)
+    if diffs:
+        sys.stdout.writelines(diffs)
+        print("\nshared modules differ; fix them or run with --sync <service>", file=sys.stderr)
+        return 1
+    print(f"{len(SHARED_MODULES)} shared modules identical in {len(SERVICES)} services")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
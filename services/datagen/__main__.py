@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import fields
+
+from .generator import DatasetSpec, generate_dataset
+from .loader import load_dataset
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Synthetic data generator for scale testing")
+    parser.add_argument("--dsn", help="Music database (tables must exist); omit to only generate")
+    parser.add_argument("--schema", default="music")
+    parser.add_argument("--base-url", default="https://storage.local/")
+    parser.add_argument("--truncate", action="store_true", help="Empty the target tables first")
+    parser.add_argument("--tracks-ndjson", help="Also write the catalog as NDJSON in /tracks response shape")
+    for spec_field in fields(DatasetSpec):
+        parser.add_argument(
+            f"--{spec_field.name.replace('_', '-')}",
+            type=type(spec_field.default),
+            default=spec_field.default
+        )
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    spec = DatasetSpec(**{f.name: getattr(args, f.name) for f in fields(DatasetSpec)})
+
+    started = time.perf_counter()
+    dataset = generate_dataset(spec)
+    print(
+        f"Generated {spec.tracks} tracks, {len(dataset.history_users)} plays, "
+        f"{len(dataset.favorite_users)} favorites, {len(dataset.playlist_ids)} playlists "
+        f"({len(dataset.playlist_track_tracks)} entries) in {time.perf_counter() - started:.1f}s"
+    )
+
+    if args.tracks_ndjson:
+        with open(args.tracks_ndjson, "w") as file:
+            for track in dataset.iter_track_dicts(args.base_url):
+                file.write(json.dumps(track) + "\n")
+
+    if args.dsn:
+        stats = await load_dataset(args.dsn, dataset, args.schema, args.base_url, args.truncate)
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
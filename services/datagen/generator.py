@@ -0,0 +1,220 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+GENRES = ("pop", "rock", "hiphop", "electronic", "rnb", "lofi", "jazz", "metal", "classical")
+GENRE_WEIGHTS = (0.24, 0.16, 0.15, 0.12, 0.08, 0.08, 0.06, 0.06, 0.05)
+
+MOODS = ("happy", "sad", "calm", "energetic", "romantic")
+MOOD_WEIGHTS = (0.26, 0.16, 0.22, 0.24, 0.12)
+# доля треков без настроения (mood nullable)
+MOOD_MISSING = 0.1
+
+TITLE_WORDS = (
+    "night", "summer", "love", "rain", "city", "dream", "fire", "ocean", "star", "road",
+    "heart", "light", "shadow", "river", "storm", "gold", "blue", "wild", "echo", "home",
+    "midnight", "paper", "silver", "electric", "golden", "broken", "neon", "velvet", "winter", "sky",
+)
+
+HISTORY_WINDOW_DAYS = 90
+
+
+@dataclass
+class DatasetSpec:
+    tracks: int = 1_000_000
+    users: int = 200_000
+    # средние значения на пользователя; распределения по пользователям с тяжёлым хвостом
+    history_mean: float = 15.0
+    # как в crud.add_play_history; 0 — без ограничения (для проверки подрезки истории)
+    history_cap: int = 20
+    favorites_mean: float = 12.0
+    playlists_mean: float = 0.8
+    playlist_min_size: int = 5
+    playlist_max_size: int = 2000
+    public_playlist_share: float = 0.02
+    # показатели Zipf для популярности треков
+    history_zipf: float = 0.95
+    favorites_zipf: float = 0.85
+    playlist_zipf: float = 0.8
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    """
+    Сгенерированные данные в колоночном виде. UUID хранятся как массивы (n, 16) uint8,
+    ссылки между таблицами — как индексы строк в соответствующих массивах.
+    """
+    spec: DatasetSpec
+    now: datetime
+
+    track_ids: np.ndarray
+    track_titles: np.ndarray
+    track_artists: np.ndarray
+    track_durations: np.ndarray
+    track_genres: np.ndarray
+    track_moods: np.ndarray
+    track_years: np.ndarray
+
+    user_ids: np.ndarray
+
+    history_users: np.ndarray
+    history_tracks: np.ndarray
+    history_ages: np.ndarray
+    history_played: np.ndarray
+
+    favorite_users: np.ndarray
+    favorite_tracks: np.ndarray
+    favorite_ages: np.ndarray
+
+    playlist_ids: np.ndarray
+    playlist_users: np.ndarray
+    playlist_public: np.ndarray
+    playlist_track_playlists: np.ndarray
+    playlist_track_tracks: np.ndarray
+
+    def track_uuid(self, index: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self.track_ids[index].tobytes())
+
+    def user_uuid(self, index: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self.user_ids[index].tobytes())
+
+    def playlist_uuid(self, index: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self.playlist_ids[index].tobytes())
+
+    def track_title(self, index: int) -> str:
+        first, second = self.track_titles[index]
+        return f"{TITLE_WORDS[first]} {TITLE_WORDS[second]}".title()
+
+    def iter_track_dicts(self, base_url: str = "https://storage.local/"):
+        """
+        Треки в форме ответа Music_Service /tracks — для бенчмарков сервисов,
+        которые получают каталог по HTTP (рекомендации, аналитика).
+        """
+        for i in range(len(self.track_ids)):
+            track_id = str(self.track_uuid(i))
+            mood = self.track_moods[i]
+            yield {
+                "id": track_id,
+                "title": self.track_title(i),
+                "artist": f"Artist {self.track_artists[i]}",
+                "duration": float(self.track_durations[i]),
+                "genre": GENRES[self.track_genres[i]],
+                "mood": MOODS[mood] if mood >= 0 else None,
+                "release_year": int(self.track_years[i]),
+                "track_url": f"{base_url}music/{track_id}.mp3",
+                "cover_url": f"{base_url}images/{track_id}.jpg",
+            }
+
+
+def random_uuids(rng: np.random.Generator, count: int) -> np.ndarray:
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return raw
+
+
+def zipf_sampler(rng: np.random.Generator, count: int, exponent: float):
+    """
+    Возвращает функцию, выбирающую индексы 0..count-1 по закону Zipf.
+    Ранги популярности случайно переставлены, чтобы хиты не шли подряд по id.
+    """
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    by_rank = rng.permutation(count)
+
+    def sample(size: int) -> np.ndarray:
+        ranks = np.searchsorted(cdf, rng.random(size), side="right")
+        return by_rank[np.minimum(ranks, count - 1)]
+
+    return sample
+
+
+def heavy_tailed_counts(rng: np.random.Generator, size: int, mean: float, sigma: float = 1.0) -> np.ndarray:
+    """Логнормальные неотрицательные счётчики на пользователя с заданным средним."""
+    if mean <= 0:
+        return np.zeros(size, dtype=np.int64)
+    values = rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, size)
+    return np.floor(values + rng.random(size)).astype(np.int64)
+
+
+def unique_pairs(left: np.ndarray, right: np.ndarray, right_size: int) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.unique(left.astype(np.int64) * right_size + right)
+    return keys // right_size, keys % right_size
+
+
+def generate_tracks(rng: np.random.Generator, count: int) -> dict[str, np.ndarray]:
+    artists = max(1, count // 12)
+    # у немногих артистов много треков, у большинства — несколько
+    artist_of = zipf_sampler(rng, artists, 0.7)(count)
+    durations = np.clip(rng.lognormal(np.log(210), 0.3, count), 30, 1200).round(2)
+    years = np.clip(2025 - np.floor(rng.exponential(12, count)), 1950, 2025).astype(np.int32)
+
+    moods = rng.choice(len(MOODS), size=count, p=MOOD_WEIGHTS).astype(np.int8)
+    moods[rng.random(count) < MOOD_MISSING] = -1
+
+    return {
+        "track_ids": random_uuids(rng, count),
+        "track_titles": rng.integers(0, len(TITLE_WORDS), size=(count, 2), dtype=np.int16),
+        "track_artists": artist_of.astype(np.int32),
+        "track_durations": durations,
+        "track_genres": rng.choice(len(GENRES), size=count, p=GENRE_WEIGHTS).astype(np.int8),
+        "track_moods": moods,
+        "track_years": years,
+    }
+
+
+def generate_dataset(spec: DatasetSpec) -> Dataset:
+    rng = np.random.default_rng(spec.seed)
+    tracks = generate_tracks(rng, spec.tracks)
+    users = spec.users
+
+    history_counts = heavy_tailed_counts(rng, users, spec.history_mean)
+    if spec.history_cap:
+        history_counts = np.minimum(history_counts, spec.history_cap)
+    history_users = np.repeat(np.arange(users, dtype=np.int64), history_counts)
+    history_tracks = zipf_sampler(rng, spec.tracks, spec.history_zipf)(len(history_users))
+    history_ages = rng.uniform(0, HISTORY_WINDOW_DAYS * 86400, len(history_users))
+    history_played = (tracks["track_durations"][history_tracks] * rng.beta(2, 1, len(history_users))).round(2)
+
+    favorite_counts = np.minimum(heavy_tailed_counts(rng, users, spec.favorites_mean), spec.tracks)
+    favorite_users, favorite_tracks = unique_pairs(
+        np.repeat(np.arange(users, dtype=np.int64), favorite_counts),
+        zipf_sampler(rng, spec.tracks, spec.favorites_zipf)(int(favorite_counts.sum())),
+        spec.tracks
+    )
+    favorite_ages = rng.uniform(0, HISTORY_WINDOW_DAYS * 86400, len(favorite_users))
+
+    playlist_counts = rng.poisson(spec.playlists_mean, users)
+    playlist_users = np.repeat(np.arange(users, dtype=np.int64), playlist_counts)
+    playlist_sizes = np.clip(
+        (rng.pareto(1.3, len(playlist_users)) + 1) * spec.playlist_min_size,
+        1, min(spec.playlist_max_size, spec.tracks)
+    ).astype(np.int64)
+    playlist_track_playlists, playlist_track_tracks = unique_pairs(
+        np.repeat(np.arange(len(playlist_users), dtype=np.int64), playlist_sizes),
+        zipf_sampler(rng, spec.tracks, spec.playlist_zipf)(int(playlist_sizes.sum())),
+        spec.tracks
+    )
+
+    return Dataset(
+        spec=spec,
+        now=datetime.now(timezone.utc),
+        **tracks,
+        user_ids=random_uuids(rng, users),
+        history_users=history_users,
+        history_tracks=history_tracks,
+        history_ages=history_ages,
+        history_played=history_played,
+        favorite_users=favorite_users,
+        favorite_tracks=favorite_tracks,
+        favorite_ages=favorite_ages,
+        playlist_ids=random_uuids(rng, len(playlist_users)),
+        playlist_users=playlist_users,
+        playlist_public=rng.random(len(playlist_users)) < spec.public_playlist_share,
+        playlist_track_playlists=playlist_track_playlists,
+        playlist_track_tracks=playlist_track_tracks,
+    )
@@ -0,0 +1,179 @@
+import struct
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import numpy as np
+
+from .generator import GENRES, MOODS, Dataset, random_uuids
+
+COPY_CHUNK_SIZE = 100_000
+
+TABLES = ("tracks", "playlists", "playlist_track", "favorite_tracks", "play_history")
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+UUID_DTYPE = ("u1", (16,))
+
+
+def as_uuids(raw: np.ndarray) -> list[uuid.UUID]:
+    data = raw.tobytes()
+    return [uuid.UUID(bytes=data[i:i + 16]) for i in range(0, len(data), 16)]
+
+
+def chunks(total: int, size: int = COPY_CHUNK_SIZE):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def track_records(dataset: Dataset, base_url: str):
+    for start, end in chunks(len(dataset.track_ids)):
+        ids = as_uuids(dataset.track_ids[start:end])
+        for offset, track_id in enumerate(ids):
+            i = start + offset
+            mood = dataset.track_moods[i]
+            yield (
+                track_id,
+                dataset.track_title(i),
+                f"Artist {dataset.track_artists[i]}",
+                float(dataset.track_durations[i]),
+                GENRES[dataset.track_genres[i]],
+                MOODS[mood] if mood >= 0 else None,
+                int(dataset.track_years[i]),
+                f"{base_url}music/{track_id}.mp3",
+                f"{base_url}images/{track_id}.jpg",
+            )
+
+
+def playlist_records(dataset: Dataset):
+    ids = as_uuids(dataset.playlist_ids)
+    users = dataset.playlist_users
+    for i, playlist_id in enumerate(ids):
+        yield playlist_id, f"Playlist {i}", dataset.user_uuid(users[i]), bool(dataset.playlist_public[i])
+
+
+def binary_copy_rows(columns: list[tuple[str, np.ndarray]]) -> bytes:
+    """
+    Строки COPY в бинарном формате Postgres для колонок фиксированной ширины.
+    Собирается одним структурированным массивом numpy, без Python-объектов на строку.
+    """
+    fields = [("count", ">i2")]
+    for i, (dtype, _) in enumerate(columns):
+        fields += [(f"len{i}", ">i4"), (f"value{i}", dtype)]
+
+    rows = np.empty(len(columns[0][1]), dtype=fields)
+    rows["count"] = len(columns)
+    for i, (dtype, values) in enumerate(columns):
+        rows[f"len{i}"] = np.dtype(dtype).itemsize
+        rows[f"value{i}"] = values
+    return rows.tobytes()
+
+
+async def binary_copy_source(total: int, build_chunk):
+    yield COPY_HEADER
+    for start, end in chunks(total):
+        yield binary_copy_rows(build_chunk(start, end))
+    yield COPY_TRAILER
+
+
+def pair_source(left_ids: np.ndarray, left: np.ndarray, right_ids: np.ndarray, right: np.ndarray):
+    return binary_copy_source(len(left), lambda start, end: [
+        (UUID_DTYPE, left_ids[left[start:end]]),
+        (UUID_DTYPE, right_ids[right[start:end]]),
+    ])
+
+
+def event_source(dataset: Dataset, users: np.ndarray, tracks: np.ndarray, ages: np.ndarray, played=None):
+    # id строк событий ни на что не ссылаются, поэтому в Dataset их не храним
+    rng = np.random.default_rng(dataset.spec.seed + len(users))
+    now = int((dataset.now - PG_EPOCH) / timedelta(microseconds=1))
+
+    def build_chunk(start: int, end: int) -> list[tuple[str, np.ndarray]]:
+        columns = [
+            (UUID_DTYPE, random_uuids(rng, end - start)),
+            (UUID_DTYPE, dataset.user_ids[users[start:end]]),
+            (UUID_DTYPE, dataset.track_ids[tracks[start:end]]),
+            (">i8", now - (ages[start:end] * 1_000_000).astype(np.int64)),
+        ]
+        if played is not None:
+            columns.append((">f8", played[start:end]))
+        return columns
+
+    return binary_copy_source(len(users), build_chunk)
+
+
+def asyncpg_dsn(dsn: str) -> str:
+    return dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def load_dataset(
+    dsn: str,
+    dataset: Dataset,
+    schema: str = "music",
+    base_url: str = "https://storage.local/",
+    truncate: bool = False
+) -> dict[str, dict[str, float]]:
+    """
+    Загружает Dataset в таблицы Music_Service через COPY (таблицы уже должны существовать —
+    их создаёт db_initializer сервиса). Возвращает число строк и время по таблицам.
+    """
+    connection = await asyncpg.connect(asyncpg_dsn(dsn))
+    stats: dict[str, dict[str, float]] = {}
+
+    async def copy(table: str, columns: list[str], records=None, source=None) -> None:
+        started = time.perf_counter()
+        if source is not None:
+            result = await connection.copy_to_table(
+                table, source=source, columns=columns, schema_name=schema, format="binary"
+            )
+        else:
+            result = await connection.copy_records_to_table(
+                table, records=records, columns=columns, schema_name=schema
+            )
+        stats[table] = {
+            "rows": int(result.split()[-1]),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    try:
+        if truncate:
+            await connection.execute(
+                f"TRUNCATE {', '.join(f'{schema}.{table}' for table in TABLES)} CASCADE"
+            )
+
+        await copy(
+            "tracks",
+            ["id", "title", "artist", "duration", "genre", "mood", "release_year", "track_url", "cover_url"],
+            track_records(dataset, base_url)
+        )
+        await copy("playlists", ["id", "name", "user_id", "is_public"], playlist_records(dataset))
+        await copy(
+            "playlist_track",
+            ["playlist_id", "track_id"],
+            source=pair_source(
+                dataset.playlist_ids, dataset.playlist_track_playlists,
+                dataset.track_ids, dataset.playlist_track_tracks
+            )
+        )
+        await copy(
+            "favorite_tracks",
+            ["id", "user_id", "track_id", "timestamp"],
+            source=event_source(dataset, dataset.favorite_users, dataset.favorite_tracks, dataset.favorite_ages)
+        )
+        await copy(
+            "play_history",
+            ["id", "user_id", "track_id", "timestamp", "played_duration"],
+            source=event_source(
+                dataset, dataset.history_users, dataset.history_tracks,
+                dataset.history_ages, dataset.history_played
+            )
+        )
+
+        for table in TABLES:
+            await connection.execute(f"ANALYZE {schema}.{table}")
+    finally:
+        await connection.close()
+
+    return stats
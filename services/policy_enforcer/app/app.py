@@ -7,15 +7,15 @@ from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from . import config
+from .logging_setup import setup_logging
+from .compression import CompressionMiddleware
+from .metrics import set_route_label, setup_metrics
 from .policies.enforcer import EnforceResult, RequestEnforcer
 from .scheme_builder import SchemeBuilder
 
 # setup logging
+setup_logging("policy-enforcer")
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s][%(name)s][%(filename)s, line %(lineno)d]: %(message)s"
-)
 
 app_config: config.Config = config.load_config(_env_file='.env')
 
@@ -66,6 +66,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+setup_metrics(app)
 
 
 @app.api_route("/{path_name:path}",
@@ -76,6 +78,8 @@ async def catch_all(request: Request, path_name: str):
         return RedirectResponse(url='/docs')
 
     enforce_result: EnforceResult = await policy_checker.enforce(request)
+    # у catch-all один шаблон на все запросы — в метриках различаем их по правилу
+    set_route_label(request, enforce_result.route or "denied")
     if not enforce_result.access_allowed:
         return JSONResponse(content={'message': 'Content not found'}, status_code=404)
 
@@ -86,8 +90,12 @@ async def catch_all(request: Request, path_name: str):
     )
     url = httpx.URL(path=request.url.path,
                     query=request.url.query.encode("utf-8"))
+    headers = dict(request.headers)
+    # без явного значения httpx подставит свой Accept-Encoding, и сжатый ответ сервиса
+    # ушёл бы клиенту, который сжатие не запрашивал
+    headers["accept-encoding"] = request.headers.get("accept-encoding", "identity")
     rp_req = client.build_request(request.method, url,
-                                  headers=dict(request.headers),
+                                  headers=headers,
                                   content=await request.body())
     rp_resp = await client.send(rp_req, stream=True)
 
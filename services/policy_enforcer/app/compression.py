@@ -0,0 +1,149 @@
+"""
+Согласованное сжатие ответов (Brotli, если установлен, иначе gzip).
+
+Ответы меньше порога (у стриминговых считается по сумме первых кусков),
+несжимаемые типы и ответы, у которых уже есть Content-Encoding (например,
+проксированные шлюзом из сервиса), проходят без изменений, поэтому повторного
+сжатия не бывает.
+"""
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 5
+# для динамических ответов высокие уровни Brotli слишком дороги по CPU
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/vnd.apple.mpegurl",
+    "application/problem+json",
+    "text/",
+)
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Выбирает br или gzip по Accept-Encoding с учётом q-значений."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name.strip()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    candidates = [(weights.get(name, wildcard), name) for name in supported]
+    quality, name = max(candidates, key=lambda candidate: candidate[0])
+    return name if quality > 0 else None
+
+
+def is_compressible(content_type: str | None) -> bool:
+    return bool(content_type) and content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            chunk = self._compressor.process(data)
+            return chunk + (self._compressor.finish() if final else self._compressor.flush())
+        chunk = self._compressor.compress(data)
+        # на промежуточных кусках делаем sync flush, чтобы стриминг (NDJSON) не копился в буфере
+        return chunk + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: StreamCompressor | None = None
+        passthrough = False
+        # начало тела копится, пока не наберётся minimum_size: у стриминговых ответов
+        # (в т.ч. проксированных шлюзом) размер по первому куску не известен
+        buffered = bytearray()
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                # заголовки отправляем вместе с первым куском тела, когда известен его размер
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type")):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                buffered.extend(body)
+                if len(buffered) < self.minimum_size:
+                    if more_body:
+                        return
+                    passthrough = True
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": bytes(buffered), "more_body": False})
+                    return
+
+                compressor = StreamCompressor(encoding)
+                data = compressor.compress(bytes(buffered), final=not more_body)
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # сильный ETag описывает конкретные байты, у сжатого варианта он свой
+                    headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            data = compressor.compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
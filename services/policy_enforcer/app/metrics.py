@@ -0,0 +1,241 @@
+"""
+Метрики сервиса в формате Prometheus.
+
+Подключается одним вызовом setup_metrics(app): добавляет middleware
+с гистограммами задержек по маршрутам, эндпоинт /metrics и инструментирует
+SQLAlchemy, redis.asyncio и httpx, если они установлены в сервисе.
+"""
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+METRICS_PATH = "/metrics"
+# ключ в request.state, которым обработчик может задать метку маршрута сам
+ROUTE_LABEL_KEY = "metrics_route"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Запросы, обрабатываемые в данный момент",
+    ["method"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Время выполнения SQL-запроса (количество запросов — _count)",
+    ["operation"],
+    buckets=QUERY_BUCKETS
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Время выполнения команды Redis",
+    ["command", "status"],
+    buckets=QUERY_BUCKETS
+)
+HTTP_CLIENT_DURATION = Histogram(
+    "http_client_request_duration_seconds",
+    "Время исходящего HTTP-запроса до получения заголовков ответа",
+    ["method", "host", "status"],
+    buckets=LATENCY_BUCKETS
+)
+STORAGE_UPLOAD_BYTES = Counter(
+    "storage_upload_bytes_total",
+    "Байты, загруженные в объектное хранилище"
+)
+STORAGE_UPLOAD_DURATION = Histogram(
+    "storage_upload_duration_seconds",
+    "Время загрузки одного объекта в хранилище",
+    buckets=LATENCY_BUCKETS
+)
+STAGE_DURATION = Histogram(
+    "app_stage_duration_seconds",
+    "Время отдельных этапов обработки внутри обработчиков",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Замеряет блок кода в app_stage_duration_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def observe_storage_upload(size: int):
+    start = time.perf_counter()
+    yield
+    STORAGE_UPLOAD_DURATION.observe(time.perf_counter() - start)
+    STORAGE_UPLOAD_BYTES.inc(size)
+
+
+def set_route_label(request, label: str) -> None:
+    """
+    Метка route для текущего запроса вместо шаблона маршрута — для catch-all
+    обработчиков вроде шлюза, где шаблон у всех запросов один. Значений должно
+    быть ограниченное число (имя сервиса, правило), не сырой путь.
+    """
+    setattr(request.state, ROUTE_LABEL_KEY, label)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: задержка по шаблону маршрута (а не по сырому пути,
+    чтобы не плодить ряды на каждый UUID) и число запросов в обработке.
+    Время считается до отправки последнего байта тела, включая стриминг.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            HTTP_REQUEST_DURATION.labels(
+                method=method,
+                route=route_template(scope),
+                status=str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+def route_template(scope) -> str:
+    # request.state хранится в scope["state"], общем для middleware и обработчика
+    label = scope.get("state", {}).get(ROUTE_LABEL_KEY)
+    if label:
+        return label
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def instrument_sqlalchemy() -> None:
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+    except ImportError:
+        return
+
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+
+    # слушатели на классе Engine покрывают и sync_engine у AsyncEngine
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_DURATION.labels(operation=operation).observe(time.perf_counter() - context._query_start)
+
+
+def instrument_redis() -> None:
+    try:
+        from redis.asyncio import Redis
+        from redis.asyncio.client import Pipeline
+    except ImportError:
+        return
+
+    if getattr(Redis.execute_command, "_instrumented", False):
+        return
+
+    def wrap(original, command_name):
+        async def wrapper(self, *args, **options):
+            command = command_name or str(args[0]).upper()
+            status = "ok"
+            start = time.perf_counter()
+            try:
+                return await original(self, *args, **options)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                REDIS_COMMAND_DURATION.labels(command=command, status=status).observe(
+                    time.perf_counter() - start
+                )
+        wrapper._instrumented = True
+        return wrapper
+
+    # Pipeline переопределяет execute_command (только ставит команду в очередь),
+    # поэтому для него меряется целиком execute
+    Redis.execute_command = wrap(Redis.execute_command, None)
+    Pipeline.execute = wrap(Pipeline.execute, "PIPELINE")
+
+
+def instrument_httpx() -> None:
+    try:
+        import httpx
+    except ImportError:
+        return
+
+    original_send = httpx.AsyncClient.send
+    if getattr(original_send, "_instrumented", False):
+        return
+
+    async def send(self, request, **kwargs):
+        status = "error"
+        start = time.perf_counter()
+        try:
+            response = await original_send(self, request, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            HTTP_CLIENT_DURATION.labels(
+                method=request.method,
+                host=urlsplit(str(request.url)).netloc,
+                status=status
+            ).observe(time.perf_counter() - start)
+
+    send._instrumented = True
+    httpx.AsyncClient.send = send
+
+
+async def metrics_endpoint() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app: FastAPI) -> None:
+    instrument_sqlalchemy()
+    instrument_redis()
+    instrument_httpx()
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route(METRICS_PATH, metrics_endpoint, methods=["GET"], include_in_schema=False)
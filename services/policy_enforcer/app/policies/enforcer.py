@@ -3,12 +3,12 @@ import re
 import tempfile
 
 import casbin
-import jwt
 import yaml
 from fastapi import Request
 from pydantic.dataclasses import dataclass
 
 from .config import PoliciesConfig, Policy, Service
+from ..token_claims import get_request_claims
 
 logger = logging.getLogger("policy-enforcement-service")
 
@@ -16,6 +16,12 @@ logger = logging.getLogger("policy-enforcement-service")
 class EnforceResult:
     access_allowed: bool = False
     redirect_service: str | None = None
+    # сработавшее правило для метрик: "сервис ресурс", например "music-service /tracks*"
+    route: str | None = None
+
+
+def policy_route(policy: Policy | None) -> str | None:
+    return f"{policy.service} {policy.resource}" if policy else None
 
 
 class RequestEnforcer:
@@ -25,17 +31,17 @@ class RequestEnforcer:
         self.enforcer: casbin.Enforcer = self.__create_enforcer()
 
     async def enforce(self, request: Request) -> EnforceResult:
-        in_whitelist, service_name = self.__is_request_in_whilelist(request)
+        in_whitelist, policy = self.__is_request_in_whilelist(request)
         if in_whitelist:
-            service = self.__get_service_by_name(service_name)
-            return EnforceResult(True, str(service.entrypoint))
+            service = self.__get_service_by_name(policy.service)
+            return EnforceResult(True, str(service.entrypoint), policy_route(policy))
 
-        access_allowed, service_name = await self.__check_by_policy(request)
+        access_allowed, policy = await self.__check_by_policy(request)
         if access_allowed:
-            service = self.__get_service_by_name(service_name)
-            return EnforceResult(True, str(service.entrypoint))
+            service = self.__get_service_by_name(policy.service if policy else None)
+            return EnforceResult(True, str(service.entrypoint), policy_route(policy))
 
-        logger.info(f"Checking whitelist for service: {service_name}")
+        logger.info(f"Checking whitelist for service: {policy}")
         return EnforceResult()
 
     def __load_config(self, config_path: str) -> PoliciesConfig:
@@ -66,9 +72,10 @@ class RequestEnforcer:
     def __extract_token_data(self, request: Request) -> dict:
         try:
             if 'authorization' in request.headers:
-                token = request.headers['authorization'].split(' ')[1]  # Извлекаем токен из заголовка
-                # Декодируем токен и извлекаем данные
-                return jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience=["fastapi-users:auth"])
+                # Проверенные claims берутся из кэша, повторно токен не декодируется
+                claims = get_request_claims(request, self.jwt_secret)
+                if claims is not None:
+                    return claims.payload
 
             return {"group_id": 0}
 
@@ -85,14 +92,14 @@ class RequestEnforcer:
     #         return None
     #     return None
 
-    def __is_request_in_whilelist(self, request: Request) -> tuple[bool, str]:
+    def __is_request_in_whilelist(self, request: Request) -> tuple[bool, Policy | None]:
         resource = '/' + request.path_params['path_name']
         for p in self.whilelist_policies:
             if re.match(p.resource, resource) is not None and request.method in p.method_list:
-                return True, p.service
+                return True, p
         return False, None
 
-    async def __check_by_policy(self, request: Request) -> tuple[bool, str]:
+    async def __check_by_policy(self, request: Request) -> tuple[bool, Policy | None]:
         resource = '/' + request.path_params['path_name']
 
         token_data = self.__extract_token_data(request)
@@ -106,7 +113,7 @@ class RequestEnforcer:
         # Если доступ разрешён, находим сервис
         for p in self.enforcing_policies:
             if re.match(p.resource, resource) is not None and request.method in p.method_list:
-                return True, p.service
+                return True, p
 
         return True, None
 